@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+
+import ast
+import json
+import os
+import queue
+import re
+import shlex
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from importlib.metadata import entry_points
+
+import bitfarmer.log as log
+from bitfarmer.miner import Miner, MinerStatus
+from bitfarmer.reconcile import is_mining
+from bitfarmer.shares import SHARES, WINDOWS
+
+ENTRY_POINT_GROUP = "bitfarmer.alert_sinks"
+# Seconds before a still firing alert is sent again (0 never)
+ALERTS_REPEAT = 0
+# Notifications per sink per minute
+ALERTS_RATE_LIMIT = 10
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_QUEUE = 100
+FIRING = "firing"
+RESOLVED = "resolved"
+DURATION = re.compile(
+    r"^(?P<expr>.+?)\s+for\s+(?P<n>\d+(?:\.\d+)?)\s*(?P<unit>[smhd]?)$"
+)
+UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+VARIABLES = {f.name for f in fields(MinerStatus)} | {
+    "up",
+    "stale",
+    "age",
+    "mining",
+    "tod",
+    "tod_active",
+    "avg_temp",
+    "max_temp",
+    "fans_ok",
+    "rejection_rate",
+}
+for _name, _, _ in WINDOWS:
+    VARIABLES |= {
+        f"accepted_{_name}",
+        f"rejected_{_name}",
+        f"stale_{_name}",
+        f"rejection_rate_{_name}",
+    }
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.UnaryOp,
+    ast.Not,
+    ast.USub,
+    ast.UAdd,
+    ast.BinOp,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.Mod,
+    ast.Compare,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.In,
+    ast.NotIn,
+    ast.Tuple,
+    ast.List,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+)
+
+
+def parse_rule(text: str) -> tuple:
+    """(expression, duration in seconds) of "expr [for N[smhd]]" """
+    match = DURATION.match(text.strip())
+    if match is None:
+        return text.strip(), 0.0
+    return match["expr"], float(match["n"]) * UNITS[match["unit"]]
+
+
+def compile_expr(expr: str):
+    """Compile rule expression, allowing only comparisons and arithmetic on
+    miner variables and constants"""
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid rule '{expr}': {e.msg}") from None
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Rule '{expr}' can't use {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in VARIABLES:
+            raise ValueError(f"Rule '{expr}' uses unknown variable {node.id}")
+    return compile(tree, f"<rule {expr}>", "eval")
+
+
+def variables(
+    ip: str,
+    status: MinerStatus | None,
+    miner: Miner | None,
+    tod_active: dict,
+    age: float | None = None,
+) -> dict:
+    """Names rules can use for one miner, status is None if it is down and age
+    is set if it is the last good status carried forward"""
+    stale = age is not None
+    up = status is not None and not stale
+    status = status if status is not None else MinerStatus(ip, pool="None")
+    tod = miner is not None and miner.tod
+    names = asdict(status)
+    names.update(
+        up=up,
+        stale=stale,
+        age=age or 0.0,
+        mining=up and is_mining(status),
+        tod=tod,
+        tod_active=tod and tod_active.get(miner.tod_group, False),
+        avg_temp=status.get_avg_temp(),
+        max_temp=max(status.chain_temps(), default=0),
+        fans_ok=status.fans_ok(),
+        rejection_rate=status.pool_rejected
+        / max(status.pool_accepted + status.pool_rejected, 1),
+    )
+    for window in SHARES.stats(ip):
+        names[f"accepted_{window.name}"] = window.accepted
+        names[f"rejected_{window.name}"] = window.rejected
+        names[f"stale_{window.name}"] = window.stale
+        names[f"rejection_rate_{window.name}"] = window.rejection_rate()
+    for name, _, _ in WINDOWS:
+        for prefix in ("accepted", "rejected", "stale", "rejection_rate"):
+            names.setdefault(f"{prefix}_{name}", 0)
+    return names
+
+
+@dataclass(slots=True)
+class Rule:
+    """Compiled alert rule"""
+
+    name: str
+    text: str
+    code: object
+    duration: float
+    severity: str = "warning"
+    sinks: tuple = ()
+
+    @classmethod
+    def from_conf(cls, rule, index: int):
+        """Build rule from a string or {"name", "rule", "severity", "sinks"}"""
+        if isinstance(rule, str):
+            rule = {"rule": rule}
+        if not isinstance(rule, dict) or not isinstance(rule.get("rule"), str):
+            raise ValueError(f"alerts.rules[{index}] must be a rule or object")
+        expr, duration = parse_rule(rule["rule"])
+        return cls(
+            name=str(rule.get("name", rule["rule"])),
+            text=rule["rule"],
+            code=compile_expr(expr),
+            duration=duration,
+            severity=str(rule.get("severity", "warning")),
+            sinks=tuple(rule.get("sinks", ())),
+        )
+
+
+class LogSink:
+    """Write alerts to bitfarmer.log"""
+
+    def __init__(self, conf: dict):
+        self.conf = conf
+
+    def notify(self, alert: dict):
+        level = "INFO" if alert["state"] == RESOLVED else alert["severity"].upper()
+        if level not in ("INFO", "WARNING", "ERROR", "CRITICAL"):
+            level = "WARNING"
+        log.log_msg(message(alert), level, quiet=True)
+
+
+class CommandSink:
+    """Run a command per alert, alert passed as JSON in $BITFARMER_ALERT"""
+
+    def __init__(self, conf: dict):
+        self.args = shlex.split(conf["command"])
+        self.running = []
+
+    def notify(self, alert: dict):
+        self.running = [p for p in self.running if p.poll() is None]
+        env = dict(
+            os.environ,
+            BITFARMER_ALERT=json.dumps(alert),
+            BITFARMER_ALERT_NAME=alert["name"],
+            BITFARMER_ALERT_STATE=alert["state"],
+            BITFARMER_ALERT_IP=alert["ip"],
+        )
+        self.running.append(
+            subprocess.Popen(
+                self.args,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        )
+
+
+class WebhookSink:
+    """POST alerts as JSON from a background thread"""
+
+    def __init__(self, conf: dict):
+        self.url = conf["url"]
+        self.timeout = conf.get("timeout", WEBHOOK_TIMEOUT)
+        self.queue = queue.Queue(WEBHOOK_QUEUE)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def notify(self, alert: dict):
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            log.log_msg("Webhook queue full, alert dropped", "WARNING", quiet=True)
+
+    def run(self):
+        import requests
+
+        session = requests.Session()
+        while True:
+            alert = self.queue.get()
+            if alert is None:
+                return
+            try:
+                resp = session.post(self.url, json=alert, timeout=self.timeout)
+                resp.raise_for_status()
+            except Exception as e:
+                log.log_msg(
+                    f"Webhook failed for {alert['name']}", "ERROR", exc=e, quiet=True
+                )
+
+    def close(self):
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+BUILTIN_SINKS = {"log": LogSink, "command": CommandSink, "webhook": WebhookSink}
+
+
+def sink_types() -> dict:
+    """Map sink type to class, including sinks installed as entry points"""
+    types = dict(BUILTIN_SINKS)
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        types[ep.name] = ep
+    return types
+
+
+def message(alert: dict) -> str:
+    if alert["state"] == RESOLVED:
+        return f"Resolved: {alert['name']} on {alert['ip']}"
+    return f"Alert: {alert['name']} on {alert['ip']} ({alert['rule']})"
+
+
+@dataclass
+class AlertState:
+    """Rule state for one miner"""
+
+    since: float | None = None
+    firing: bool = False
+    sent: float = 0.0
+
+
+class RateLimit:
+    """Token bucket, `rate` per minute"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.dropped = 0
+
+    def allow(self, now: float) -> bool:
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate / 60)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.dropped += 1
+        return False
+
+
+class AlertEngine:
+    """Evaluate compiled rules against each poll and notify sinks
+
+    A rule fires for a miner once it has held for the rule's duration and
+    resolves when it stops holding. Each change is sent once (again every
+    `repeat` seconds while firing, if set) and every sink is rate limited.
+    """
+
+    def __init__(self):
+        self.rules = []
+        self.sinks = {}
+        self.limits = {}
+        self.repeat = ALERTS_REPEAT
+        self.states = {}
+        self.failed = set()
+        self.sink_conf = None
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        engine = cls()
+        engine.configure(conf)
+        return engine
+
+    def configure(self, conf: dict):
+        """Compile rules and build sinks, keeping state of unchanged rules"""
+        ac = conf.get("alerts", {})
+        rules = [Rule.from_conf(r, i) for i, r in enumerate(ac.get("rules", []))]
+        sink_conf = (ac.get("sinks"), ac.get("rate_limit"))
+        if sink_conf != self.sink_conf:
+            self.close()
+            self.sinks = build_sinks(ac)
+            self.limits = {
+                name: RateLimit(ac.get("rate_limit", ALERTS_RATE_LIMIT))
+                for name in self.sinks
+            }
+            self.sink_conf = sink_conf
+        self.repeat = ac.get("repeat", ALERTS_REPEAT)
+        keep = {(r.name, r.text) for r in rules}
+        ips = {miner["ip"] for miner in conf.get("miners", [])}
+        self.states = {
+            key: s
+            for key, s in self.states.items()
+            if key[:2] in keep and key[2] in ips
+        }
+        self.rules = rules
+        self.failed = set()
+
+    def close(self):
+        for sink in self.sinks.values():
+            if hasattr(sink, "close"):
+                sink.close()
+
+    def evaluate(
+        self,
+        miners: list,
+        statuses: list,
+        tod_active: dict,
+        now: float | None = None,
+        stale: dict | None = None,
+    ) -> list:
+        """Update rule states from a poll, notify and return changed alerts
+
+        stale is {ip: seconds since last answer} of carried forward statuses.
+        """
+        if not self.rules:
+            return []
+        now = time.monotonic() if now is None else now
+        observed = {status.ip: status for status in statuses}
+        stale = stale or {}
+        changed = []
+        for miner in miners:
+            names = variables(
+                miner.ip,
+                observed.get(miner.ip),
+                miner,
+                tod_active,
+                stale.get(miner.ip),
+            )
+            for rule in self.rules:
+                try:
+                    holds = bool(eval(rule.code, {"__builtins__": {}}, names))
+                except Exception as e:
+                    holds = False
+                    if rule.name not in self.failed:
+                        self.failed.add(rule.name)
+                        log.log_msg(
+                            f"Alert rule {rule.name} failed", "ERROR", exc=e, quiet=True
+                        )
+                alert = self.step(rule, miner.ip, holds, now)
+                if alert is not None:
+                    changed.append(alert)
+        for alert in changed:
+            self.notify(alert, now)
+        return changed
+
+    def step(self, rule: Rule, ip: str, holds: bool, now: float) -> dict | None:
+        """Advance one rule for one miner, return alert to send if any"""
+        key = (rule.name, rule.text, ip)
+        state = self.states.get(key)
+        if state is None:
+            if not holds:
+                return None
+            state = self.states[key] = AlertState()
+        if not holds:
+            del self.states[key]
+            return self.alert(rule, ip, RESOLVED) if state.firing else None
+        if state.since is None:
+            state.since = now
+        if not state.firing and now - state.since >= rule.duration:
+            state.firing = True
+            state.sent = now
+            return self.alert(rule, ip, FIRING)
+        if state.firing and self.repeat and now - state.sent >= self.repeat:
+            state.sent = now
+            return self.alert(rule, ip, FIRING)
+        return None
+
+    def alert(self, rule: Rule, ip: str, state: str) -> dict:
+        return {
+            "name": rule.name,
+            "rule": rule.text,
+            "severity": rule.severity,
+            "ip": ip,
+            "state": state,
+            "ts": time.time(),
+            "sinks": rule.sinks,
+        }
+
+    def notify(self, alert: dict, now: float):
+        targets = alert.pop("sinks") or tuple(self.sinks)
+        for name in targets:
+            sink = self.sinks.get(name)
+            if sink is None:
+                continue
+            limit = self.limits[name]
+            if not limit.allow(now):
+                if limit.dropped == 1 or limit.dropped % 100 == 0:
+                    log.log_msg(
+                        f"Alert sink {name} rate limited ({limit.dropped} dropped)",
+                        "WARNING",
+                        quiet=True,
+                    )
+                continue
+            try:
+                sink.notify(dict(alert))
+            except Exception as e:
+                log.log_msg(f"Alert sink {name} failed", "ERROR", exc=e, quiet=True)
+
+    def firing(self) -> list:
+        """(rule name, ip) of firing alerts"""
+        return sorted((k[0], k[2]) for k, s in self.states.items() if s.firing)
+
+    def summary(self) -> str:
+        """Firing alerts for status view"""
+        return ", ".join(f"{name} on {ip}" for name, ip in self.firing())
+
+
+def build_sinks(ac: dict) -> dict:
+    """{name: sink} from alerts section, log only when none are configured"""
+    types = sink_types()
+    sinks = {}
+    for i, sc in enumerate(ac.get("sinks", [{"type": "log"}])):
+        if not isinstance(sc, dict) or sc.get("type") not in types:
+            raise ValueError(
+                f"alerts.sinks[{i}].type must be one of {', '.join(sorted(types))}"
+            )
+        cls = types[sc["type"]]
+        if not isinstance(cls, type):
+            cls = cls.load()
+        sinks[sc.get("name", sc["type"])] = cls(sc)
+    return sinks
+
+
+def validate(ac: dict):
+    """Check alerts section without starting sinks, raising ValueError"""
+    rules = [Rule.from_conf(r, i) for i, r in enumerate(ac.get("rules", []))]
+    types = sink_types()
+    names = set()
+    for i, sc in enumerate(ac.get("sinks", [{"type": "log"}])):
+        if not isinstance(sc, dict) or sc.get("type") not in types:
+            raise ValueError(
+                f"alerts.sinks[{i}].type must be one of {', '.join(sorted(types))}"
+            )
+        required = {"command": "command", "webhook": "url"}.get(sc["type"])
+        if required and not isinstance(sc.get(required), str):
+            raise ValueError(f"alerts.sinks[{i}].{required} must be a string")
+        names.add(sc.get("name", sc["type"]))
+    for rule in rules:
+        for name in rule.sinks:
+            if name not in names:
+                raise ValueError(f"Alert rule {rule.name} uses unknown sink {name}")
+
+
+if __name__ == "__main__":
+    from bitfarmer.volcminer import VolcminerD1
+
+    miner = VolcminerD1(
+        {
+            "ip": "10.0.0.1",
+            "type": "VolcMiner D1",
+            "login": "root",
+            "password": "root",
+            "tod": True,
+            "primary_pool": "stratum+tcp://ltc.viabtc.io:3333",
+            "primary_pool_user": "worker",
+            "primary_pool_pass": "123",
+            "secondary_pool": "",
+            "secondary_pool_user": "",
+            "secondary_pool_pass": "",
+        }
+    )
+    engine = AlertEngine.from_conf(
+        {
+            "alerts": {
+                "rules": [
+                    {"name": "hot", "rule": "avg_temp > 80 for 5m"},
+                    "hashrate_total_current < 0.8 * hashrate_total_avg",
+                    'pool == "None" and not tod_active',
+                ],
+                "sinks": [{"type": "command", "command": "true"}],
+            }
+        }
+    )
+    for minute, temp in enumerate([70, 82, 84, 85, 83, 82, 81, 76]):
+        status = MinerStatus(
+            miner.ip,
+            pool="stratum+tcp://ltc.viabtc.io:3333",
+            hashboards=3,
+            hashrate_total_current=15000,
+            hashrate_total_avg=15200,
+        )
+        status.temp_0 = status.temp_1 = status.temp_2 = temp
+        for alert in engine.evaluate([miner], [status], {}, minute * 60.0):
+            print(f"{minute}m {message(alert)}")
+    print(engine.evaluate([miner], [], {}, 600.0))
+    try:
+        compile_expr("__import__('os').system('id')")
+    except ValueError as e:
+        print(e)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+import math
+from dataclasses import dataclass
+from statistics import median
+
+import bitfarmer.log as log
+from bitfarmer.miner import MinerStatus
+from bitfarmer.reconcile import is_mining
+
+ANOMALY_ALPHA = 0.05
+ANOMALY_THRESHOLD = 4.0
+ANOMALY_PEER_THRESHOLD = 4.0
+ANOMALY_WARMUP = 10
+# Chains of a model needed before comparing against peers
+PEER_MIN = 4
+HASHRATE = "hashrate"
+TEMP = "temp"
+FAN = "fan"
+BASELINE = "baseline"
+PEERS = "peers"
+# Smallest standard deviation assumed per kind as (fraction of mean, absolute),
+# keeps a very steady reading from turning normal jitter into an anomaly
+FLOORS = {HASHRATE: (0.02, 1.0), TEMP: (0.0, 1.5), FAN: (0.03, 50.0)}
+# Deviations that matter per kind, -1 low, 1 high, 0 either way
+DIRECTIONS = {HASHRATE: -1, TEMP: 1, FAN: 0}
+# 1.4826 * MAD estimates the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+
+def floor(kind: str, mean: float) -> float:
+    rel, absolute = FLOORS[kind]
+    return max(rel * abs(mean), absolute)
+
+
+def samples(status: MinerStatus) -> list:
+    """(kind, index, value) of each chain hashrate, chain temperature and fan"""
+    out = []
+    hashrates = [
+        status.hashrate_0,
+        status.hashrate_1,
+        status.hashrate_2,
+        status.hashrate_3,
+    ]
+    temps = [status.temp_0, status.temp_1, status.temp_2, status.temp_3]
+    fans = [status.fan_0, status.fan_1, status.fan_2, status.fan_3]
+    for i in range(min(status.hashboards, 4)):
+        out.append((HASHRATE, i, hashrates[i]))
+        # 0 is a missing reading, not a cold chain
+        if temps[i] > 0:
+            out.append((TEMP, i, temps[i]))
+    for i in range(min(status.fans, 4)):
+        # A stopped fan is reported by fans_ok
+        if fans[i] > 0:
+            out.append((FAN, i, fans[i]))
+    return out
+
+
+class Ewma:
+    """Exponentially weighted mean and variance, O(1) per sample"""
+
+    __slots__ = ("mean", "var", "n")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+
+    def update(self, x: float, alpha: float):
+        if not self.n:
+            self.mean = x
+        else:
+            diff = x - self.mean
+            incr = alpha * diff
+            self.mean += incr
+            self.var = (1 - alpha) * (self.var + diff * incr)
+        self.n += 1
+
+
+@dataclass(slots=True)
+class Anomaly:
+    """Reading that deviates from its own baseline or from model peers"""
+
+    ip: str
+    series: str
+    source: str
+    value: float
+    expected: float
+    score: float
+
+    def __str__(self) -> str:
+        change = (self.value - self.expected) / self.expected if self.expected else 0
+        versus = "own baseline" if self.source == BASELINE else "model peers"
+        return f"{self.ip} {self.series} {self.value:g} ({change:+.0%} vs {versus})"
+
+
+class Series:
+    """Baseline of one reading and its offset from the peer median"""
+
+    __slots__ = ("base", "resid")
+
+    def __init__(self):
+        self.base = Ewma()
+        self.resid = Ewma()
+
+
+class AnomalyDetector:
+    """Flag chains and fans drifting from their own history or from peers
+
+    Each reading keeps an EWMA mean and variance; a reading more than
+    `threshold` standard deviations from its mean (low hashrate, high
+    temperature, either way for fans) is flagged. Each cycle readings are
+    also compared against the median of the same reading on miners of the
+    same model: the EWMA of a reading's offset from the median, in units of
+    the fleet's spread, catches a board sagging too slowly for its own
+    baseline to notice.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        alpha: float = ANOMALY_ALPHA,
+        threshold: float = ANOMALY_THRESHOLD,
+        peer_threshold: float = ANOMALY_PEER_THRESHOLD,
+        warmup: int = ANOMALY_WARMUP,
+    ):
+        self.enabled = enabled
+        self.alpha = alpha
+        self.threshold = threshold
+        self.peer_threshold = peer_threshold
+        self.warmup = warmup
+        self.miners = {}
+        self.levels = {}
+        self.active = {}
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        """Build detector from optional anomaly section of config"""
+        detector = cls()
+        detector.configure(conf)
+        return detector
+
+    def configure(self, conf: dict):
+        """Apply anomaly settings, keeping learned baselines"""
+        ac = conf.get("anomaly", {})
+        self.enabled = "anomaly" in conf and ac.get("enabled", True)
+        self.alpha = ac.get("alpha", ANOMALY_ALPHA)
+        self.threshold = ac.get("threshold", ANOMALY_THRESHOLD)
+        self.peer_threshold = ac.get("peer_threshold", ANOMALY_PEER_THRESHOLD)
+        self.warmup = ac.get("warmup", ANOMALY_WARMUP)
+        ips = {miner["ip"] for miner in conf.get("miners", [])}
+        if not self.enabled:
+            ips = set()
+        self.miners = {ip: s for ip, s in self.miners.items() if ip in ips}
+        self.levels = {ip: lvl for ip, lvl in self.levels.items() if ip in ips}
+        self.active = {k: a for k, a in self.active.items() if k[0] in ips}
+
+    def peer_stats(self, readings: list) -> dict:
+        """{(model, kind, index): (median, spread)} of this cycle's readings"""
+        groups = {}
+        for status, kind, i, value, level in readings:
+            # Throttled miners are expected to fall behind their peers
+            if not level:
+                groups.setdefault((status.miner_type, kind, i), []).append(value)
+        stats = {}
+        for key, values in groups.items():
+            if len(values) < PEER_MIN:
+                continue
+            mid = median(values)
+            mad = median(abs(v - mid) for v in values)
+            stats[key] = (mid, max(MAD_SCALE * mad, floor(key[1], mid)))
+        return stats
+
+    def score(self, kind: str, deviation: float, spread: float) -> float:
+        """Deviation in units of spread, 0 if in a direction that doesn't matter"""
+        direction = DIRECTIONS[kind]
+        if direction and deviation * direction < 0:
+            return 0.0
+        return deviation / spread
+
+    def update(self, statuses: list, levels: dict | None = None) -> tuple:
+        """Learn from a poll cycle, return (new, cleared) anomalies
+
+        levels maps IPs to tune levels, baselines of a miner are relearned
+        when its level changes.
+        """
+        if not self.enabled:
+            return [], []
+        levels = levels or {}
+        readings = []
+        for status in statuses:
+            if not is_mining(status):
+                continue
+            level = levels.get(status.ip, 0)
+            if self.levels.get(status.ip, level) != level:
+                self.miners.pop(status.ip, None)
+            self.levels[status.ip] = level
+            for kind, i, value in samples(status):
+                readings.append((status, kind, i, value, level))
+        peers = self.peer_stats(readings)
+        found = {}
+        for status, kind, i, value, level in readings:
+            series = self.miners.setdefault(status.ip, {})
+            state = series.get((kind, i))
+            if state is None:
+                state = series[(kind, i)] = Series()
+            name = f"{kind}_{i}"
+            base = state.base
+            if base.n >= self.warmup:
+                spread = max(math.sqrt(base.var), floor(kind, base.mean))
+                z = self.score(kind, value - base.mean, spread)
+                if abs(z) >= self.threshold:
+                    found[(status.ip, name, BASELINE)] = Anomaly(
+                        status.ip, name, BASELINE, value, round(base.mean, 2), z
+                    )
+            base.update(value, self.alpha)
+            peer = peers.get((status.miner_type, kind, i))
+            if peer is None or level:
+                continue
+            mid, spread = peer
+            state.resid.update(value - mid, self.alpha)
+            if state.resid.n < self.warmup:
+                continue
+            z = self.score(kind, state.resid.mean, spread)
+            if abs(z) >= self.peer_threshold:
+                found[(status.ip, name, PEERS)] = Anomaly(
+                    status.ip, name, PEERS, value, round(mid, 2), z
+                )
+        polled = {status.ip for status in statuses}
+        new = [a for key, a in found.items() if key not in self.active]
+        cleared = [
+            a for key, a in self.active.items() if key not in found and key[0] in polled
+        ]
+        for anomaly in cleared:
+            del self.active[(anomaly.ip, anomaly.series, anomaly.source)]
+        self.active.update(found)
+        for anomaly in new:
+            log.log_msg(f"Anomaly: {anomaly}", "WARNING", quiet=True)
+        for anomaly in cleared:
+            log.log_msg(
+                f"{anomaly.ip} {anomaly.series} back to normal", "INFO", quiet=True
+            )
+        return new, cleared
+
+    def summary(self) -> str:
+        """Active anomalies for status view"""
+        return ", ".join(str(a) for _, a in sorted(self.active.items()))
+
+
+if __name__ == "__main__":
+    import random
+
+    random.seed(1)
+    detector = AnomalyDetector(enabled=True)
+    for cycle in range(60):
+        statuses = []
+        for n in range(6):
+            status = MinerStatus(
+                f"10.0.0.{n + 1}",
+                miner_type="VolcMiner D1",
+                pool="stratum+tcp://ltc.viabtc.io:3333",
+                hashboards=3,
+                fans=4,
+            )
+            status.hashrate_0 = random.gauss(5130, 40)
+            status.hashrate_1 = random.gauss(5130, 40)
+            status.hashrate_2 = random.gauss(5130, 40)
+            status.temp_0 = status.temp_1 = status.temp_2 = round(random.gauss(61, 1))
+            status.fan_0 = status.fan_1 = status.fan_2 = status.fan_3 = 3300
+            if n == 0:
+                # Board 1 of the first miner slowly sags
+                status.hashrate_1 -= 12 * cycle
+            status.hashrate_total_current = (
+                status.hashrate_0 + status.hashrate_1 + status.hashrate_2
+            )
+            statuses.append(status)
+        new, cleared = detector.update(statuses)
+        for anomaly in new:
+            print(f"cycle {cycle}: {anomaly}")
+    print(detector.summary())
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+import hmac
+import json
+import os
+import select
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bitfarmer.events import EVENTS, KEEPALIVE, EventBus
+from bitfarmer.fleet import FLEET, FleetState
+
+API_HOST = "127.0.0.1"
+API_PORT = 9106
+# Longest a reader may hold a request open waiting for the next poll
+MAX_WAIT = 300
+# Seconds a control request waits for the main loop before answering 202
+CONTROL_WAIT = 60
+CONTROLS = ("stop", "start", "reboot")
+
+
+class Command:
+    """Control request handed from an API thread to the main loop"""
+
+    def __init__(self, ip: str, action: str):
+        self.ip = ip
+        self.action = action
+        self.code = None
+        self.error = None
+        self.done = threading.Event()
+
+    def finish(self, code: int, error: str | None = None):
+        self.code = code
+        self.error = error
+        self.done.set()
+
+
+class CommandQueue:
+    """Control requests for the main loop, readable (for select) when pending"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = deque()
+        self.wake_r, self.wake_w = os.pipe()
+
+    def fileno(self) -> int:
+        return self.wake_r
+
+    def put(self, command: Command):
+        with self.lock:
+            self.commands.append(command)
+        os.write(self.wake_w, b"\0")
+
+    def take(self) -> list:
+        """Pending commands, oldest first"""
+        while select.select([self.wake_r], [], [], 0)[0]:
+            os.read(self.wake_r, 4096)
+        with self.lock:
+            commands = list(self.commands)
+            self.commands.clear()
+        return commands
+
+    def close(self):
+        for command in self.take():
+            command.finish(503, "shutting down")
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Serve fleet snapshot, history and controls
+
+    GET  /api/fleet                     latest status of every miner
+    GET  /api/miners                    configured miner IPs
+    GET  /api/miners/<ip>               latest status of one miner
+    GET  /api/miners/<ip>/history       samples kept in memory (?since=<ts>)
+    GET  /api/events                    Server-Sent Events stream
+    POST /api/miners/<ip>/<action>      stop, start or reboot
+
+    GETs answer 304 when If-None-Match matches the current poll. With
+    ?wait=<seconds> a matching request is held until the next poll instead.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, code: int, data, etag: str | None = None):
+        body = data if isinstance(data, bytes) else json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self, etag: str):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def route(self) -> tuple:
+        """(path parts after /api, query)"""
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if not parts or parts[0] != "api":
+            return None, {}
+        return parts[1:], {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+    def do_GET(self):
+        fleet: FleetState = self.server.fleet
+        parts, query = self.route()
+        try:
+            wait = min(float(query.get("wait", 0)), MAX_WAIT)
+            since = float(query.get("since", 0))
+        except ValueError:
+            self.send_error(400, "wait and since must be numbers")
+            return
+        match parts:
+            case ["fleet"]:
+                view = None
+            case ["miners"]:
+                view = fleet.ips
+            case ["miners", ip]:
+                view = lambda: fleet.miner_state(ip)
+            case ["miners", ip, "history"]:
+                view = lambda: fleet.miner_history(ip, since)
+            case ["events"]:
+                self.stream_events()
+                return
+            case _:
+                self.send_error(404)
+                return
+        etag = fleet.etag()
+        client_etag = self.headers.get("If-None-Match")
+        if client_etag == etag and wait > 0 and fleet.wait(etag, wait):
+            etag = fleet.etag()
+        if client_etag == etag:
+            self.not_modified(etag)
+            return
+        if view is None:
+            _, etag, body = fleet.snapshot()
+            self.send_json(200, body, etag)
+            return
+        data = view()
+        if data is None:
+            self.send_error(404, "Unknown miner")
+            return
+        self.send_json(200, data, etag)
+
+    def stream_events(self):
+        """Send events until the client disconnects"""
+        bus: EventBus = self.server.events
+        subscriber = bus.subscribe()
+        self.close_connection = True
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            while not subscriber.closed:
+                lines = subscriber.get(KEEPALIVE)
+                self.wfile.write(
+                    b"".join(b"data: " + line + b"\n" for line in lines)
+                    or b": keepalive\n\n"
+                )
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            bus.unsubscribe(subscriber)
+
+    def do_POST(self):
+        parts, _ = self.route()
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        match parts:
+            case ["miners", ip, action] if action in CONTROLS:
+                pass
+            case _:
+                self.send_error(404)
+                return
+        token = self.server.token
+        if not token:
+            self.send_error(403, "Set api.token to enable controls")
+            return
+        if self.headers.get("Origin") is not None:
+            # Sent by browsers only, scripts don't need it: refuse cross-site posts
+            self.send_error(403, "Cross-origin request")
+            return
+        if not hmac.compare_digest(
+            self.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+        ):
+            self.send_error(401)
+            return
+        command = Command(ip, action)
+        self.server.commands.put(command)
+        if not command.done.wait(CONTROL_WAIT):
+            self.send_json(202, {"ip": command.ip, "action": command.action})
+            return
+        if command.error is not None:
+            self.send_json(command.code, {"error": command.error})
+            return
+        self.send_json(command.code, {"ip": command.ip, "action": command.action})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiServer:
+    """Local fleet API on a background thread"""
+
+    def __init__(
+        self,
+        commands: CommandQueue,
+        host: str = API_HOST,
+        port: int = API_PORT,
+        token: str = "",
+        fleet: FleetState = FLEET,
+        events: EventBus = EVENTS,
+    ):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.server = ThreadingHTTPServer((host, port), ApiHandler)
+        self.server.daemon_threads = True
+        self.server.fleet = fleet
+        self.server.events = events
+        self.server.commands = commands
+        self.server.token = token
+        self.thread = None
+
+    @classmethod
+    def from_conf(cls, conf: dict, commands: CommandQueue):
+        """Build server from api section of config"""
+        ac = conf["api"]
+        return cls(
+            commands,
+            ac.get("host", API_HOST),
+            ac.get("port", API_PORT),
+            ac.get("token", ""),
+        )
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    from urllib.request import Request, urlopen
+
+    from bitfarmer.miner import MinerStatus
+
+    FLEET.update([MinerStatus("10.0.0.1", hashboards=3, fans=4)], ["10.0.0.1"])
+    commands = CommandQueue()
+    server = ApiServer(commands, "127.0.0.1", 0, "demo").start()
+    url = f"http://127.0.0.1:{server.server.server_address[1]}/api"
+    with urlopen(f"{url}/fleet") as resp:
+        etag = resp.headers["ETag"]
+        print(etag, resp.read().decode())
+    threading.Timer(1, FLEET.update, ([], ["10.0.0.1"])).start()
+    req = Request(f"{url}/fleet?wait=10", headers={"If-None-Match": etag})
+    with urlopen(req) as resp:
+        print(resp.headers["ETag"], resp.read().decode())
+    threading.Timer(1, lambda: [c.finish(200) for c in commands.take()]).start()
+    req = Request(
+        f"{url}/miners/10.0.0.1/reboot",
+        method="POST",
+        headers={"Authorization": "Bearer demo"},
+    )
+    with urlopen(req) as resp:
+        print(resp.status, resp.read().decode())
+    server.stop()
+    commands.close()
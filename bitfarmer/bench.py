@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+
+import bitfarmer.bitfarmer as bitfarmer
+import bitfarmer.config as config
+import bitfarmer.log as log
+from bitfarmer.elphapex import ElphapexDG1
+from bitfarmer.fixtures import load_fixture
+from bitfarmer.miner import MinerStatus
+from bitfarmer.poller import Poller
+from bitfarmer.settings import Settings
+from bitfarmer.volcminer import VolcminerD1, parse_volc_resp
+
+ELPHAPEX_ENDPOINTS = [
+    "/cgi-bin/stats.cgi",
+    "/cgi-bin/pools.cgi",
+    "/cgi-bin/get_network_info.cgi",
+]
+VOLCMINER_ENDPOINTS = [
+    "/cgi-bin/get_miner_statusV1.cgi",
+    "/cgi-bin/get_system_infoV1.cgi",
+]
+FLEET_SIZES = [10, 100, 1000]
+STARTUP_PORT = 18999
+FIRST_STATUS_SCRIPT = """
+import json, sys
+import bitfarmer.bitfarmer as bitfarmer
+bitfarmer.config.DATA_DIR = sys.argv[2]
+miners = bitfarmer.get_miners(json.loads(sys.argv[1]))
+miners[0].get_miner_status()
+"""
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.2
+
+
+ELPHAPEX_FIXTURES = {uri: load_fixture("elphapex", uri) for uri in ELPHAPEX_ENDPOINTS}
+VOLCMINER_FIXTURES = {
+    uri: load_fixture("volcminer", uri) for uri in VOLCMINER_ENDPOINTS
+}
+
+
+def fixture_miner_conf(ip: str, miner_type: str) -> dict:
+    """Miner config entry for benchmark fleet"""
+    return {
+        "ip": ip,
+        "type": miner_type,
+        "login": "root",
+        "password": "root",
+        "tod": True,
+        "primary_pool": "stratum+tcp://ltc.viabtc.io:3333",
+        "primary_pool_user": "XXXX.worker1",
+        "primary_pool_pass": "123",
+        "secondary_pool": "stratum+tcp://ltc.f2pool.com:8888",
+        "secondary_pool_user": "XXXX.worker1",
+        "secondary_pool_pass": "123",
+    }
+
+
+class ReplayElphapexDG1(ElphapexDG1):
+    """DG1+ answering from recorded fixtures"""
+
+    def get(self, uri: str) -> dict:
+        """GET request (recorded)"""
+        return json.loads(ELPHAPEX_FIXTURES[uri])
+
+
+class ReplayVolcminerD1(VolcminerD1):
+    """VolcMiner D1 answering from recorded fixtures"""
+
+    def get(self, uri: str) -> dict:
+        """GET request (recorded)"""
+        return parse_volc_resp(VOLCMINER_FIXTURES[uri])
+
+
+def fixture_fleet(size: int) -> list:
+    """Build fleet of replay miners split evenly between types"""
+    miners = []
+    for i in range(size):
+        ip = f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+        if i % 2 == 0:
+            miners.append(ReplayElphapexDG1(fixture_miner_conf(ip, "DG1+/DGHome")))
+        else:
+            miners.append(ReplayVolcminerD1(fixture_miner_conf(ip, "VolcMiner D1")))
+    return miners
+
+
+@contextmanager
+def bench_env():
+    """Point logs at a scratch dir and skip ping for the duration of a run"""
+    data_dir, ping = config.DATA_DIR, config.ping
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DATA_DIR = tmp + "/"
+        config.ping = lambda addr: True
+        try:
+            yield tmp
+        finally:
+            config.DATA_DIR, config.ping = data_dir, ping
+
+
+def measure(fn, repeat: int, number: int) -> dict:
+    """Time fn number times per sample over repeat samples"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "number": number,
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "min": samples[0],
+        "max": samples[-1],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def result(name: str, stats: dict, items: int = 1, fleet_size: int = 0) -> dict:
+    """Benchmark result record"""
+    return {
+        "name": name,
+        "fleet_size": fleet_size,
+        "items": items,
+        "unit": "s",
+        "items_per_sec": items / stats["median"] if stats["median"] else 0.0,
+        **stats,
+    }
+
+
+def bench_parsing(repeat: int) -> list:
+    """Time parsing of recorded responses"""
+    results = []
+    for uri, text in ELPHAPEX_FIXTURES.items():
+        stats = measure(lambda: json.loads(text), repeat, 200)
+        results.append(result(f"parse.elphapex.{os.path.basename(uri)}", stats))
+    for uri, text in VOLCMINER_FIXTURES.items():
+        stats = measure(lambda: parse_volc_resp(text), repeat, 200)
+        results.append(result(f"parse.volcminer.{os.path.basename(uri)}", stats))
+    return results
+
+
+def bench_status(repeat: int) -> list:
+    """Time MinerStatus construction from recorded responses"""
+    dg = ReplayElphapexDG1(fixture_miner_conf("10.0.0.1", "DG1+/DGHome"))
+    volc = ReplayVolcminerD1(fixture_miner_conf("10.0.0.2", "VolcMiner D1"))
+    return [
+        result("status.elphapex", measure(dg.get_miner_status, repeat, 200)),
+        result("status.volcminer", measure(volc.get_miner_status, repeat, 200)),
+    ]
+
+
+def bench_render(repeat: int) -> list:
+    """Time status rendering"""
+    stats = ReplayVolcminerD1(
+        fixture_miner_conf("10.0.0.2", "VolcMiner D1")
+    ).get_miner_status()
+    results = []
+    with redirect_stdout(io.StringIO()):
+        for icons in (False, True):
+            suffix = ".icons" if icons else ""
+            results.append(
+                result(
+                    f"render.pprint{suffix}",
+                    measure(lambda: stats.pprint(icons), repeat, 200),
+                )
+            )
+            results.append(
+                result(
+                    f"render.print_small{suffix}",
+                    measure(lambda: stats.print_small(icons), repeat, 200),
+                )
+            )
+    return results
+
+
+def bench_log_stats(repeat: int) -> list:
+    """Time log_stats throughput"""
+    line = str(MinerStatus("10.0.0.1"))
+    lines = 1000
+    with bench_env():
+
+        def write():
+            for _ in range(lines):
+                log.log_stats(line)
+
+        stats = measure(write, repeat, 1)
+    return [result("log_stats", stats, items=lines)]
+
+
+def bench_poll_cycle(repeat: int, sizes: list) -> list:
+    """Time whole poll cycles for fleets of replay miners"""
+    results = []
+    for view in ("full", "small"):
+        settings = Settings(view=view, icons=False)
+        for size in sizes:
+            miners = fixture_fleet(size)
+            poller = Poller(bitfarmer.poll_miner)
+            with bench_env(), redirect_stdout(io.StringIO()):
+                stats = measure(
+                    lambda: bitfarmer.poll_miners(miners, settings, poller),
+                    max(3, repeat // max(1, size // 100)),
+                    1,
+                )
+            poller.close()
+            results.append(
+                result(f"poll_cycle.{view}", stats, items=size, fleet_size=size)
+            )
+    return results
+
+
+def time_command(args: list) -> float:
+    """Wall time of a fresh interpreter running args"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+    )
+    return time.perf_counter() - start
+
+
+def bench_startup(repeat: int) -> list:
+    """Time interpreter start, import, CLI start and first status of a miner"""
+    from bitfarmer.simulator import Simulator, build_fleet
+
+    results = []
+    commands = {
+        "startup.python": ["-c", "pass"],
+        "startup.import": ["-c", "import bitfarmer.bitfarmer"],
+        "startup.help": ["-m", "bitfarmer.bitfarmer", "--help"],
+    }
+    for name, args in commands.items():
+        stats = measure(lambda: time_command(args), repeat, 1)
+        results.append(result(name, stats))
+    with (
+        Simulator(build_fleet(1, 0, base_port=STARTUP_PORT, seed=0)) as sim,
+        bench_env() as tmp,
+    ):
+        entries = json.dumps({"miners": sim.conf_entries()})
+        # Logs go to the scratch dir, not the user's data dir
+        args = ["-c", FIRST_STATUS_SCRIPT, entries, f"{tmp}/"]
+        stats = measure(lambda: time_command(args), repeat, 1)
+        results.append(result("startup.first_status", stats))
+    return results
+
+
+def run(repeat: int, sizes: list, startup: bool = True) -> dict:
+    """Run all benchmarks"""
+    results = []
+    if startup:
+        results += bench_startup(repeat)
+    results += bench_parsing(repeat)
+    results += bench_status(repeat)
+    results += bench_render(repeat)
+    results += bench_log_stats(repeat)
+    results += bench_poll_cycle(repeat, sizes)
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Return results whose median regressed beyond threshold"""
+    base = {(r["name"], r["fleet_size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        key = (r["name"], r["fleet_size"])
+        if key not in base or base[key]["median"] <= 0:
+            continue
+        change = r["median"] / base[key]["median"] - 1
+        if change > threshold:
+            regressions.append(
+                {"name": r["name"], "fleet_size": r["fleet_size"], "change": change}
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m bitfarmer.bench",
+        description="Benchmark bitfarmer against recorded miner responses",
+    )
+    parser.add_argument("-o", "--output", help="write JSON results to file")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=15, help="samples per benchmark"
+    )
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=FLEET_SIZES,
+        help="fleet sizes for poll cycle",
+    )
+    parser.add_argument(
+        "-c", "--compare", help="baseline JSON results to compare against"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="allowed median slowdown before failing (0.2 = 20%%)",
+    )
+    parser.add_argument(
+        "--no-startup",
+        action="store_true",
+        help="skip startup benchmarks (spawn interpreters)",
+    )
+    args = parser.parse_args()
+    results = run(args.repeat, args.sizes, startup=not args.no_startup)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for reg in regressions:
+            print(
+                f"REGRESSION {reg['name']} (fleet {reg['fleet_size']}): +{reg['change']:.1%}",
+                file=sys.stderr,
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
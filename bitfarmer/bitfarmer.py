@@ -1,34 +1,53 @@
 #!/usr/bin/env python3
 
+import argparse
+import copy
 import json
 import os
 import select
 import sys
 import time
-from datetime import datetime
+from dataclasses import asdict
 from typing import Optional
 
-from yaspin import yaspin
-
 import bitfarmer.coloring as coloring
 import bitfarmer.config as config
 import bitfarmer.log as log
 import bitfarmer.ntp as ntp
-import bitfarmer.weather as weather
-from bitfarmer.elphapex import ElphapexDG1
-from bitfarmer.volcminer import VolcminerD1
-from bitfarmer.weather import Weather
+import bitfarmer.profiling as profiling
+import bitfarmer.reconcile as reconcile
+import bitfarmer.state as state
+from bitfarmer.alerts import AlertEngine
+from bitfarmer.anomaly import AnomalyDetector
+import bitfarmer.shares as shares
+from bitfarmer.bulk import held as bulk_held
+from bitfarmer.api import API_HOST, API_PORT, ApiServer, CommandQueue
+from bitfarmer.cluster import CLUSTER_LISTEN, TOKEN_ENV, Coordinator, Worker
+from bitfarmer.drivers import MinerPool
+from bitfarmer.events import EVENTS, EVENTS_QUEUE, EVENTS_SOCKET, EventSocket
+from bitfarmer.fleet import FLEET
+from bitfarmer.metrics import METRICS, METRICS_HOST, METRICS_PORT, MetricsServer
+from bitfarmer.miner import MinerStatus
+from bitfarmer.poller import Poller, PollResult
+from bitfarmer.pools import PoolProber
+from bitfarmer.ramp import PowerRamp
+from bitfarmer.reconcile import Reconciler
+from bitfarmer.schedule import Schedules
+from bitfarmer.settings import ConfigError, Settings
+from bitfarmer.shares import SHARES
+from bitfarmer.state import StateStore
+from bitfarmer.thermal import ThermalController, to_celsius
+from bitfarmer.watch import ConfigWatcher
+from bitfarmer.weather import WEATHER_CACHE, WeatherService
 
 # TODO:
-#   - get weather
-#       + handle errors
-#       + run hourly
-#   - log weather
 #   - log levels -> enum
 #   - Miner types -> enum
-#   - Temp Control
 
 WAIT_TIME = 60
+# Seconds a manual start waits for miners to hash before returning to the loop
+START_WAIT = 120
+MINERS = MinerPool()
 BANNER = """   ___  _ __  ____
   / _ )(_) /_/ __/__ _______ _  ___ ____
  / _  / / __/ _// _ `/ __/  ' \\/ -_) __/
@@ -47,8 +66,8 @@ def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
 
 
-def get_input(prompt: str, timeout: int) -> str | None:
-    """Get user input with timeout"""
+def get_input(prompt: str, timeout: int, wake: tuple = ()) -> str | None:
+    """Get user input with timeout, returning early if any of wake becomes readable"""
     action_prompt = ""
     for action in ACTIONS:
         action_prompt += coloring.secondary_color(
@@ -56,204 +75,647 @@ def get_input(prompt: str, timeout: int) -> str | None:
         ) + coloring.primary_color(f" -> {action['expl']}, ")
     print(action_prompt)
     print(coloring.primary_color(prompt), end="", flush=True)
-    rlist, _, _ = select.select([sys.stdin], [], [], timeout)
-    if rlist:
+    rlist, _, _ = select.select([sys.stdin, *wake], [], [], timeout)
+    if sys.stdin in rlist:
         return sys.stdin.readline().strip().lower()
     return None
 
 
-def perform_action(action: str, conf: dict) -> dict:
+def perform_action(action: str, settings: Settings, reconciler: Reconciler) -> Settings:
     """Perform actions by user"""
     match action:
         case "a":
-            conf = config.add_miner(conf)
-            conf = config.reload_config(conf)
+            settings = save_settings(
+                config.add_miner(copy.deepcopy(settings.raw)), settings
+            )
         case "e":
-            conf = config.edit_conf(conf)
-            conf = config.reload_config(conf)
+            settings = save_settings(
+                config.edit_conf(copy.deepcopy(settings.raw)), settings
+            )
         case "s":
-            _ = stop_miners(conf, False, all_miners=True)
+            reconciler.hold(settings.ips(), False)
+            EVENTS.publish_actions([(ip, "stop") for ip in settings.ips()], "user")
+            _ = stop_miners(settings.raw, False, all_miners=True)
         case "r":
-            _ = start_miners(conf, False, all_miners=True)
+            reconciler.release(settings.ips())
+            EVENTS.publish_actions([(ip, "start") for ip in settings.ips()], "user")
+            _ = start_miners(settings.raw, False, all_miners=True)
         case "x":
             coloring.print_success("Goodbye")
             sys.exit(0)
         case _:
             coloring.print_warn("Invalid action")
             time.sleep(3)
-    return conf
+    return settings
+
+
+def save_settings(conf: dict, settings: Settings) -> Settings:
+    """Validate and write edited config, keeping current settings if invalid"""
+    try:
+        return config.reload_config(conf)
+    except ConfigError as e:
+        log.log_msg("Config not saved", "ERROR", exc=e)
+        time.sleep(3)
+        return settings
+
+
+def apply_settings(
+    settings: Settings,
+    reconciler: Reconciler,
+    thermal: ThermalController,
+    detector: AnomalyDetector,
+    alerts: AlertEngine,
+    poller: Poller,
+    prober: PoolProber,
+) -> tuple:
+    """Build miners and schedules for new settings, then swap them in"""
+    schedules = Schedules(settings.raw)
+    miners = get_miners(settings.raw)
+    reconciler.configure(settings.raw)
+    thermal.configure(settings.raw)
+    detector.configure(settings.raw)
+    alerts.configure(settings.raw)
+    poller.configure(settings.raw)
+    prober.configure(settings.raw)
+    METRICS.prune(settings.ips())
+    SHARES.prune(settings.ips())
+    return miners, schedules
+
+
+def control_temps(
+    miners: list,
+    statuses: list,
+    reconciler: Reconciler,
+    thermal: ThermalController,
+    wtr: WeatherService | None,
+) -> list:
+    """Throttle hot miners, using ambient temperature when weather is available"""
+    current = wtr.current() if wtr is not None else None
+    ambient = to_celsius(current.temp, current.metric) if current else None
+    actions = thermal.update(miners, statuses, reconciler, ambient)
+    summary = thermal.summary()
+    if summary:
+        coloring.print_warn(f"Thermal: {summary}")
+    return actions
+
+
+def detect_anomalies(miners: list, statuses: list, detector: AnomalyDetector):
+    """Learn chain and fan baselines, show and publish anomalies"""
+    new, cleared = detector.update(statuses, {m.ip: m.level for m in miners})
+    for anomaly in new:
+        EVENTS.publish("anomaly", **asdict(anomaly))
+    for anomaly in cleared:
+        EVENTS.publish("anomaly_cleared", ip=anomaly.ip, series=anomaly.series)
+    summary = detector.summary()
+    if summary:
+        coloring.print_warn(f"Anomalies: {summary}")
+
+
+def check_alerts(
+    miners: list, statuses: list, stale: dict, tod_active: dict, alerts: AlertEngine
+):
+    """Evaluate alert rules, show and publish firing alerts"""
+    for alert in alerts.evaluate(miners, statuses, tod_active, stale=stale):
+        EVENTS.publish("alert", **alert)
+    summary = alerts.summary()
+    if summary:
+        coloring.print_warn(f"Alerts: {summary}")
+
+
+def switch_pools(
+    miners: list,
+    statuses: list,
+    reconciler: Reconciler,
+    tod_active: dict,
+    prober: PoolProber,
+) -> list:
+    """Move miners off degraded primary pools, show pool latency ranking"""
+    actions = prober.reassign(miners, statuses, reconciler, tod_active)
+    summary = prober.summary()
+    if summary:
+        coloring.print_info(f"Pools: {summary}")
+    return actions
+
+
+def run_commands(commands: list, miners: list, reconciler: Reconciler):
+    """Carry out stop/start/reboot requests received by the API"""
+    by_ip = {miner.ip: miner for miner in miners}
+    for command in commands:
+        miner = by_ip.get(command.ip)
+        if miner is None:
+            command.finish(404, "Unknown miner")
+            continue
+        log.log_msg(f"API request to {command.action} {miner.ip}", "INFO")
+        try:
+            match command.action:
+                case "stop":
+                    reconciler.hold([miner.ip], False)
+                    if reconcile.needs_config(miner, False):
+                        _ = miner.stop_mining()
+                        log.log_msg(f"{miner.ip} stopped mining", "INFO")
+                    miner.reboot()
+                case "start":
+                    reconciler.release([miner.ip])
+                    if reconcile.needs_config(miner, True):
+                        _ = miner.start_mining()
+                        log.log_msg(f"{miner.ip} started mining", "INFO")
+                case "reboot":
+                    miner.reboot()
+            command.finish(200)
+            EVENTS.publish_actions([(miner.ip, command.action)], "api")
+        except Exception as e:
+            log.log_msg(f"Error running {command.action} on {miner.ip}", "ERROR", exc=e)
+            command.finish(502, str(e))
 
 
 def get_miners(conf: dict) -> list:
-    """Get list of miner objects from config"""
+    """Get list of miner objects from config, reusing unchanged miners"""
     log.log_msg("Gathering miners", "INFO", quiet=True)
-    miners = []
-    for miner_conf in conf["miners"]:
-        match miner_conf["type"]:
-            case "DG1+/DGHome":
-                miners.append(ElphapexDG1(miner_conf))
-            case "VolcMiner D1":
-                miners.append(VolcminerD1(miner_conf))
-            case _:
-                raise ValueError(
-                    f"Invalid miner type in config: {miner_conf['type']} - {miner_conf['ip']}"
-                )
+    added, removed, changed = MINERS.sync(conf)
+    if added or removed or changed:
+        log.log_msg(
+            f"Miners added: {added}, removed: {removed}, changed: {changed}",
+            "INFO",
+            quiet=True,
+        )
     log.log_msg("Gathering miners", "SUCCESS", quiet=True)
-    return miners
+    return MINERS.list()
 
 
-def get_ts(conf: dict) -> int:
+def get_ts(settings: Settings) -> int:
     """Get timestamp"""
     log.log_msg("Gathering time", "INFO", quiet=True)
+    if settings.ntp is None:
+        return int(time.time())
     try:
-        return ntp.get_ts(conf["ntp"]["primary"])
+        return ntp.get_ts(settings.ntp.primary)
     except:
-        log.log_msg(f"NTP server {conf['ntp']['primary']} failed", "WARNING")
+        log.log_msg(f"NTP server {settings.ntp.primary} failed", "WARNING")
     try:
-        return ntp.get_ts(conf["ntp"]["secondary"])
+        return ntp.get_ts(settings.ntp.secondary)
     except:
-        log.log_msg(f"NTP server {conf['ntp']['secondary']} failed", "WARNING")
+        log.log_msg(f"NTP server {settings.ntp.secondary} failed", "WARNING")
     return int(time.time())
 
 
-def is_tod_active(ts: int, conf: dict) -> bool:
-    """Returns true if time of day is currently active"""
-    dt = datetime.fromtimestamp(ts)
-    hour = dt.hour
-    weekday = dt.strftime("%A")
-    date = dt.strftime("%m/%d/%Y")
-    return (
-        weekday in conf["tod_schedule"]["days"]
-        and hour in conf["tod_schedule"]["hours"]
-        and date not in conf["tod_schedule"]["exceptions"]
-    )
+def wait_time(ts: int, schedules: Schedules) -> int:
+    """Seconds to wait for input, cut short at the next TOD transition"""
+    edge = schedules.next_transition(ts)
+    if edge is None:
+        return WAIT_TIME
+    return max(1, min(WAIT_TIME, int(edge - ts)))
 
 
 def stop_miners(conf: dict, for_tod: bool, all_miners: bool = False) -> bool:
     """stop miners"""
+    from yaspin import yaspin
+
     miners = get_miners(conf)
     if for_tod:
         log.log_msg("Stopping miners for time of day metering", "INFO")
     if all_miners:
         log.log_msg("Stopping ALL miners", "INFO")
+    rebooted = 0
     for miner in miners:
         try:
-            if all_miners or miner.tod and for_tod:
+            if miner.managed and (all_miners or miner.tod and for_tod):
+                if not reconcile.needs_config(miner, False):
+                    log.log_msg(f"{miner.ip} already stopped", "INFO")
+                    continue
                 coloring.print_warn(f"Stopping {miner.ip}")
                 _ = miner.stop_mining()
                 log.log_msg(f"{miner.ip} stopped mining", "INFO")
                 miner.reboot()
                 log.log_msg(f"{miner.ip} rebooted", "INFO")
+                rebooted += 1
         except Exception as e:
             log.log_msg(f"Error stopping {miner.ip}", "ERROR", exc=e)
-    with yaspin(
-        text=coloring.info_color(
-            "Miners have been stopped, waiting 2 minutess for reboot"
-        ),
-        color="blue",
-        timer=True,
-    ) as sp:
-        time.sleep(120)
-        sp.ok()
+    if rebooted:
+        with yaspin(
+            text=coloring.info_color(
+                "Miners have been stopped, waiting 2 minutess for reboot"
+            ),
+            color="blue",
+            timer=True,
+        ) as sp:
+            time.sleep(120)
+            sp.ok()
     return True
 
 
 def start_miners(conf: dict, for_tod: bool, all_miners: bool = False) -> bool:
-    """start miners"""
+    """start miners, staggered by the power ramp"""
+    from yaspin import yaspin
+
     miners = get_miners(conf)
     if for_tod:
         log.log_msg("Starting miners for time of day metering", "INFO")
     if all_miners:
         log.log_msg("Starting ALL miners", "INFO")
-    for miner in miners:
+    ramp = PowerRamp.from_conf(conf)
+    targets = [m for m in miners if m.managed and (all_miners or for_tod and m.tod)]
+    ramp_start = time.monotonic()
+    started = []
+    for miner in ramp.order(targets):
         try:
-            if all_miners or for_tod and miner.tod:
-                coloring.print_info(f"Starting {miner.ip}")
-                _ = miner.start_mining()
-                log.log_msg(f"{miner.ip} started mining", "INFO")
+            if not reconcile.needs_config(miner, True):
+                log.log_msg(f"{miner.ip} already mining", "INFO")
+                continue
+            wait = ramp.wait_time(miner, time.monotonic())
+            if wait > 0:
+                with yaspin(
+                    text=coloring.info_color(
+                        f"Ramping power, waiting {wait:.0f}s to start {miner.ip}"
+                    ),
+                    color="blue",
+                    timer=True,
+                ) as sp:
+                    time.sleep(wait)
+                    sp.ok()
+            ramp.record(miner, time.monotonic())
+            coloring.print_info(f"Starting {miner.ip}")
+            _ = miner.start_mining()
+            log.log_msg(f"{miner.ip} started mining", "INFO")
+            started.append(miner)
         except Exception as e:
             log.log_msg(f"Error starting {miner.ip}", "ERROR", exc=e)
-    with yaspin(
-        text=coloring.info_color(
-            "Miners have been started, waiting 2 minutes for configuration to reload"
-        ),
-        color="blue",
-        timer=True,
-    ) as sp:
-        time.sleep(120)
-        sp.ok()
+    if started:
+        with yaspin(
+            text=coloring.info_color(
+                f"Miners have been started, waiting for {len(started)} miners to hash"
+            ),
+            color="blue",
+            timer=True,
+        ) as sp:
+            elapsed = ramp.wait_for_hashrate(
+                started, ramp_start, min(ramp.timeout, START_WAIT)
+            )
+            sp.ok()
+        if elapsed is not None:
+            log.log_msg(f"Fleet at full hashrate after {elapsed:.0f}s", "INFO")
     return False
 
 
-def show_weather(conf: dict, wtr: str, ts: int) -> str:
-    """Show weather on hourly basis"""
-    if ts % 3600 // 60 == 0 or wtr == "":
-        wtr = get_weather(conf)
-        log.log_weather(wtr)
-    return wtr
+def poll_miner(miner) -> tuple:
+    """(status, error type) of one miner, status is None if it could not be polled"""
+    with profiling.span("ping", ip=miner.ip):
+        pingable = config.ping(miner.ip)
+    if not pingable:
+        log.log_msg(f"{miner.ip} not pingable", "ERROR")
+        return None, "Unreachable"
+    try:
+        return miner.get_miner_status(), ""
+    except Exception as e:
+        log.log_msg(f"Error gathering data for {miner.ip}", "ERROR", exc=e)
+        return None, type(e).__name__
 
 
-def get_weather(conf: dict) -> str:
-    """Get weather and log errors"""
-    try:
-        log.log_msg("Gathering weather", "INFO", quiet=True)
-        wtr = weather.get_weather(conf)
-        return str(wtr)
-    except:
+def record_poll(ip: str, status: MinerStatus | None, error: str, seconds: float):
+    """Record poll outcome in metrics"""
+    if status is None:
+        METRICS.count_error(ip, error)
+        METRICS.record_down(ip)
+        return
+    METRICS.observe_poll(ip, seconds)
+    METRICS.record_status(status)
+
+
+def apply_late(result: PollResult):
+    """Record a poll that finished after its cycle's deadline"""
+    record_poll(result.ip, result.status, result.error, result.seconds)
+    if result.status is None:
+        return
+    log.log_msg(
+        f"{result.ip} answered {result.seconds:.0f}s after poll started",
+        "INFO",
+        quiet=True,
+    )
+    SHARES.update(result.status, result.ts)
+    FLEET.apply(result.status, result.ts)
+    log.log_stats(str(result.status))
+
+
+def show_status(status: MinerStatus, settings: Settings, age: float | None = None):
+    """Display and log status of one miner, age is set for a stale status"""
+    if age is None:
+        stats, reset = SHARES.update(status)
+    else:
+        stats, reset = SHARES.stats(status.ip), False
+    if reset:
+        log.log_msg(f"{status.ip} share counters reset (rebooted)", "INFO", quiet=True)
+    with profiling.span("render", ip=status.ip):
+        if age is not None:
+            coloring.print_warn(f"{status.ip} stale, last answered {age:.0f}s ago")
+        if settings.view == "small":
+            status.print_small(settings.icons)
+            print(f"{'':<14}" + shares.summary(stats))
+        else:
+            status.pprint(settings.icons)
+            print(
+                f"\t\t{coloring.primary_color('Share rate:'):31}"
+                + shares.summary(stats)
+            )
+    if age is not None:
         log.log_msg(
-            f"Unable to gather weather for {conf['weather']['area']}", "WARNING"
+            f"{status.ip} stale, last answered {age:.0f}s ago",
+            "WARNING",
+            quiet=True,
         )
-        return ""
+        return
+    with profiling.span("log_stats", ip=status.ip):
+        log.log_stats(str(status))
+        log.log_shares(status.ip, stats)
 
 
-def main():
+def show_results(results: list, settings: Settings) -> tuple:
+    """Display and log poll results, return (statuses, {ip: age} of stale ones)"""
+    statuses = []
+    stale = {}
+    now = time.time()
+    for result in results:
+        if result.stale:
+            stale[result.ip] = result.age(now)
+            show_status(result.status, settings, stale[result.ip])
+            statuses.append(result.status)
+            continue
+        record_poll(result.ip, result.status, result.error, result.seconds)
+        if result.status is None:
+            continue
+        show_status(result.status, settings)
+        statuses.append(result.status)
+    return statuses, stale
+
+
+def show_snapshot(results: list, settings: Settings, saved: float):
+    """Display statuses restored from the last run until the first poll"""
+    clear_screen()
+    coloring.print_primary(BANNER)
+    coloring.print_info(f"Restored from {time.ctime(saved)}, polling miners")
+    show_results(results, settings)
+
+
+def poll_miners(miners: list, settings: Settings, poller: Poller) -> tuple:
+    """Gather, display and log status of miners within the poll deadline"""
+    with profiling.span("poll"):
+        results = poller.cycle(miners)
+    return show_results(results, settings)
+
+
+def poll_cluster(
+    coordinator: Coordinator, miners: list, settings: Settings, poller: Poller
+) -> tuple:
+    """Display and log statuses polled by workers, polling here if none are up"""
+    with profiling.span("cluster"):
+        polled = coordinator.collect()
+    if polled is None:
+        log.log_msg("No cluster workers, polling locally", "WARNING", quiet=True)
+        return poll_miners(miners, settings, poller)
+    results = []
+    for miner in miners:
+        if miner.ip not in polled:
+            # Worker missed the cycle, carry the last result forward
+            results.append(poller.carry(miner.ip))
+            continue
+        result = polled[miner.ip]
+        if not result.stale:
+            poller.keep(result)
+        results.append(result)
+    return show_results(results, settings)
+
+
+def cluster_coordinator(
+    settings: Settings, coordinator: Coordinator | None
+) -> Coordinator | None:
+    """(Re)start coordinator when cluster settings change, reassigning miners"""
+    cc = settings.raw.get("cluster")
+    if coordinator is not None:
+        if cc is not None and coordinator.key() == (
+            cc.get("listen", CLUSTER_LISTEN),
+            cc.get("workers", 0),
+            cc.get("token", ""),
+        ):
+            coordinator.configure(settings.raw)
+            return coordinator
+        coordinator.stop()
+    if cc is None:
+        return None
+    try:
+        return Coordinator.from_conf(settings.raw).start()
+    except (OSError, ValueError) as e:
+        log.log_msg("Unable to start cluster coordinator", "ERROR", exc=e)
+        return None
+
+
+def metrics_server(
+    settings: Settings, server: MetricsServer | None
+) -> MetricsServer | None:
+    """(Re)start /metrics endpoint when metrics settings change"""
+    mc = settings.raw.get("metrics")
+    if server is not None:
+        if mc is not None and (server.host, server.port) == (
+            mc.get("host", METRICS_HOST),
+            mc.get("port", METRICS_PORT),
+        ):
+            return server
+        server.stop()
+    if mc is None:
+        return None
+    try:
+        return MetricsServer.from_conf(settings.raw).start()
+    except OSError as e:
+        log.log_msg("Unable to start metrics endpoint", "ERROR", exc=e)
+        return None
+
+
+def api_server(
+    settings: Settings, server: ApiServer | None, commands: CommandQueue
+) -> ApiServer | None:
+    """(Re)start local fleet API when api settings change"""
+    ac = settings.raw.get("api")
+    if server is not None:
+        if ac is not None and (server.host, server.port, server.token) == (
+            ac.get("host", API_HOST),
+            ac.get("port", API_PORT),
+            ac.get("token", ""),
+        ):
+            return server
+        server.stop()
+    if ac is None:
+        return None
+    try:
+        return ApiServer.from_conf(settings.raw, commands).start()
+    except OSError as e:
+        log.log_msg("Unable to start fleet API", "ERROR", exc=e)
+        return None
+
+
+def events_socket(settings: Settings, server: EventSocket | None) -> EventSocket | None:
+    """(Re)start event stream socket when events settings change"""
+    ec = settings.raw.get("events")
+    EVENTS.maxlen = (ec or {}).get("queue", EVENTS_QUEUE)
+    path = None
+    if ec is not None:
+        path = ec.get("socket", f"{config.DATA_DIR}{EVENTS_SOCKET}")
+    if server is not None:
+        if server.path == path:
+            return server
+        server.stop()
+    if ec is None:
+        return None
+    try:
+        return EventSocket.from_conf(settings.raw, config.DATA_DIR).start()
+    except OSError as e:
+        log.log_msg("Unable to start event socket", "ERROR", exc=e)
+        return None
+
+
+def weather_service(
+    settings: Settings, service: WeatherService | None
+) -> WeatherService | None:
+    """(Re)start background weather service when weather settings change"""
+    if service is not None:
+        if service.conf["weather"] == settings.raw.get("weather"):
+            return service
+        service.stop()
+    if settings.weather is None:
+        return None
+    return WeatherService.from_conf(
+        settings.raw, f"{config.DATA_DIR}{WEATHER_CACHE}"
+    ).start()
+
+
+def monitor():
+    """Interactive monitoring and control loop"""
+    watcher = None
+    wtr = None
+    exporter = None
+    api = None
+    coordinator = None
+    stream = None
+    alerts = None
+    poller = None
+    prober = None
+    store = None
+    commands = CommandQueue()
     try:
         log.log_msg("Startup", "INFO", quiet=True)
-        miners_have_been_stopped = False
         log.log_msg("Gathering configuration", "INFO", quiet=True)
-        conf = config.get_conf()
-        miners = get_miners(conf)
-        # wtr_str = get_weather(conf)
+        settings = Settings.from_dict(config.get_conf())
+        miners = get_miners(settings.raw)
+        reconciler = Reconciler.from_conf(settings.raw)
+        thermal = ThermalController.from_conf(settings.raw)
+        detector = AnomalyDetector.from_conf(settings.raw)
+        alerts = AlertEngine.from_conf(settings.raw)
+        poller = Poller.from_conf(settings.raw, poll_miner, apply_late)
+        prober = PoolProber.from_conf(settings.raw).start()
+        store = StateStore.from_conf(settings.raw, config.DATA_DIR)
+        snap = store.load()
+        if snap is not None:
+            results = state.restore(snap, settings.ips(), reconciler, thermal, poller)
+            snap = None if results is None else snap
+        if snap is not None:
+            show_snapshot(results, settings, snap["saved"])
+            store.restore_history(settings.ips())
+            log.log_msg(f"Restored state of {len(results)} miners", "INFO", quiet=True)
+        schedules = Schedules(settings.raw)
+        watcher = ConfigWatcher(f"{config.CONF_DIR}{config.CONF_FILE}").start(settings)
+        wtr = weather_service(settings, None)
+        exporter = metrics_server(settings, None)
+        api = api_server(settings, None, commands)
+        coordinator = cluster_coordinator(settings, None)
+        stream = events_socket(settings, None)
         while True:
-            clear_screen()
-            ts = get_ts(conf)
+            profiling.begin_cycle()
+            if snap is None:
+                clear_screen()
+            snap = None
+            ts = get_ts(settings)
             coloring.print_primary(BANNER)
             coloring.print_info(time.ctime(ts))
-            # wtr_str = show_weather(conf, wtr_str, ts)
-            # if wtr_str:
-            #     print(wtr_str)
-            if is_tod_active(ts, conf) and not miners_have_been_stopped:
-                try:
-                    miners_have_been_stopped = stop_miners(conf, True)
-                except Exception as e:
-                    log.log_msg("Error stopping miners", "ERROR", exc=e)
-                    time.sleep(5)
-            if not is_tod_active(ts, conf) and miners_have_been_stopped:
-                try:
-                    miners_have_been_stopped = start_miners(conf, True)
-                except Exception as e:
-                    log.log_msg("Error starting miners", "ERROR", exc=e)
-                    time.sleep(5)
-            for miner in miners:
-                if not config.ping(miner.ip):
-                    log.log_msg(f"{miner.ip} not pingable", "ERROR")
-                    continue
-                try:
-                    stats = miner.get_miner_status()
-                    if conf["view"] == "small":
-                        stats.print_small(conf["icons"])
-                    else:
-                        stats.pprint(conf["icons"])
-                    log.log_stats(str(stats))
-                except Exception as e:
-                    log.log_msg(
-                        f"Error gathering data for {miner.ip}", "ERROR", exc=e)
-                    time.sleep(5)
-            user_input = get_input("Action: ", WAIT_TIME)
+            if wtr is not None:
+                print(wtr)
+            tod_active = schedules.active(ts)
+            cycle_start = time.perf_counter()
+            if coordinator is None:
+                statuses, stale = poll_miners(miners, settings, poller)
+            else:
+                statuses, stale = poll_cluster(coordinator, miners, settings, poller)
+            FLEET.update(statuses, settings.ips(), stale=stale)
+            EVENTS.publish_statuses(statuses, settings.ips(), stale)
+            fresh = [s for s in statuses if s.ip not in stale]
+            # Miners a bulk run is configuring are left to it
+            pending = bulk_held()
+            controlled = [m for m in miners if m.ip not in pending]
+            try:
+                with profiling.span("anomaly"):
+                    detect_anomalies(miners, fresh, detector)
+            except Exception as e:
+                log.log_msg("Error detecting anomalies", "ERROR", exc=e)
+            try:
+                with profiling.span("thermal"):
+                    actions = control_temps(controlled, fresh, reconciler, thermal, wtr)
+                EVENTS.publish_actions(actions, "thermal")
+            except Exception as e:
+                log.log_msg("Error controlling temperatures", "ERROR", exc=e)
+            try:
+                with profiling.span("reconcile"):
+                    actions = reconciler.reconcile(controlled, fresh, tod_active)
+                EVENTS.publish_actions(actions, "reconcile")
+            except Exception as e:
+                log.log_msg("Error reconciling miners", "ERROR", exc=e)
+                time.sleep(5)
+            try:
+                with profiling.span("pools"):
+                    actions = switch_pools(
+                        controlled, fresh, reconciler, tod_active, prober
+                    )
+                EVENTS.publish_actions(actions, "pools")
+            except Exception as e:
+                log.log_msg("Error switching pools", "ERROR", exc=e)
+            try:
+                with profiling.span("alerts"):
+                    check_alerts(miners, statuses, stale, tod_active, alerts)
+            except Exception as e:
+                log.log_msg("Error checking alerts", "ERROR", exc=e)
+            METRICS.observe_cycle(time.perf_counter() - cycle_start)
+            if store.due():
+                store.save(state.capture(reconciler, thermal))
+            breakdown = profiling.end_cycle()
+            if breakdown:
+                coloring.print_info(breakdown)
+            user_input = get_input(
+                "Action: ", wait_time(ts, schedules), (watcher, commands)
+            )
+            run_commands(commands.take(), miners, reconciler)
             if user_input is not None:
-                conf = perform_action(user_input, conf)
-                miners = get_miners(conf)
-    except json.JSONDecodeError as e:
+                new_settings = perform_action(user_input, settings, reconciler)
+            else:
+                new_settings = watcher.take()
+            if new_settings is None or new_settings is settings:
+                continue
+            try:
+                miners, schedules = apply_settings(
+                    new_settings,
+                    reconciler,
+                    thermal,
+                    detector,
+                    alerts,
+                    poller,
+                    prober,
+                )
+                settings = new_settings
+                watcher.applied(settings)
+                store.configure(settings.raw)
+                wtr = weather_service(settings, wtr)
+                exporter = metrics_server(settings, exporter)
+                api = api_server(settings, api, commands)
+                coordinator = cluster_coordinator(settings, coordinator)
+                stream = events_socket(settings, stream)
+                log.log_msg("Configuration reloaded", "INFO", quiet=True)
+            except Exception as e:
+                log.log_msg("Unable to apply config change", "ERROR", exc=e)
+                time.sleep(5)
+    except (json.JSONDecodeError, ConfigError) as e:
         log.log_msg("Config error", "CRITICAL", exc=e)
         sys.exit(1)
     except KeyboardInterrupt:
@@ -262,6 +724,139 @@ def main():
     except Exception as e:
         log.log_msg("Unknown error", "CRITICAL", exc=e)
         sys.exit(1)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if wtr is not None:
+            wtr.stop()
+        if exporter is not None:
+            exporter.stop()
+        if api is not None:
+            api.stop()
+        if coordinator is not None:
+            coordinator.stop()
+        if stream is not None:
+            stream.stop()
+        if alerts is not None:
+            alerts.close()
+        if poller is not None:
+            poller.close()
+        if prober is not None:
+            prober.stop()
+        if store is not None:
+            store.save(state.capture(reconciler, thermal), wait=True)
+        commands.close()
+
+
+def discover_miners(args: argparse.Namespace):
+    """Scan network for miners, print or merge config entries"""
+    import bitfarmer.discover as discover
+
+    log.log_msg(f"Discovering miners in {args.cidr}", "INFO", quiet=True)
+    found = discover.discover(
+        args.cidr,
+        port=args.port,
+        login=args.login,
+        password=args.password,
+        workers=args.workers,
+    )
+    log.log_msg(f"Discovered {len(found)} miners in {args.cidr}", "INFO", quiet=True)
+    conf = {}
+    if os.path.isfile(f"{config.CONF_DIR}{config.CONF_FILE}"):
+        conf = config.read_conf()
+    elif args.merge:
+        coloring.print_warn("No configuration to merge into, run bitfarmer first")
+        sys.exit(1)
+    entries = [
+        discover.miner_entry(miner, conf, args.login, args.password) for miner in found
+    ]
+    if not args.merge:
+        print(json.dumps(entries, indent=4))
+        return
+    for miner in found:
+        if not miner.get("auth", True):
+            coloring.print_warn(
+                f"{miner['ip']} rejected login, fix credentials in config"
+            )
+    conf, added = discover.merge(conf, entries)
+    config.write_config(conf)
+    for entry in added:
+        coloring.print_info(f"Added {entry['ip']} ({entry['type']})")
+    coloring.print_success(
+        f"Added {len(added)} of {len(found)} discovered miners as unmanaged, "
+        "set pool users and remove 'managed' with 'e'"
+    )
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(prog="bitfarmer", description="ASIC manager")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"time each poll phase, write {profiling.PROFILE_LOG} and "
+        f"{profiling.PROFILE_TRACE} (Chrome trace) to the data directory",
+    )
+    commands = parser.add_subparsers(dest="command")
+    disc = commands.add_parser(
+        "discover", help="scan a network for miners and fingerprint their model"
+    )
+    disc.add_argument("cidr", help="network to scan, e.g. 172.16.0.0/22")
+    disc.add_argument("--port", type=int, default=80, help="miner web port")
+    disc.add_argument("--login", default="root", help="login for new entries")
+    disc.add_argument("--password", default="root", help="password for new entries")
+    disc.add_argument("--workers", type=int, default=256, help="concurrent probes")
+    disc.add_argument(
+        "--merge", action="store_true", help="add new miners to configuration"
+    )
+    work = commands.add_parser(
+        "worker", help="poll the share of miners assigned by a cluster coordinator"
+    )
+    work.add_argument("addr", help="coordinator host:port or Unix socket path")
+    work.add_argument(
+        "--token",
+        default=os.environ.get(TOKEN_ENV, ""),
+        help=f"cluster token (default ${TOKEN_ENV})",
+    )
+    stat = commands.add_parser(
+        "status", help="poll miners and print their status for scripts and checks"
+    )
+    import bitfarmer.status as status_cmd
+
+    status_cmd.add_arguments(stat)
+    bulk = commands.add_parser(
+        "bulk", help="change pools, users or tuning on many miners at once"
+    )
+    import bitfarmer.bulk as bulk_cmd
+
+    bulk_cmd.add_arguments(bulk)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    if args.profile:
+        profiling.enable(config.DATA_DIR)
+    match args.command:
+        case "discover":
+            discover_miners(args)
+        case "status":
+            import bitfarmer.status as status_cmd
+
+            sys.exit(status_cmd.run(args))
+        case "bulk":
+            import bitfarmer.bulk as bulk_cmd
+
+            sys.exit(bulk_cmd.run(args))
+        case "worker":
+            log.log_msg(f"Worker polling for {args.addr}", "INFO", quiet=True)
+            try:
+                Worker(args.addr, args.token).run()
+            except KeyboardInterrupt:
+                pass
+        case _:
+            monitor()
 
 
 if __name__ == "__main__":
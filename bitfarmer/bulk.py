@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+
+import argparse
+import ipaddress
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import bitfarmer.coloring as coloring
+import bitfarmer.config as config
+import bitfarmer.drivers as drivers
+import bitfarmer.log as log
+from bitfarmer.reconcile import is_mining
+from bitfarmer.settings import ConfigError, MinerSettings
+
+FAILED_FILE = "bulk_failed.json"
+# Miners being configured, left alone by a running monitor until released
+PENDING_FILE = "bulk_pending.json"
+# Seconds a run that died without releasing its miners keeps holding them
+PENDING_TTL = 600
+BULK_WORKERS = 16
+# Option dest -> miner config key
+CHANGES = {
+    "primary_pool": "primary_pool",
+    "primary_user": "primary_pool_user",
+    "primary_pass": "primary_pool_pass",
+    "secondary_pool": "secondary_pool",
+    "secondary_user": "secondary_pool_user",
+    "secondary_pass": "secondary_pool_pass",
+    "freq": "freq",
+    "voltage": "voltage",
+}
+# Only set on miners that can be tuned
+TUNING = ("freq", "voltage")
+SECRETS = ("pass", "pw", "password")
+APPLIED = "applied"
+SAVED = "saved"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+
+@dataclass(slots=True)
+class Outcome:
+    """Result of one miner in a bulk run"""
+
+    ip: str
+    result: str
+    detail: str = ""
+    seconds: float = 0.0
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Options of the bulk command"""
+    sel = parser.add_argument_group("select miners (all given must match)")
+    sel.add_argument(
+        "--ip",
+        action="append",
+        default=[],
+        help="IP, range (a-b) or network (a/24), repeatable",
+    )
+    sel.add_argument("--type", help="miner type, e.g. volc or dg1")
+    tod = sel.add_mutually_exclusive_group()
+    tod.add_argument(
+        "--tod", action="store_true", default=None, help="miners behind TOD meter"
+    )
+    tod.add_argument(
+        "--no-tod", dest="tod", action="store_false", help="miners not behind TOD meter"
+    )
+    sel.add_argument("--pool", help="primary or secondary pool url")
+    sel.add_argument(
+        "--retry", action="store_true", help="only miners that failed the last run"
+    )
+    chg = parser.add_argument_group("changes")
+    for dest, key in CHANGES.items():
+        chg.add_argument(
+            f"--{dest.replace('_', '-')}",
+            dest=dest,
+            metavar=dest.rsplit("_", 1)[-1].upper(),
+            help=f"set {key}" + (" (VolcMiner)" if key in TUNING else ""),
+        )
+    parser.add_argument(
+        "-n", "--dry-run", action="store_true", help="show changes, don't apply"
+    )
+    parser.add_argument("-y", "--yes", action="store_true", help="don't ask to apply")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=BULK_WORKERS,
+        help=f"miners configured at once (default {BULK_WORKERS})",
+    )
+
+
+def host_ip(addr: str):
+    """IP of a config address, which may carry a port"""
+    host = addr.rsplit(":", 1)[0] if addr.count(":") == 1 else addr
+    try:
+        return ipaddress.ip_address(host)
+    except ValueError:
+        return None
+
+
+def ip_matcher(spec: str):
+    """Predicate on config addresses for an IP, range (a-b) or network (a/n)"""
+    if "-" in spec:
+        first, last = (ipaddress.ip_address(p.strip()) for p in spec.split("-", 1))
+        test = lambda ip: ip.version == first.version and first <= ip <= last
+    elif host_ip(spec) is not None and host_ip(spec).compressed != spec:
+        # Address with port
+        return lambda addr: addr == spec
+    else:
+        network = ipaddress.ip_network(spec, strict=False)
+        test = lambda ip: ip in network
+
+    def match(addr: str) -> bool:
+        ip = host_ip(addr)
+        return ip is not None and test(ip)
+
+    return match
+
+
+def select(entries: list, args: argparse.Namespace, failed: list) -> list:
+    """Miner config entries matching every selector given"""
+    matchers = [ip_matcher(spec) for spec in args.ip]
+    selected = []
+    for entry in entries:
+        if matchers and not any(match(entry["ip"]) for match in matchers):
+            continue
+        if args.type and args.type.lower() not in entry["type"].lower():
+            continue
+        if args.tod is not None and entry["tod"] != args.tod:
+            continue
+        if args.pool and args.pool not in (
+            entry["primary_pool"],
+            entry["secondary_pool"],
+        ):
+            continue
+        if args.retry and entry["ip"] not in failed:
+            continue
+        selected.append(entry)
+    return selected
+
+
+def changes(args: argparse.Namespace) -> dict:
+    """{config key: value} to set"""
+    return {
+        key: getattr(args, dest)
+        for dest, key in CHANGES.items()
+        if getattr(args, dest) is not None
+    }
+
+
+def updated(entry: dict, change: dict) -> dict:
+    """Entry with changes, tuning only on miners that can be tuned"""
+    tunable = bool(drivers.load(entry["type"]).tune_levels)
+    new = dict(entry)
+    new.update(
+        {k: v for k, v in change.items() if k not in TUNING or tunable},
+    )
+    return new
+
+
+def mask(key: str, value) -> str:
+    return "***" if value and key.endswith(SECRETS) else repr(value)
+
+
+def entry_diff(old: dict, new: dict) -> dict:
+    """{key: (old, new)} of changed config keys"""
+    return {key: (old.get(key), new[key]) for key in new if old.get(key) != new[key]}
+
+
+def live_diff(miner) -> tuple:
+    """(mining, {key: (live, desired)}) of a miner against its new config"""
+    mining = is_mining(miner.get_miner_status())
+    return mining, miner.config_diff(mining)
+
+
+def preview(entries: list, new: dict, workers: int) -> list:
+    """Print config and live diff of each miner, return IPs that can't be read"""
+    miners = {entry["ip"]: drivers.create(new[entry["ip"]]) for entry in entries}
+    unreachable = []
+    with ThreadPoolExecutor(workers) as pool:
+        futures = {ip: pool.submit(live_diff, miner) for ip, miner in miners.items()}
+        for entry in entries:
+            ip = entry["ip"]
+            coloring.print_primary(ip)
+            for key, (old, value) in entry_diff(entry, new[ip]).items():
+                print(f"  config {key}: {mask(key, old)} -> {mask(key, value)}")
+            try:
+                mining, diff = futures[ip].result()
+            except Exception as e:
+                coloring.print_error(f"  unreachable ({type(e).__name__})")
+                unreachable.append(ip)
+                continue
+            if not mining:
+                coloring.print_info("  not mining, applied when started")
+            for key, (live, value) in diff.items():
+                print(f"  live {key}: {mask(key, live)} -> {mask(key, value)}")
+            if mining and not diff:
+                coloring.print_info("  live config up to date")
+    return unreachable
+
+
+def apply(miner) -> Outcome:
+    """Push config of a mining miner, confirming it took"""
+    start = time.perf_counter()
+    try:
+        mining = is_mining(miner.get_miner_status())
+        if not mining:
+            return Outcome(miner.ip, SAVED, "not mining", time.perf_counter() - start)
+        if not miner.config_diff(True):
+            return Outcome(miner.ip, UNCHANGED, "", time.perf_counter() - start)
+        _ = miner.start_mining()
+        diff = miner.config_diff(True)
+        if diff:
+            return Outcome(
+                miner.ip,
+                FAILED,
+                f"not applied: {', '.join(diff)}",
+                time.perf_counter() - start,
+            )
+        return Outcome(miner.ip, APPLIED, "", time.perf_counter() - start)
+    except Exception as e:
+        return Outcome(miner.ip, FAILED, type(e).__name__, time.perf_counter() - start)
+
+
+def execute(miners: list, workers: int) -> list:
+    """Apply to miners in parallel, printing progress, outcomes in miner order"""
+    outcomes = {}
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(apply, miner) for miner in miners]
+        for n, future in enumerate(as_completed(futures), start=1):
+            out = future.result()
+            outcomes[out.ip] = out
+            line = f"[{n}/{len(miners)}] {out.ip} {out.result}"
+            line += f" ({out.detail})" if out.detail else ""
+            if out.result == FAILED:
+                coloring.print_error(line)
+                log.log_msg(f"Bulk {out.ip} failed: {out.detail}", "ERROR", quiet=True)
+            else:
+                coloring.print_info(f"{line} {out.seconds:.1f}s")
+    return [outcomes[miner.ip] for miner in miners]
+
+
+def summarize(outcomes: list):
+    counts = {}
+    for out in outcomes:
+        counts[out.result] = counts.get(out.result, 0) + 1
+    text = ", ".join(f"{count} {result}" for result, count in counts.items())
+    if counts.get(FAILED):
+        coloring.print_warn(f"{text}, retry with: bitfarmer bulk --retry")
+    else:
+        coloring.print_success(text)
+    log.log_msg(f"Bulk run: {text}", "INFO", quiet=True)
+
+
+def load_failed() -> list:
+    """IPs that failed the last run"""
+    try:
+        with open(f"{config.DATA_DIR}{FAILED_FILE}", "r") as f:
+            return json.load(f)["ips"]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError) as e:
+        log.log_msg("Unable to read failed miners", "WARNING", exc=e, quiet=True)
+        return []
+
+
+def save_failed(ips: list):
+    """Remember failed IPs for --retry, forget them once all succeeded"""
+    path = f"{config.DATA_DIR}{FAILED_FILE}"
+    if not ips:
+        if os.path.isfile(path):
+            os.remove(path)
+        return
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"saved": time.time(), "ips": ips}, f)
+    os.replace(tmp, path)
+
+
+def hold(ips: list):
+    """Ask a running monitor not to act on ips while they are configured"""
+    os.makedirs(config.DATA_DIR, exist_ok=True)
+    path = f"{config.DATA_DIR}{PENDING_FILE}"
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"until": time.time() + PENDING_TTL, "ips": ips}, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def release():
+    try:
+        os.remove(f"{config.DATA_DIR}{PENDING_FILE}")
+    except FileNotFoundError:
+        pass
+
+
+def held() -> set:
+    """IPs a bulk run is configuring right now"""
+    try:
+        with open(f"{config.DATA_DIR}{PENDING_FILE}", "r") as f:
+            pending = json.load(f)
+        return set(pending["ips"]) if pending["until"] > time.time() else set()
+    except FileNotFoundError:
+        return set()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log.log_msg("Unable to read bulk pending miners", "WARNING", exc=e, quiet=True)
+        return set()
+
+
+def run(args: argparse.Namespace) -> int:
+    """Select miners, show the diff, then update config and apply in parallel"""
+    try:
+        conf = config.read_conf()
+    except (OSError, ValueError) as e:
+        print(f"Unable to read config: {e}", file=sys.stderr)
+        return 1
+    change = changes(args)
+    failed = load_failed() if args.retry else []
+    if args.retry and not failed:
+        coloring.print_info("No failed miners to retry")
+        return 0
+    if not change and not args.retry:
+        print("Nothing to change, see --help for options", file=sys.stderr)
+        return 1
+    try:
+        entries = select(conf.get("miners", []), args, failed)
+    except ValueError as e:
+        print(f"Invalid selector: {e}", file=sys.stderr)
+        return 1
+    if not entries:
+        coloring.print_warn("No miners selected")
+        return 1
+    try:
+        new = {entry["ip"]: updated(entry, change) for entry in entries}
+        # Checked before anything is shown, written or pushed to a miner
+        for i, entry in enumerate(new.values()):
+            MinerSettings.from_dict(entry, f"{entry['ip']}: ")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    coloring.print_info(f"{len(entries)} miners selected")
+    workers = max(1, min(args.workers, len(entries)))
+    unreachable = preview(entries, new, workers)
+    if unreachable:
+        coloring.print_warn(f"{len(unreachable)} miners unreachable")
+    if args.dry_run:
+        return 0
+    if not args.yes and not config.confirm(f"Apply to {len(entries)} miners?"):
+        return 0
+    # A running monitor reloads the config but leaves these miners to us,
+    # instead of pushing the same change at the same time
+    hold(list(new))
+    try:
+        if any(entry_diff(entry, new[entry["ip"]]) for entry in entries):
+            conf["miners"] = [new.get(e["ip"], e) for e in conf["miners"]]
+            try:
+                # Written first, so a running monitor doesn't undo the changes
+                config.reload_config(conf)
+            except ConfigError as e:
+                coloring.print_error(f"Config not saved: {e}")
+                return 1
+            log.log_msg(
+                f"Bulk config change on {len(entries)} miners: {list(change)}",
+                "INFO",
+                quiet=True,
+            )
+        miners = [drivers.create(new[entry["ip"]]) for entry in entries]
+        outcomes = execute(miners, workers)
+    finally:
+        release()
+    summarize(outcomes)
+    failed_ips = [out.ip for out in outcomes if out.result == FAILED]
+    if args.retry:
+        # Keep failures of the last run that weren't selected this time
+        retried = {entry["ip"] for entry in entries}
+        failed_ips += [ip for ip in failed if ip not in retried]
+    save_failed(failed_ips)
+    return 2 if failed_ips else 0
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="bitfarmer bulk",
+        description="Change pools, users or tuning on many miners at once",
+    )
+    add_arguments(parser)
+    try:
+        return run(parser.parse_args(argv))
+    except KeyboardInterrupt:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
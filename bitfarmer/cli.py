@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+import sys
+
+
+def main():
+    """Entry point, starting `status` and `bulk` without loading the interactive UI"""
+    if sys.argv[1:2] == ["status"]:
+        from bitfarmer.status import main as status
+
+        sys.exit(status(sys.argv[2:]))
+    if sys.argv[1:2] == ["bulk"]:
+        from bitfarmer.bulk import main as bulk
+
+        sys.exit(bulk(sys.argv[2:]))
+    from bitfarmer.bitfarmer import main as monitor
+
+    monitor()
+
+
+if __name__ == "__main__":
+    main()
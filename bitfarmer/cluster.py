@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
+
+import bitfarmer.log as log
+from bitfarmer.drivers import MinerPool
+from bitfarmer.miner import MinerStatus
+from bitfarmer.poller import Poller, PollResult
+
+CLUSTER_LISTEN = "127.0.0.1:9107"
+# Seconds the coordinator waits for workers to report a poll cycle
+CLUSTER_TIMEOUT = 50
+# Missed cycles before a worker is dropped and its shard reassigned
+CLUSTER_MAX_MISSES = 3
+RECONNECT_DELAY = 5
+TOKEN_ENV = "BITFARMER_CLUSTER_TOKEN"
+
+
+def parse_addr(addr: str) -> tuple:
+    """(socket family, address) of a host:port or Unix socket path"""
+    if "/" in addr:
+        return socket.AF_UNIX, addr
+    host, _, port = addr.rpartition(":")
+    return socket.AF_INET, (host or "0.0.0.0", int(port))
+
+
+def is_local(addr: str) -> bool:
+    """Address only reachable from this host (loopback or Unix socket)"""
+    family, addr = parse_addr(addr)
+    if family == socket.AF_UNIX:
+        return True
+    host = addr[0].strip("[]")
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def send(sock: socket.socket, msg: dict):
+    """Send one newline delimited JSON message"""
+    sock.sendall(json.dumps(msg).encode() + b"\n")
+
+
+def shards(ips: list, n: int) -> list:
+    """Split IPs into n interleaved shards"""
+    ips = sorted(ips)
+    return [ips[i::n] for i in range(n)]
+
+
+class WorkerConn:
+    """Coordinator side of one worker connection"""
+
+    def __init__(self, sock: socket.socket, name: str):
+        self.sock = sock
+        self.name = name
+        self.lock = threading.Lock()
+        self.shard = []
+        self.batches = {}
+        self.misses = 0
+        self.alive = True
+
+    def send(self, msg: dict) -> bool:
+        with self.lock:
+            try:
+                send(self.sock, msg)
+                return True
+            except OSError:
+                return False
+
+    def close(self):
+        self.alive = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class Coordinator:
+    """Partition miners across worker processes and merge their poll results
+
+    Workers connect (locally spawned ones over the same address), receive a
+    shard of the miners and poll it whenever the coordinator starts a cycle.
+    A worker that disconnects or misses `max_misses` cycles in a row is
+    dropped and the shards are rebalanced over the remaining workers.
+    """
+
+    def __init__(
+        self,
+        listen: str = CLUSTER_LISTEN,
+        workers: int = 0,
+        token: str = "",
+        timeout: float = CLUSTER_TIMEOUT,
+        max_misses: int = CLUSTER_MAX_MISSES,
+    ):
+        self.listen = listen
+        self.local_workers = workers
+        self.token = token
+        # Workers get miner and pool credentials in plaintext, so without a
+        # token only local workers spawned with a one-off secret may join
+        self.secret = token or secrets.token_hex(16)
+        self.timeout = timeout
+        self.max_misses = max_misses
+        self.cond = threading.Condition()
+        self.workers = []
+        self.miner_confs = {}
+        self.poll_conf = {}
+        self.cycle = 0
+        self.procs = []
+        self.sock = None
+        self.thread = None
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        """Build coordinator from cluster section of config"""
+        cc = conf["cluster"]
+        coordinator = cls(
+            cc.get("listen", CLUSTER_LISTEN),
+            cc.get("workers", 0),
+            cc.get("token", ""),
+        )
+        coordinator.configure(conf)
+        return coordinator
+
+    def key(self) -> tuple:
+        """Settings that require a restart when changed"""
+        return (self.listen, self.local_workers, self.token)
+
+    def start(self):
+        if not self.token and not is_local(self.listen):
+            raise ValueError(f"cluster.token is required to listen on {self.listen}")
+        family, addr = parse_addr(self.listen)
+        if family == socket.AF_UNIX and os.path.exists(addr):
+            os.unlink(addr)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(addr)
+        self.sock.listen()
+        if family == socket.AF_INET and addr[1] == 0:
+            self.listen = f"{addr[0]}:{self.sock.getsockname()[1]}"
+        self.thread = threading.Thread(target=self.accept, daemon=True)
+        self.thread.start()
+        self.spawn()
+        return self
+
+    def stop(self):
+        self.sock.close()
+        with self.cond:
+            for worker in self.workers:
+                worker.close()
+            self.workers = []
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(RECONNECT_DELAY)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.procs = []
+        family, addr = parse_addr(self.listen)
+        if family == socket.AF_UNIX and os.path.exists(addr):
+            os.unlink(addr)
+
+    def spawn(self):
+        """Start (or restart exited) local worker processes"""
+        self.procs = [proc for proc in self.procs if proc.poll() is None]
+        env = dict(os.environ, **{TOKEN_ENV: self.secret})
+        while len(self.procs) < self.local_workers:
+            self.procs.append(
+                subprocess.Popen(
+                    [sys.executable, "-m", "bitfarmer.cluster", self.listen, "--local"],
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+
+    def accept(self):
+        """Accept worker connections"""
+        while True:
+            try:
+                sock, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(sock,), daemon=True).start()
+
+    def serve(self, sock: socket.socket):
+        """Read one worker's messages until it disconnects"""
+        worker = None
+        try:
+            with sock.makefile("rb") as rfile:
+                hello = json.loads(rfile.readline() or b"{}")
+                if hello.get("type") != "hello" or not hmac.compare_digest(
+                    str(hello.get("token", "")).encode(), self.secret.encode()
+                ):
+                    log.log_msg("Rejected cluster worker", "WARNING", quiet=True)
+                    sock.close()
+                    return
+                worker = WorkerConn(sock, hello.get("name", "worker"))
+                with self.cond:
+                    self.workers.append(worker)
+                    self.rebalance()
+                log.log_msg(f"Worker {worker.name} joined", "INFO", quiet=True)
+                for line in rfile:
+                    msg = json.loads(line)
+                    if msg.get("type") == "batch":
+                        with self.cond:
+                            worker.batches[msg["cycle"]] = msg["results"]
+                            worker.misses = 0
+                            self.cond.notify_all()
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            if worker is not None and worker.alive:
+                log.log_msg(f"Worker {worker.name} failed", "ERROR", exc=e, quiet=True)
+        if worker is not None:
+            self.drop(worker)
+
+    def drop(self, worker: WorkerConn):
+        """Remove worker and hand its shard to the others"""
+        with self.cond:
+            if worker not in self.workers:
+                return
+            self.workers.remove(worker)
+            self.rebalance()
+            self.cond.notify_all()
+        worker.close()
+        log.log_msg(
+            f"Worker {worker.name} left, reassigned {len(worker.shard)} miners",
+            "WARNING",
+            quiet=True,
+        )
+
+    def configure(self, conf: dict):
+        """Apply timeouts and reassign miners from config"""
+        cc = conf.get("cluster", {})
+        with self.cond:
+            self.timeout = cc.get("timeout", CLUSTER_TIMEOUT)
+            self.max_misses = cc.get("max_misses", CLUSTER_MAX_MISSES)
+            self.miner_confs = {m["ip"]: m for m in conf.get("miners", [])}
+            self.poll_conf = conf.get("poll", {})
+            self.rebalance(force=True)
+
+    def rebalance(self, force: bool = False):
+        """Split miners over live workers, call with cond held"""
+        if not self.workers:
+            return
+        workers = sorted(self.workers, key=lambda w: w.name)
+        for worker, shard in zip(workers, shards(list(self.miner_confs), len(workers))):
+            if shard == worker.shard and not force:
+                continue
+            worker.shard = shard
+            worker.send(
+                {
+                    "type": "assign",
+                    "miners": [self.miner_confs[ip] for ip in shard],
+                    "poll": self.poll_conf,
+                }
+            )
+
+    def collect(self) -> dict | None:
+        """{ip: PollResult} for one cycle, None if no workers are up"""
+        self.spawn()
+        with self.cond:
+            if not self.workers:
+                return None
+            self.cycle += 1
+            cycle = self.cycle
+            polled = list(self.workers)
+            for worker in polled:
+                worker.send({"type": "poll", "cycle": cycle})
+            deadline = time.monotonic() + self.timeout
+            while True:
+                waiting = [
+                    w
+                    for w in polled
+                    if w.alive and w in self.workers and cycle not in w.batches
+                ]
+                remaining = deadline - time.monotonic()
+                if not waiting or remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            results = {}
+            late = []
+            now = time.time()
+            for worker in polled:
+                batch = worker.batches.pop(cycle, None)
+                worker.batches.clear()
+                if batch is None:
+                    worker.misses += 1
+                    if worker.misses >= self.max_misses:
+                        late.append(worker)
+                    continue
+                bad = 0
+                for r in batch if isinstance(batch, list) else [None]:
+                    try:
+                        status = MinerStatus(**r["status"]) if r["status"] else None
+                        # Sent as an age, so workers' clocks don't matter
+                        results[r["ip"]] = PollResult(
+                            r["ip"],
+                            status,
+                            r["error"],
+                            r["seconds"],
+                            now - r["age"],
+                            bool(r["stale"]),
+                        )
+                    except (TypeError, KeyError, ValueError):
+                        bad += 1
+                if bad:
+                    # Usually a worker running another version of bitfarmer
+                    log.log_msg(
+                        f"Dropped {bad} bad results from worker {worker.name}",
+                        "WARNING",
+                        quiet=True,
+                    )
+        for worker in late:
+            log.log_msg(f"Worker {worker.name} unresponsive", "WARNING", quiet=True)
+            self.drop(worker)
+        return results
+
+    def summary(self) -> str:
+        """Workers and shard sizes for status view"""
+        with self.cond:
+            return ", ".join(
+                f"{w.name} ({len(w.shard)})"
+                for w in sorted(self.workers, key=lambda w: w.name)
+            )
+
+
+class Worker:
+    """Poll the shard assigned by a coordinator"""
+
+    def __init__(self, addr: str, token: str = "", persist: bool = True):
+        self.addr = addr
+        self.token = token
+        self.persist = persist
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self.pool = MinerPool()
+        self.poller = None
+
+    def assign(self, msg: dict):
+        """Take over the miners and poll settings sent by the coordinator"""
+        if self.poller is None:
+            from bitfarmer.bitfarmer import poll_miner
+
+            self.poller = Poller(poll_miner)
+        conf = {"miners": msg["miners"], "poll": msg.get("poll", {})}
+        _ = self.pool.sync(conf)
+        self.poller.configure(conf)
+
+    def poll(self) -> list:
+        """Poll every miner in shard concurrently, within the poll deadline"""
+        if self.poller is None:
+            return []
+        now = time.time()
+        return [
+            {
+                "ip": r.ip,
+                "status": asdict(r.status) if r.status is not None else None,
+                "error": r.error,
+                "seconds": r.seconds,
+                "age": r.age(now),
+                "stale": r.stale,
+            }
+            for r in self.poller.cycle(self.pool.list())
+        ]
+
+    def session(self):
+        """Serve one coordinator connection until it closes"""
+        family, addr = parse_addr(self.addr)
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.connect(addr)
+            send(sock, {"type": "hello", "name": self.name, "token": self.token})
+            with sock.makefile("rb") as rfile:
+                for line in rfile:
+                    msg = json.loads(line)
+                    match msg.get("type"):
+                        case "assign":
+                            self.assign(msg)
+                        case "poll":
+                            results = self.poll()
+                            send(
+                                sock,
+                                {
+                                    "type": "batch",
+                                    "cycle": msg["cycle"],
+                                    "results": results,
+                                },
+                            )
+
+    def run(self):
+        """Serve coordinator, reconnecting if persistent"""
+        while True:
+            try:
+                self.session()
+                log.log_msg("Coordinator closed connection", "INFO", quiet=True)
+            except (OSError, ValueError) as e:
+                log.log_msg("Coordinator connection failed", "ERROR", exc=e, quiet=True)
+            if not self.persist:
+                return
+            time.sleep(RECONNECT_DELAY)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="bitfarmer polling worker")
+    parser.add_argument("addr", help="coordinator host:port or socket path")
+    parser.add_argument(
+        "--local", action="store_true", help="exit when the coordinator goes away"
+    )
+    args = parser.parse_args()
+    try:
+        Worker(args.addr, os.environ.get(TOKEN_ENV, ""), not args.local).run()
+    except KeyboardInterrupt:
+        pass
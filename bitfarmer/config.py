@@ -6,14 +6,14 @@ import platform
 import subprocess
 from datetime import datetime
 
-import pycountry
-import questionary as quest
 from platformdirs import user_config_dir, user_data_dir
 
 import bitfarmer.coloring as coloring
+import bitfarmer.drivers as drivers
 from bitfarmer.miner import MinerStatus, get_style
+from bitfarmer.schedule import DAYS, validate_window
+from bitfarmer.settings import Settings
 
-AVAIL_MINERS = ["DG1+/DGHome", "VolcMiner D1"]
 CONF_FILE = "conf.json"
 ENC_CONF_FILE = "conf.gpg"
 APP_NAME = "bitfarmer"
@@ -23,7 +23,9 @@ CONF_DIR = user_config_dir(APP_NAME, AUTHOR) + "/"
 
 
 def ping(addr: str) -> bool:
-    """Return ping success or fail"""
+    """Return ping success or fail, pinging the host of host:port addresses"""
+    if addr.count(":") == 1:
+        addr = addr.split(":")[0]
     param = "-n" if platform.system().lower() == "windows" else "-c"
     try:
         return (
@@ -38,16 +40,19 @@ def ping(addr: str) -> bool:
         return False
 
 
-def reload_config(conf: dict) -> dict:
-    """write config and return new config"""
+def reload_config(conf: dict) -> Settings:
+    """validate and write config, return new settings"""
+    settings = Settings.from_dict(conf)
     write_config(conf)
-    return read_conf()
+    return settings
 
 
 def write_config(conf: dict):
-    """write config file"""
-    with open(f"{CONF_DIR}{CONF_FILE}", "w") as f:
+    """write config file (replaced atomically so watchers never see partial writes)"""
+    tmp = f"{CONF_DIR}{CONF_FILE}.tmp"
+    with open(tmp, "w") as f:
         json.dump(conf, f, indent=4)
+    os.replace(tmp, f"{CONF_DIR}{CONF_FILE}")
 
 
 def read_conf() -> dict:
@@ -138,7 +143,7 @@ def edit_conf(conf: dict) -> dict:
             case _:
                 break
     coloring.print_success("Configuration edited successfully")
-    return reload_config(conf)
+    return conf
 
 
 def manually_edit_conf(conf: dict) -> dict:
@@ -168,19 +173,10 @@ def setup_time_of_day(conf: dict) -> dict:
         conf["tod_schedule"] = {}
     else:
         tod_exceptions = conf["tod_schedule"]["exceptions"]
-    days = [
-        "Monday",
-        "Tuesday",
-        "Wednesday",
-        "Thursday",
-        "Friday",
-        "Saturday",
-        "Sunday",
-    ]
     hours = [f"{hour:02d}00" for hour in range(24)]
     tod_days = checkbox(
         "Select days NORMAL Time of Day schedule applies: ",
-        days,
+        DAYS,
         "",
     )
     tod_hours = checkbox(
@@ -189,6 +185,20 @@ def setup_time_of_day(conf: dict) -> dict:
         "",
     )
     tod_hours = [int(h[:-2]) for h in tod_hours]
+    tod_windows = conf["tod_schedule"].get("windows", [])
+    if tod_windows:
+        coloring.print_info(f"Current minute windows: {tod_windows}")
+    while True:
+        add_window = confirm("\nAdd minute resolution window (e.g. 17:30-19:45)?")
+        if not add_window:
+            break
+        window = text(
+            "Enter window (use HH:MM-HH:MM format): ",
+            "",
+            validation=validate_window,
+        )
+        if window not in tod_windows:
+            tod_windows.append(window)
     if tod_exceptions:
         coloring.print_info(f"Current Exceptions: {tod_exceptions}")
     while True:
@@ -204,6 +214,7 @@ def setup_time_of_day(conf: dict) -> dict:
             tod_exceptions.append(date_exception)
     conf["tod_schedule"]["days"] = tod_days
     conf["tod_schedule"]["hours"] = tod_hours
+    conf["tod_schedule"]["windows"] = tod_windows
     conf["tod_schedule"]["exceptions"] = tod_exceptions
     coloring.print_success("Time of Day schedule created")
     return conf
@@ -221,7 +232,7 @@ def add_miner(conf: dict) -> dict:
     if not ping(ip_input):
         coloring.print_warn("Address invalid or not pingable")
         return conf
-    type_input = select("Select miner type: ", AVAIL_MINERS, "")
+    type_input = select("Select miner type: ", drivers.available(), "")
     login_input = text("Enter miner login: ", "")
     password_input = ""
     while True:
@@ -234,6 +245,10 @@ def add_miner(conf: dict) -> dict:
     tod_input = confirm("\nIs miner behind your Time of Day meter? ")
     pool_selections = conf["pools"].copy()
     if len(pool_selections) > 1:
+        from bitfarmer.pools import rank_urls
+
+        coloring.print_info("Pool latency:")
+        pool_selections = rank_urls(pool_selections)
         primary_pool_input = select(
             "Select primary pool: ", pool_selections, "󰘆")
     else:
@@ -313,6 +328,8 @@ def select_editor(conf: dict) -> dict:
 
 def setup_weather(conf: dict) -> dict:
     """Choose location for weather"""
+    import pycountry
+
     coloring.print_primary("Setup weather monitoring")
     metric = confirm("Use metric measurements:")
     countries = [x.name for x in list(pycountry.countries)]
@@ -346,6 +363,15 @@ def add_pool(conf: dict) -> dict:
                          for pool in conf["pools"] if "url" in pool]
         coloring.print_info(f"Current pools: {current_pools}")
     pool_url_input = text("Enter pool url: ", "󰖟")
+    from bitfarmer.pools import probe
+
+    result = probe(pool_url_input, 2)
+    if result.ok:
+        coloring.print_info(
+            f"Pool answered in {result.connect + result.response:.0f}ms"
+        )
+    else:
+        coloring.print_warn(f"Pool not reachable ({result.error})")
     conf["pools"].append(pool_url_input)
     coloring.print_success("Pool added")
     return conf
@@ -387,6 +413,8 @@ def default_validate(s) -> bool:
 
 def confirm(prompt: str) -> bool:
     """Confirmation (y/n)"""
+    import questionary as quest
+
     answer = quest.confirm(prompt, qmark="").ask()
     if answer is None:
         raise KeyboardInterrupt
@@ -395,6 +423,8 @@ def confirm(prompt: str) -> bool:
 
 def text(prompt: str, mark: str, validation=default_validate) -> str:
     """Text input"""
+    import questionary as quest
+
     answer = quest.text(prompt, qmark=mark, validate=validation).ask()
     if answer is None:
         raise KeyboardInterrupt
@@ -403,6 +433,8 @@ def text(prompt: str, mark: str, validation=default_validate) -> str:
 
 def checkbox(prompt: str, options: list, mark: str, validation=default_validate) -> str:
     """Text input"""
+    import questionary as quest
+
     answer = quest.checkbox(
         prompt,
         options,
@@ -417,6 +449,8 @@ def checkbox(prompt: str, options: list, mark: str, validation=default_validate)
 
 def select(prompt: str, options: list, mark: str) -> str:
     """Text input"""
+    import questionary as quest
+
     answer = quest.select(prompt, options, qmark=mark).ask()
     if answer is None:
         raise KeyboardInterrupt
@@ -425,6 +459,8 @@ def select(prompt: str, options: list, mark: str) -> str:
 
 def password(prompt: str, validation=default_validate) -> str:
     """Text input"""
+    import questionary as quest
+
     answer = quest.password(prompt, qmark="", validate=validation).ask()
     if answer is None:
         raise KeyboardInterrupt
@@ -433,6 +469,8 @@ def password(prompt: str, validation=default_validate) -> str:
 
 def autocomplete(prompt: str, choices: list, mark: str) -> str:
     """Autocomplete input"""
+    import questionary as quest
+
     answer = quest.autocomplete(prompt, qmark=mark, choices=choices).ask()
     if answer is None:
         raise KeyboardInterrupt
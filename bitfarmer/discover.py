@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import ipaddress
+import json
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.auth import HTTPDigestAuth
+
+from bitfarmer.volcminer import parse_volc_resp
+
+DISCOVER_WORKERS = 256
+PROBE_TIMEOUT = 0.5
+FINGERPRINT_TIMEOUT = 3
+ELPHAPEX_TYPE = "DG1+/DGHome"
+VOLCMINER_TYPE = "VolcMiner D1"
+
+
+def probe(ip: str, port: int, timeout: float = PROBE_TIMEOUT) -> bool:
+    """Return true if TCP port accepts connections"""
+    try:
+        with socket.create_connection((ip, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def addr(ip: str, port: int) -> str:
+    """Miner address as used in config"""
+    return ip if port == 80 else f"{ip}:{port}"
+
+
+def fingerprint(ip: str, port: int, login: str, password: str) -> dict | None:
+    """Identify miner model from its CGI endpoints"""
+    base = f"http://{addr(ip, port)}"
+    try:
+        resp = requests.get(
+            f"{base}/cgi-bin/get_network_info.cgi", timeout=FINGERPRINT_TIMEOUT
+        )
+        if resp.status_code == requests.codes.ok:
+            net_info = json.loads(resp.text)
+            if "conf_hostname" in net_info:
+                return {"type": ELPHAPEX_TYPE, "hostname": net_info["conf_hostname"]}
+    except (requests.RequestException, ValueError):
+        pass
+    try:
+        uri = f"{base}/cgi-bin/get_system_infoV1.cgi"
+        resp = requests.get(uri, timeout=FINGERPRINT_TIMEOUT)
+        if resp.status_code == requests.codes.unauthorized and "digest" in (
+            resp.headers.get("WWW-Authenticate", "").lower()
+        ):
+            resp = requests.get(
+                uri,
+                auth=HTTPDigestAuth(login, password),
+                timeout=FINGERPRINT_TIMEOUT,
+            )
+            if resp.status_code == requests.codes.unauthorized:
+                return {"type": VOLCMINER_TYPE, "hostname": "", "auth": False}
+        if resp.status_code == requests.codes.ok:
+            sys_info = parse_volc_resp(resp.text)["data"]
+            if "VolcMiner" in sys_info.get("minertype", ""):
+                return {"type": VOLCMINER_TYPE, "hostname": sys_info["hostname"]}
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def scan_host(ip: str, port: int, login: str, password: str) -> dict | None:
+    """Probe and fingerprint one host"""
+    if not probe(ip, port):
+        return None
+    found = fingerprint(ip, port, login, password)
+    if found is None:
+        return None
+    return {"ip": addr(ip, port), **found}
+
+
+def discover(
+    cidr: str,
+    port: int = 80,
+    login: str = "root",
+    password: str = "root",
+    workers: int = DISCOVER_WORKERS,
+) -> list:
+    """Concurrently scan network for supported miners"""
+    network = ipaddress.ip_network(cidr, strict=False)
+    hosts = [str(ip) for ip in network.hosts()] or [str(network.network_address)]
+    with ThreadPoolExecutor(max_workers=min(workers, len(hosts))) as pool:
+        results = pool.map(lambda ip: scan_host(ip, port, login, password), hosts)
+        return [found for found in results if found is not None]
+
+
+def miner_entry(found: dict, conf: dict, login: str, password: str) -> dict:
+    """Config miner entry for discovered miner, unmanaged until pool users are set"""
+    pools = conf.get("pools", [])
+    return {
+        "ip": found["ip"],
+        "type": found["type"],
+        "login": login,
+        "password": password,
+        "tod": False,
+        "primary_pool": pools[0] if pools else "",
+        "primary_pool_user": "",
+        "primary_pool_pass": "",
+        "secondary_pool": pools[1] if len(pools) > 1 else "",
+        "secondary_pool_user": "",
+        "secondary_pool_pass": "",
+        "managed": False,
+    }
+
+
+def merge(conf: dict, entries: list) -> tuple:
+    """Add entries for miners not already in config, return (conf, added)"""
+    if "miners" not in conf:
+        conf["miners"] = []
+    known = {miner["ip"] for miner in conf["miners"]}
+    added = [entry for entry in entries if entry["ip"] not in known]
+    conf["miners"] = sorted(conf["miners"] + added, key=lambda x: x.get("ip", ""))
+    return conf, added
+
+
+if __name__ == "__main__":
+    found = discover("127.0.0.1/32", port=8000)
+    print(json.dumps(found, indent=2))
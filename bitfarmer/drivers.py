@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+from importlib import import_module
+from importlib.metadata import entry_points
+
+ENTRY_POINT_GROUP = "bitfarmer.drivers"
+BUILTIN_DRIVERS = {
+    "DG1+/DGHome": "bitfarmer.elphapex:ElphapexDG1",
+    "VolcMiner D1": "bitfarmer.volcminer:VolcminerD1",
+}
+
+_registry = None
+_loaded = {}
+
+
+def registry() -> dict:
+    """Map miner type to driver ("module:Class" or entry point), loaded once"""
+    global _registry
+    if _registry is None:
+        _registry = dict(BUILTIN_DRIVERS)
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            _registry[ep.name] = ep
+    return _registry
+
+
+def available() -> list:
+    """Miner types with a registered driver"""
+    return sorted(registry())
+
+
+def load(miner_type: str) -> type:
+    """Import driver class for miner type on first use"""
+    if miner_type not in _loaded:
+        try:
+            target = registry()[miner_type]
+        except KeyError:
+            raise ValueError(f"No driver for miner type: {miner_type}") from None
+        if isinstance(target, str):
+            module, attr = target.split(":")
+            _loaded[miner_type] = getattr(import_module(module), attr)
+        else:
+            _loaded[miner_type] = target.load()
+    return _loaded[miner_type]
+
+
+def create(miner_conf: dict):
+    """Instantiate driver for miner config entry"""
+    try:
+        return load(miner_conf["type"])(miner_conf)
+    except ValueError:
+        raise ValueError(
+            f"Invalid miner type in config: {miner_conf['type']} - {miner_conf['ip']}"
+        ) from None
+
+
+class MinerPool:
+    """Long-lived miners keyed by IP, rebuilt only when their config changes"""
+
+    def __init__(self):
+        self.confs = {}
+        self.miners = {}
+        self.order = []
+
+    def sync(self, conf: dict) -> tuple:
+        """Diff against config, return (added, removed, changed) IPs
+
+        New miners are built before any are swapped in, so a failing driver
+        leaves the pool as it was.
+        """
+        wanted = {miner_conf["ip"]: miner_conf for miner_conf in conf.get("miners", [])}
+        removed = [ip for ip in self.miners if ip not in wanted]
+        added, changed = [], []
+        built = {}
+        for ip, miner_conf in wanted.items():
+            if ip not in self.miners:
+                added.append(ip)
+            elif self.confs[ip] != miner_conf:
+                changed.append(ip)
+            else:
+                continue
+            built[ip] = create(miner_conf)
+        for ip in removed:
+            del self.miners[ip]
+            del self.confs[ip]
+        for ip, miner in built.items():
+            self.miners[ip] = miner
+            self.confs[ip] = dict(wanted[ip])
+        self.order = list(wanted)
+        return added, removed, changed
+
+    def list(self) -> list:
+        """Miners in config order"""
+        return [self.miners[ip] for ip in self.order]
+
+    def get(self, ip: str):
+        """Miner by IP (None if unknown)"""
+        return self.miners.get(ip)
+
+    def __len__(self) -> int:
+        return len(self.miners)
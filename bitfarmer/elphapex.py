@@ -5,6 +5,7 @@ import json
 
 import requests
 
+import bitfarmer.profiling as profiling
 from bitfarmer.miner import Miner, MinerStatus
 
 
@@ -25,6 +26,8 @@ def parse_duration(dur: float) -> str:
 class ElphapexDG1(Miner):
     """DG1+ and DG Home interface"""
 
+    default_watts = 3950
+
     def get_miner_status(self) -> MinerStatus:
         """Gather and return MinerStatus"""
         stats_info = self.get_stats()
@@ -76,32 +79,11 @@ class ElphapexDG1(Miner):
             hashrate_total_avg=stats_info["STATS"][0]["rate_avg"],
         )
 
-    def stop_mining(self) -> dict:
-        """Unset mining pools"""
-        payload = {
-            "pools": [
-                {
-                    "url": "",
-                    "pass": "",
-                    "user": "",
-                },
-                {
-                    "url": "",
-                    "pass": "",
-                    "user": "",
-                },
-                {
-                    "url": "",
-                    "pass": "",
-                    "user": "",
-                },
-            ],
-        }
-        return self.post("/cgi-bin/set_miner_conf.cgi", payload)
-
-    def start_mining(self) -> dict:
-        """Set mining pools"""
-        payload = {
+    def pools_payload(self, mining: bool) -> dict:
+        """Miner pools for mining or stopped state"""
+        if not mining:
+            return {"pools": [{"url": "", "pass": "", "user": ""} for _ in range(3)]}
+        return {
             "pools": [
                 {
                     "url": self.primary_pool,
@@ -120,18 +102,35 @@ class ElphapexDG1(Miner):
                 },
             ],
         }
-        return self.post("/cgi-bin/set_miner_conf.cgi", payload)
+
+    def config_diff(self, mining: bool) -> dict:
+        """Return {key: (live, desired)} for pools that differ from desired state"""
+        live_pools = self.get_pool()["POOLS"]
+        diff = {}
+        for i, pool in enumerate(self.pools_payload(mining)["pools"]):
+            live_pool = live_pools[i] if i < len(live_pools) else {}
+            for key in ("url", "user"):
+                live = live_pool.get(key, "")
+                if live != pool[key]:
+                    diff[f"pool{i + 1}{key}"] = (live, pool[key])
+        return diff
+
+    def stop_mining(self) -> dict:
+        """Unset mining pools"""
+        return self.post("/cgi-bin/set_miner_conf.cgi", self.pools_payload(False))
+
+    def start_mining(self) -> dict:
+        """Set mining pools"""
+        return self.post("/cgi-bin/set_miner_conf.cgi", self.pools_payload(True))
 
     def reboot(self):
         """Reboot miner"""
-        resp = requests.request(
-            "GET", f"http://{self.ip}/cgi-bin/reboot.cgi", timeout=3
-        )
+        resp = self.request("GET", "/cgi-bin/reboot.cgi", timeout=3)
         if resp.status_code != requests.codes.ok:
             resp.raise_for_status()
 
     def get_pool(self) -> dict:
-        """Get miner conf"""
+        """Get miner pools"""
         return self.get("/cgi-bin/pools.cgi")
 
     def get_network(self) -> dict:
@@ -144,10 +143,11 @@ class ElphapexDG1(Miner):
 
     def get(self, uri: str) -> dict:
         """GET request"""
-        resp = requests.request("GET", f"http://{self.ip}{uri}", timeout=3)
+        resp = self.request("GET", uri, timeout=3)
         if resp.status_code != requests.codes.ok:
             resp.raise_for_status()
-        return json.loads(resp.text)
+        with profiling.span("json", ip=self.ip, uri=uri):
+            return json.loads(resp.text)
 
     def post(self, uri: str, payload: dict) -> dict:
         """POST request"""
@@ -155,16 +155,17 @@ class ElphapexDG1(Miner):
         headers = {
             "content-type": "application/json",
         }
-        resp = requests.request(
+        resp = self.request(
             "POST",
-            f"http://{self.ip}{uri}",
+            uri,
             headers=headers,
             data=payload,
             timeout=3,
         )
         if resp.status_code != requests.codes.ok:
             resp.raise_for_status()
-        return json.loads(resp.text)
+        with profiling.span("json", ip=self.ip, uri=uri):
+            return json.loads(resp.text)
 
 
 if __name__ == "__main__":
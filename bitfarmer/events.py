@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+
+import bitfarmer.log as log
+from bitfarmer.miner import MinerStatus
+from bitfarmer.reconcile import is_mining
+
+EVENTS_SOCKET = "events.sock"
+# Events buffered per subscriber, the oldest are dropped past this
+EVENTS_QUEUE = 1000
+# Seconds between keepalives to idle subscribers, detects closed connections
+KEEPALIVE = 15
+DOWN = "down"
+MINING = "mining"
+IDLE = "idle"
+
+
+class Subscriber:
+    """Bounded queue of serialized events for one reader"""
+
+    def __init__(self, maxlen: int = EVENTS_QUEUE):
+        self.queue = deque(maxlen=maxlen)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, line: bytes):
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(line)
+            self.cond.notify()
+
+    def get(self, timeout: float) -> list:
+        """Queued events, waiting up to timeout for one (empty on timeout)"""
+        with self.cond:
+            if not self.queue and not self.closed:
+                self.cond.wait(timeout)
+            lines = list(self.queue)
+            self.queue.clear()
+            return lines
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+
+class EventBus:
+    """Fan out poll results, state changes and actions to subscribers
+
+    Publishing never blocks: every subscriber has its own bounded queue and
+    a reader that falls behind loses its oldest events.
+    """
+
+    def __init__(self, maxlen: int = EVENTS_QUEUE):
+        self.maxlen = maxlen
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.states = {}
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.maxlen)
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+        subscriber.close()
+        if subscriber.dropped:
+            log.log_msg(
+                f"Event subscriber dropped {subscriber.dropped} events",
+                "WARNING",
+                quiet=True,
+            )
+
+    def publish(self, kind: str, **data):
+        """Send event to every subscriber, serialized once"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        if not subscribers:
+            return
+        line = json.dumps({"type": kind, "ts": time.time(), **data}).encode() + b"\n"
+        for subscriber in subscribers:
+            subscriber.put(line)
+
+    def publish_statuses(self, statuses: list, ips: list, stale=()):
+        """Publish a poll cycle, with a state event for miners that changed
+
+        Statuses of IPs in stale were carried forward and only count for state.
+        """
+        observed = {status.ip: status for status in statuses}
+        listening = bool(self.subscribers)
+        for ip in ips:
+            status = observed.get(ip)
+            if status is None:
+                state = DOWN
+            else:
+                state = MINING if is_mining(status) else IDLE
+                if listening and ip not in stale:
+                    self.publish("status", ip=ip, status=asdict(status))
+            previous = self.states.get(ip)
+            if state != previous:
+                self.states[ip] = state
+                self.publish("state", ip=ip, state=state, previous=previous)
+        wanted = set(ips)
+        self.states = {ip: s for ip, s in self.states.items() if ip in wanted}
+
+    def publish_actions(self, actions: list, source: str):
+        """Publish (ip, action) pairs taken by source"""
+        for ip, action in actions:
+            self.publish("action", ip=ip, action=action, source=source)
+
+
+EVENTS = EventBus()
+
+
+class EventSocket:
+    """Stream events as newline delimited JSON on a Unix domain socket"""
+
+    def __init__(self, path: str, bus: EventBus = EVENTS):
+        self.path = path
+        self.bus = bus
+        if os.path.exists(path):
+            os.unlink(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen()
+        self.thread = None
+
+    @classmethod
+    def from_conf(cls, conf: dict, data_dir: str):
+        """Build server from events section of config"""
+        return cls(conf["events"].get("socket", f"{data_dir}{EVENTS_SOCKET}"))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.accept, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.stream, args=(conn,), daemon=True).start()
+
+    def stream(self, conn: socket.socket):
+        """Write events to one connection until it closes"""
+        subscriber = self.bus.subscribe()
+        try:
+            with conn:
+                while not subscriber.closed:
+                    lines = subscriber.get(KEEPALIVE)
+                    conn.sendall(b"".join(lines) if lines else b"\n")
+        except OSError:
+            pass
+        finally:
+            self.bus.unsubscribe(subscriber)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = EventSocket(f"{tmp}/events.sock").start()
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(server.path)
+        time.sleep(0.1)
+        status = MinerStatus("10.0.0.1", pool="stratum+tcp://pool:3333")
+        EVENTS.publish_statuses([status], ["10.0.0.1", "10.0.0.2"])
+        EVENTS.publish_actions([("10.0.0.2", "start")], "reconcile")
+        time.sleep(0.1)
+        print(client.recv(65536).decode())
+        client.close()
+        server.stop()
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+
+import os
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_fixture(family: str, uri: str) -> str:
+    """Load recorded response body for endpoint"""
+    with open(os.path.join(FIXTURE_DIR, family, os.path.basename(uri)), "r") as f:
+        return f.read()
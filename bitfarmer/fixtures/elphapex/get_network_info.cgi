@@ -0,0 +1 @@
+{"nettype":"DHCP","netdevice":"eth0","macaddr":"E4:9F:7D:1C:22:5A","ipaddress":"172.16.0.101","netmask":"255.255.255.0","conf_nettype":"DHCP","conf_hostname":"DG1plus-1","conf_ipaddress":"","conf_netmask":"","conf_gateway":"","conf_dnsservers":""}
@@ -0,0 +1 @@
+{"STATUS":{"STATUS":"S","when":1713,"Msg":"pools","api_version":"1.0.0"},"INFO":{"miner_version":"DG1+_V1.0.8","CompileTime":"Thu Aug 22 10:21:37 CST 2024","type":"DG1+"},"POOLS":[{"index":0,"url":"stratum+tcp://ltc.viabtc.io:3333","user":"XXXX.worker1","status":"Alive","priority":0,"getworks":412,"accepted":1873,"rejected":9,"discarded":2714,"stale":3,"diff":"65.5K","diff1":0,"diffa":122748928,"diffr":589824,"diffs":196608,"lsdiff":65536,"lstime":"0:00:07"},{"index":1,"url":"stratum+tcp://ltc.f2pool.com:8888","user":"XXXX.worker1","status":"Dead","priority":1,"getworks":0,"accepted":0,"rejected":0,"discarded":0,"stale":0,"diff":"","diff1":0,"diffa":0,"diffr":0,"diffs":0,"lsdiff":0,"lstime":"0"},{"index":2,"url":"","user":"","status":"Dead","priority":2,"getworks":0,"accepted":0,"rejected":0,"discarded":0,"stale":0,"diff":"","diff1":0,"diffa":0,"diffr":0,"diffs":0,"lsdiff":0,"lstime":"0"}]}
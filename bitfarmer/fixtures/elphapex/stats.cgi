@@ -0,0 +1 @@
+{"STATUS":{"STATUS":"S","when":1713,"Msg":"stats","api_version":"1.0.0"},"INFO":{"miner_version":"DG1+_V1.0.8","CompileTime":"Thu Aug 22 10:21:37 CST 2024","type":"DG1+"},"STATS":[{"elapsed":1713,"rate_5s":14112.48,"rate_30m":14086.3,"rate_avg":14094.17,"rate_ideal":14000.0,"rate_unit":"MH/s","chain_num":4,"fan_num":4,"fan":[3420,3420,3480,3480],"hwp_total":0.0012,"miner-mode":0,"freq-level":100,"chain":[{"index":0,"freq_avg":500,"rate_ideal":3500.0,"rate_real":3524.11,"asic_num":96,"asic":"oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo","temp_pic":[58,62,66],"temp_pcb":[55,57,61,63],"temp_chip":[68,71,73,75],"hw":3,"eeprom_loaded":true,"sn":"DG1PAB0124050101","hwp":0.0011,"hashrate":3524.11},{"index":1,"freq_avg":500,"rate_ideal":3500.0,"rate_real":3518.72,"asic_num":96,"asic":"oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo","temp_pic":[59,63,66],"temp_pcb":[55,58,61,64],"temp_chip":[69,71,74,76],"hw":5,"eeprom_loaded":true,"sn":"DG1PAB0124050102","hwp":0.0014,"hashrate":3518.72},{"index":2,"freq_avg":500,"rate_ideal":3500.0,"rate_real":3531.06,"asic_num":96,"asic":"oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo","temp_pic":[58,61,66],"temp_pcb":[54,57,60,63],"temp_chip":[68,70,73,74],"hw":2,"eeprom_loaded":true,"sn":"DG1PAB0124050103","hwp":0.0009,"hashrate":3531.06},{"index":3,"freq_avg":500,"rate_ideal":3500.0,"rate_real":3538.59,"asic_num":96,"asic":"oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo oooooooo","temp_pic":[59,62,66],"temp_pcb":[55,57,61,63],"temp_chip":[68,71,73,75],"hw":4,"eeprom_loaded":true,"sn":"DG1PAB0124050104","hwp":0.0012,"hashrate":3538.59}]}]}
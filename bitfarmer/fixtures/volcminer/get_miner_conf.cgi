@@ -0,0 +1 @@
+{"code":0,"message":"success","data":"{"pool1url":"stratum+tcp://ltc.viabtc.io:3333","pool1user":"XXXX.worker5","pool1pw":"123","pool2url":"stratum+tcp://ltc.f2pool.com:8888","pool2user":"XXXX.worker5","pool2pw":"123","pool3url":"","pool3user":"","pool3pw":"","nobeeper":"","notempoverctrl":"true","fan_customize_switch":"false","fan_customize_value_front":"","fan_customize_value_back":"","freq":"1900","coin_type":"ltc","runmode":"0","voltage_customize_value":"1250","ema":"3","debug":"false"}"}
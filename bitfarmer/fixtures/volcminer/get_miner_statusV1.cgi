@@ -0,0 +1 @@
+{"code":0,"message":"success","data":"{"elapsed":"14m47s","ghs5s":"15,386.02","ghsav":"15,409.69","hw_rate":"0.0021%","fan":"{"fan_num":"4","fan1":"3,300","fan2":"3,240","fan3":"3,210","fan4":"3,240"}","chains":"[{"index":"1","freq":"1,900","chain_rate":"5,126.88","asic_num":"108","temp":"60","temp_chip":"72","hw":"4","status":"ok"},{"index":"2","freq":"1,900","chain_rate":"5,175.20","asic_num":"108","temp":"62","temp_chip":"74","hw":"6","status":"ok"},{"index":"3","freq":"1,900","chain_rate":"5,083.94","asic_num":"108","temp":"61","temp_chip":"73","hw":"3","status":"ok"}]","pools":"{"pool_num":"3","pool_dtls":"[{"index":"0","url":"stratum+tcp://ltc.viabtc.io:3333","user":"XXXX.worker5","status":"Alive","diff":"65,536","accepted":"1,204","rejected":"7","stale":"1","lstime":"0:00:04"},{"index":"1","url":"stratum+tcp://ltc.f2pool.com:8888","user":"XXXX.worker5","status":"Dead","diff":"0","accepted":"0","rejected":"0","stale":"0","lstime":"0"},{"index":"2","url":"","user":"","status":"Dead","diff":"0","accepted":"0","rejected":"0","stale":"0","lstime":"0"}]"}"}"}
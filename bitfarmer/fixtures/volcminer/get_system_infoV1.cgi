@@ -0,0 +1 @@
+{"code":0,"message":"success","data":"{"minertype":"VolcMiner D1","hostname":"VolcMiner","macaddr":"B8:27:EB:4A:91:0C","ipaddress":"172.16.0.105","netmask":"255.255.255.0","nettype":"DHCP","firmware_version":"D1_20240911","kernel_version":"Linux 4.9.38 #1 SMP PREEMPT","system_mode":"GNU/Linux"}"}
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+
+from bitfarmer.miner import MinerStatus
+
+# Samples kept per miner (a day at the default 60s poll)
+HISTORY_LEN = 1440
+
+
+def sample(status: MinerStatus, ts: float) -> dict:
+    """Compact history entry for status"""
+    return {
+        "ts": ts,
+        "hashrate": status.hashrate_total_current,
+        "hashrate_avg": status.hashrate_total_avg,
+        "temps": [status.temp_0, status.temp_1, status.temp_2, status.temp_3][
+            : status.hashboards
+        ],
+        "fans": [status.fan_0, status.fan_1, status.fan_2, status.fan_3][: status.fans],
+        "accepted": status.pool_accepted,
+        "rejected": status.pool_rejected,
+        "stale": status.pool_stale,
+        "pool": status.pool,
+    }
+
+
+class FleetState:
+    """Latest status and in-memory history of every miner, versioned per poll"""
+
+    def __init__(self, history_len: int = HISTORY_LEN):
+        self.history_len = history_len
+        # Distinguishes versions across restarts for ETags
+        self.boot = int(time.time())
+        self.cond = threading.Condition()
+        self.version = 0
+        self.updated = None
+        self.latest = {}
+        self.seen = {}
+        self.up = {}
+        self.history = {}
+        self.stale = set()
+        self._body = None
+
+    def update(
+        self,
+        statuses: list,
+        ips: list,
+        ts: float | None = None,
+        stale=(),
+    ):
+        """Publish a poll cycle, miners in ips without a status are marked down
+
+        Statuses of IPs in stale were carried forward from an earlier poll,
+        they keep their last seen time and add no history.
+        """
+        ts = time.time() if ts is None else ts
+        stale = set(stale)
+        with self.cond:
+            for status in statuses:
+                if status.ip not in stale:
+                    self.record(status, ts)
+            polled = {status.ip for status in statuses}
+            for ip in ips:
+                self.up[ip] = ip in polled
+            self.stale = stale & polled
+            for table in (self.latest, self.seen, self.up, self.history):
+                for ip in [ip for ip in table if ip not in ips]:
+                    del table[ip]
+            self.changed(ts)
+
+    def apply(self, status: MinerStatus, ts: float | None = None):
+        """Publish a result that arrived after its poll cycle"""
+        ts = time.time() if ts is None else ts
+        with self.cond:
+            if status.ip not in self.up:
+                return
+            self.record(status, ts)
+            self.up[status.ip] = True
+            self.stale.discard(status.ip)
+            self.changed(ts)
+
+    def restore(self, statuses: list, seen: dict):
+        """Load statuses saved by an earlier run, marked stale until polled"""
+        with self.cond:
+            for status in statuses:
+                self.latest[status.ip] = status
+                self.seen[status.ip] = seen[status.ip]
+                self.up[status.ip] = True
+                self.stale.add(status.ip)
+            self.changed(time.time())
+
+    def add_history(self, ip: str, samples: list):
+        """Put samples saved by an earlier run before the miner's history"""
+        with self.cond:
+            if not samples:
+                return
+            newer = [s for s in self.history.get(ip, ()) if s["ts"] > samples[-1]["ts"]]
+            self.history[ip] = deque(samples + newer, maxlen=self.history_len)
+
+    def record(self, status: MinerStatus, ts: float):
+        """Store status, call with cond held"""
+        self.latest[status.ip] = status
+        self.seen[status.ip] = ts
+        if status.ip not in self.history:
+            self.history[status.ip] = deque(maxlen=self.history_len)
+        self.history[status.ip].append(sample(status, ts))
+
+    def changed(self, ts: float):
+        """Bump version and wake waiters, call with cond held"""
+        self.version += 1
+        self.updated = ts
+        self._body = None
+        self.cond.notify_all()
+
+    def miner(self, ip: str) -> dict:
+        """Latest state of one miner, seen is the time of its last good poll"""
+        status = self.latest.get(ip)
+        return {
+            "ip": ip,
+            "up": self.up.get(ip, False),
+            "seen": self.seen.get(ip),
+            "stale": ip in self.stale,
+            "status": asdict(status) if status is not None else None,
+        }
+
+    def snapshot(self) -> tuple:
+        """(version, etag, JSON body) of fleet, serialized once per version"""
+        with self.cond:
+            if self._body is None:
+                self._body = json.dumps(
+                    {
+                        "version": self.version,
+                        "updated": self.updated,
+                        "miners": [self.miner(ip) for ip in sorted(self.up)],
+                    }
+                ).encode()
+            return self.version, self.etag(), self._body
+
+    def etag(self) -> str:
+        return f'"{self.boot}-{self.version}"'
+
+    def wait(self, etag: str, timeout: float) -> bool:
+        """Block until fleet changes from etag, return true if it did"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.etag() == etag:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def ips(self) -> list:
+        with self.cond:
+            return sorted(self.up)
+
+    def miner_state(self, ip: str) -> dict | None:
+        with self.cond:
+            if ip not in self.up:
+                return None
+            return self.miner(ip)
+
+    def miner_history(self, ip: str, since: float = 0) -> list | None:
+        with self.cond:
+            if ip not in self.up:
+                return None
+            return [s for s in self.history.get(ip, ()) if s["ts"] > since]
+
+
+FLEET = FleetState()
+
+
+if __name__ == "__main__":
+    fleet = FleetState()
+    fleet.update(
+        [MinerStatus("10.0.0.1", hashboards=3, fans=4)], ["10.0.0.1", "10.0.0.2"]
+    )
+    version, etag, body = fleet.snapshot()
+    print(version, etag, body.decode())
+    print(fleet.miner_history("10.0.0.1"))
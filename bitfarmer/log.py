@@ -7,11 +7,13 @@ from typing import Optional
 
 import bitfarmer.coloring as coloring
 import bitfarmer.config as config
+import bitfarmer.shares as shares
 from bitfarmer.weather import Weather
 
 LOG_FILE = "bitfarmer.log"
 MINER_LOG = "minerstats.csv"
 WEATHER_LOG = "weather.csv"
+SHARES_LOG = "sharestats.csv"
 
 
 def log_msg(msg: str, level: str, exc: Optional[Exception] = None, quiet: bool = False):
@@ -58,15 +60,26 @@ def log_stats(msg: str):
             f.write(f"{int(time.time())}, {msg}\n")
 
 
+def log_shares(ip: str, stats: list):
+    """log rolling share counts"""
+    if not os.path.isfile(f"{config.DATA_DIR}{SHARES_LOG}"):
+        with open(f"{config.DATA_DIR}{SHARES_LOG}", "a", encoding="ascii") as f:
+            f.write(shares.csv_header())
+            f.write(f"{int(time.time())}, {shares.csv(ip, stats)}\n")
+    else:
+        with open(f"{config.DATA_DIR}{SHARES_LOG}", "a", encoding="ascii") as f:
+            f.write(f"{int(time.time())}, {shares.csv(ip, stats)}\n")
+
+
 def log_weather(wtr: Weather):
     """log weather data"""
     if not os.path.isfile(f"{config.DATA_DIR}{WEATHER_LOG}"):
         with open(f"{config.DATA_DIR}{WEATHER_LOG}", "a", encoding="ascii") as f:
             f.write(wtr.csv_header())
-            f.write(f"{int(time.ctime())}, {wtr.csv()}\n")
+            f.write(f"{int(time.time())}, {wtr.csv()}\n")
     else:
         with open(f"{config.DATA_DIR}{WEATHER_LOG}", "a", encoding="ascii") as f:
-            f.write(f"{int(time.ctime())}, {wtr.csv()}\n")
+            f.write(f"{int(time.time())}, {wtr.csv()}\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = "0.0.0.0"
+METRICS_PORT = 9105
+# Seconds, spanning a LAN round trip up to the 40s VolcMiner POST timeout
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 40)
+CYCLE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Miner hashrates are reported in MH/s
+HASHES_PER_MH = 1_000_000
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value) -> str:
+    """Escape label value for exposition format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(**kwargs) -> str:
+    """Render label set"""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in kwargs.items()) + "}"
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, **lbls) -> list:
+        """Exposition lines for histogram"""
+        out = []
+        total = 0
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            out.append(f"{name}_bucket{labels(**lbls, le=bound)} {total}")
+        out.append(f"{name}_bucket{labels(**lbls, le='+Inf')} {self.count}")
+        out.append(f"{name}_sum{labels(**lbls) if lbls else ''} {self.sum}")
+        out.append(f"{name}_count{labels(**lbls) if lbls else ''} {self.count}")
+        return out
+
+
+class Metrics:
+    """In-memory snapshot of the latest miner status and poll timings"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.up = {}
+        self.last_seen = {}
+        self.requests = {}
+        self.polls = {}
+        self.errors = {}
+        self.cycles = Histogram(CYCLE_BUCKETS)
+        self.last_cycle = 0.0
+
+    def record_status(self, status):
+        with self.lock:
+            self.statuses[status.ip] = status
+            self.up[status.ip] = 1
+            self.last_seen[status.ip] = time.time()
+
+    def record_down(self, ip: str):
+        with self.lock:
+            self.up[ip] = 0
+
+    def observe_request(self, ip: str, endpoint: str, seconds: float):
+        with self.lock:
+            hist = self.requests.get((ip, endpoint))
+            if hist is None:
+                hist = self.requests[(ip, endpoint)] = Histogram(LATENCY_BUCKETS)
+            hist.observe(seconds)
+
+    def observe_poll(self, ip: str, seconds: float):
+        with self.lock:
+            hist = self.polls.get(ip)
+            if hist is None:
+                hist = self.polls[ip] = Histogram(LATENCY_BUCKETS)
+            hist.observe(seconds)
+
+    def count_error(self, ip: str, kind: str):
+        with self.lock:
+            self.errors[(ip, kind)] = self.errors.get((ip, kind), 0) + 1
+
+    def observe_cycle(self, seconds: float):
+        with self.lock:
+            self.cycles.observe(seconds)
+            self.last_cycle = seconds
+
+    def prune(self, ips):
+        """Forget miners no longer in config"""
+        ips = set(ips)
+        with self.lock:
+            for table in (self.statuses, self.up, self.last_seen, self.polls):
+                for ip in [ip for ip in table if ip not in ips]:
+                    del table[ip]
+            for table in (self.requests, self.errors):
+                for key in [key for key in table if key[0] not in ips]:
+                    del table[key]
+
+    def render(self) -> str:
+        """Prometheus text exposition of the current snapshot"""
+        out = []
+
+        def family(name: str, kind: str, help_text: str):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            statuses = sorted(self.statuses.values(), key=lambda s: s.ip)
+            family("bitfarmer_miner_up", "gauge", "1 if the last poll succeeded")
+            for ip, up in sorted(self.up.items()):
+                out.append(f"bitfarmer_miner_up{labels(ip=ip)} {up}")
+            family(
+                "bitfarmer_miner_last_seen_timestamp_seconds",
+                "gauge",
+                "Time of last successful poll",
+            )
+            for ip, ts in sorted(self.last_seen.items()):
+                out.append(
+                    f"bitfarmer_miner_last_seen_timestamp_seconds{labels(ip=ip)} {ts}"
+                )
+            family("bitfarmer_miner_info", "gauge", "Miner identity and pool")
+            for s in statuses:
+                info = labels(
+                    ip=s.ip,
+                    hostname=s.hostname,
+                    type=s.miner_type,
+                    pool=s.pool,
+                    worker=s.pool_user,
+                )
+                out.append(f"bitfarmer_miner_info{info} 1")
+            family(
+                "bitfarmer_hashrate_hashes_per_second",
+                "gauge",
+                "Current miner hashrate",
+            )
+            for s in statuses:
+                out.append(
+                    f"bitfarmer_hashrate_hashes_per_second{labels(ip=s.ip)} "
+                    f"{s.hashrate_total_current * HASHES_PER_MH}"
+                )
+            family(
+                "bitfarmer_hashrate_avg_hashes_per_second",
+                "gauge",
+                "Average miner hashrate reported by firmware",
+            )
+            for s in statuses:
+                out.append(
+                    f"bitfarmer_hashrate_avg_hashes_per_second{labels(ip=s.ip)} "
+                    f"{s.hashrate_total_avg * HASHES_PER_MH}"
+                )
+            family(
+                "bitfarmer_chain_hashrate_hashes_per_second",
+                "gauge",
+                "Current hashrate per chain",
+            )
+            for s in statuses:
+                chains = [s.hashrate_0, s.hashrate_1, s.hashrate_2, s.hashrate_3]
+                for i, rate in enumerate(chains[: s.hashboards]):
+                    out.append(
+                        f"bitfarmer_chain_hashrate_hashes_per_second"
+                        f"{labels(ip=s.ip, chain=i)} {rate * HASHES_PER_MH}"
+                    )
+            family(
+                "bitfarmer_chain_temperature_celsius", "gauge", "Temperature per chain"
+            )
+            for s in statuses:
+                temps = [s.temp_0, s.temp_1, s.temp_2, s.temp_3]
+                for i, temp in enumerate(temps[: s.hashboards]):
+                    out.append(
+                        f"bitfarmer_chain_temperature_celsius"
+                        f"{labels(ip=s.ip, chain=i)} {temp}"
+                    )
+            family("bitfarmer_fan_rpm", "gauge", "Fan speed")
+            for s in statuses:
+                fans = [s.fan_0, s.fan_1, s.fan_2, s.fan_3]
+                for i, rpm in enumerate(fans[: s.fans]):
+                    out.append(f"bitfarmer_fan_rpm{labels(ip=s.ip, fan=i)} {rpm}")
+            for name, attr, help_text in (
+                ("accepted", "pool_accepted", "Shares accepted by the active pool"),
+                ("rejected", "pool_rejected", "Shares rejected by the active pool"),
+                ("stale", "pool_stale", "Stale shares on the active pool"),
+            ):
+                metric = f"bitfarmer_shares_{name}_total"
+                family(metric, "counter", help_text)
+                for s in statuses:
+                    out.append(f"{metric}{labels(ip=s.ip)} {getattr(s, attr)}")
+            family(
+                "bitfarmer_request_duration_seconds",
+                "histogram",
+                "Miner HTTP request latency",
+            )
+            for (ip, endpoint), hist in sorted(self.requests.items()):
+                out += hist.lines(
+                    "bitfarmer_request_duration_seconds", ip=ip, endpoint=endpoint
+                )
+            family(
+                "bitfarmer_poll_duration_seconds",
+                "histogram",
+                "Time to poll one miner",
+            )
+            for ip, hist in sorted(self.polls.items()):
+                out += hist.lines("bitfarmer_poll_duration_seconds", ip=ip)
+            family("bitfarmer_errors_total", "counter", "Poll errors by type")
+            for (ip, kind), n in sorted(self.errors.items()):
+                out.append(f"bitfarmer_errors_total{labels(ip=ip, type=kind)} {n}")
+            family(
+                "bitfarmer_cycle_duration_seconds",
+                "histogram",
+                "Time to poll and reconcile the fleet",
+            )
+            out += self.cycles.lines("bitfarmer_cycle_duration_seconds")
+            family(
+                "bitfarmer_last_cycle_duration_seconds",
+                "gauge",
+                "Duration of the last cycle",
+            )
+            out.append(f"bitfarmer_last_cycle_duration_seconds {self.last_cycle}")
+        return "\n".join(out) + "\n"
+
+
+METRICS = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve /metrics from the in-memory snapshot"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Embedded /metrics endpoint on a background thread"""
+
+    def __init__(
+        self,
+        host: str = METRICS_HOST,
+        port: int = METRICS_PORT,
+        metrics: Metrics = METRICS,
+    ):
+        self.host = host
+        self.port = port
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.metrics = metrics
+        self.thread = None
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        """Build server from metrics section of config"""
+        mc = conf["metrics"]
+        return cls(mc.get("host", METRICS_HOST), mc.get("port", METRICS_PORT))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    from urllib.request import urlopen
+
+    from bitfarmer.miner import MinerStatus
+
+    status = MinerStatus("10.0.0.1", hashboards=3, fans=4, temp_0=61, fan_0=4200)
+    METRICS.record_status(status)
+    METRICS.observe_request("10.0.0.1", "/cgi-bin/stats.cgi", 0.042)
+    METRICS.count_error("10.0.0.2", "ConnectTimeout")
+    METRICS.observe_cycle(1.7)
+    server = MetricsServer("127.0.0.1", 0).start()
+    port = server.server.server_address[1]
+    print(urlopen(f"http://127.0.0.1:{port}/metrics").read().decode())
+    server.stop()
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 
+import time
 from abc import abstractmethod
 from dataclasses import dataclass
 
 import bitfarmer.coloring as coloring
+import bitfarmer.profiling as profiling
+from bitfarmer.metrics import METRICS
+
+DEFAULT_PHASE = "A"
 
 
 def get_style(name: str, icons_enabled: bool):
@@ -49,17 +54,53 @@ def get_style(name: str, icons_enabled: bool):
 class Miner:
     """Master miner class"""
 
+    # Estimated power draw (W) at full hashrate, used to budget power ramps
+    default_watts = 3500
+    # (freq, voltage) steps from full speed down, empty if miner can't be tuned
+    tune_levels = ()
+    # Allowed (min, max) of a custom full speed freq and voltage
+    freq_range = ()
+    voltage_range = ()
+    # Primary and secondary pool swapped by the pool prober
+    pools_swapped = False
+
     def __init__(self, conf: dict):
         self.ip = conf["ip"]
         self.login = conf["login"]
         self.password = conf["password"]
         self.tod = conf["tod"]
+        self.tod_group = conf.get("tod_group", "")
+        self.priority = conf.get("priority", 0)
+        self.phase = conf.get("phase", DEFAULT_PHASE)
+        self.watts = conf.get("watts", self.default_watts)
+        # Unmanaged miners are monitored only, nothing is pushed to them
+        self.managed = conf.get("managed", True)
         self.primary_pool = conf["primary_pool"]
         self.primary_pool_user = conf["primary_pool_user"]
         self.primary_pool_pass = conf["primary_pool_pass"]
         self.secondary_pool = conf["secondary_pool"]
         self.secondary_pool_user = conf["secondary_pool_user"]
         self.secondary_pool_pass = conf["secondary_pool_pass"]
+        self.level = 0
+        self._session = None
+
+    @property
+    def session(self):
+        """HTTP session kept alive across requests"""
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        return self._session
+
+    def request(self, method: str, uri: str, **kwargs):
+        """HTTP request to miner, timed per endpoint"""
+        start = time.perf_counter()
+        try:
+            with profiling.span("http", ip=self.ip, uri=uri):
+                return self.session.request(method, f"http://{self.ip}{uri}", **kwargs)
+        finally:
+            METRICS.observe_request(self.ip, uri, time.perf_counter() - start)
 
     @abstractmethod
     def get_miner_status(self):
@@ -76,11 +117,20 @@ class Miner:
         """Abstract method to be implemented by subclasses"""
         pass
 
+    @abstractmethod
+    def config_diff(self, mining: bool) -> dict:
+        """Abstract method to be implemented by subclasses"""
+        pass
+
     @abstractmethod
     def reboot(self):
         """Abstract method to be implemented by subclasses"""
         pass
 
+    def tune(self, level: int):
+        """Apply tune level (only for miners with tune_levels)"""
+        raise NotImplementedError(f"{type(self).__name__} can't be tuned")
+
 
 @dataclass
 class MinerStatus:
@@ -145,6 +195,11 @@ class MinerStatus:
                     (self.temp_0 + self.temp_1 + self.temp_2 + self.temp_3) / 4, 1
                 )
 
+    def chain_temps(self) -> list:
+        """Chain temperatures, skipping chains without a reading"""
+        temps = [self.temp_0, self.temp_1, self.temp_2, self.temp_3]
+        return [t for t in temps[: self.hashboards] if t > 0]
+
     def get_rejection_rate(self) -> str:
         """Get rejection rate from pool"""
         return (
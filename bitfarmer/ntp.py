@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 
-import ntplib
+import bitfarmer.profiling as profiling
 
-NTP_CLIENT = ntplib.NTPClient()
+NTP_CLIENT = None
 
 
 def get_ts(server: str) -> int:
     """Get timestamp from ntp server"""
-    resp = NTP_CLIENT.request(server, version=3)
+    global NTP_CLIENT
+    if NTP_CLIENT is None:
+        import ntplib
+
+        NTP_CLIENT = ntplib.NTPClient()
+    with profiling.span("ntp", server=server):
+        resp = NTP_CLIENT.request(server, version=3)
     return int(resp.tx_time)
 
 
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+
+from bitfarmer.miner import MinerStatus
+
+# Seconds a poll cycle waits for miners before carrying results forward
+POLL_DEADLINE = 30
+# Miners polled at once
+POLL_WORKERS = 16
+DEADLINE_ERROR = "Deadline"
+
+
+@dataclass(slots=True)
+class PollResult:
+    """Outcome of polling one miner, stale if carried forward from an earlier poll"""
+
+    ip: str
+    status: MinerStatus | None
+    error: str
+    seconds: float
+    ts: float
+    stale: bool = False
+
+    def age(self, now: float | None = None) -> float:
+        """Seconds since the miner answered"""
+        return (time.time() if now is None else now) - self.ts
+
+
+class Poller:
+    """Poll miners concurrently, bounding each cycle by a deadline
+
+    Miners still being polled at the deadline keep running in the background
+    and are not polled again until they finish. Until then their last good
+    result is carried forward marked stale. A late result replaces the last
+    good one as soon as it arrives and is passed to `late`.
+    """
+
+    def __init__(
+        self,
+        poll,
+        deadline: float = POLL_DEADLINE,
+        workers: int = POLL_WORKERS,
+        late=None,
+    ):
+        self.poll = poll
+        self.deadline = deadline
+        self.workers = workers
+        self.late = late
+        self.lock = threading.RLock()
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="poll")
+        self.pending = {}
+        self.last = {}
+        self.cycle_id = 0
+
+    @classmethod
+    def from_conf(cls, conf: dict, poll, late=None):
+        """Build poller from optional poll section of config"""
+        poller = cls(poll, late=late)
+        poller.configure(conf)
+        return poller
+
+    def configure(self, conf: dict):
+        """Apply poll settings, forgetting miners no longer in config"""
+        pc = conf.get("poll", {})
+        self.deadline = pc.get("deadline", POLL_DEADLINE)
+        workers = pc.get("workers", POLL_WORKERS)
+        if workers != self.workers:
+            # Polls in flight finish on the old pool
+            self.pool.shutdown(wait=False)
+            self.pool = ThreadPoolExecutor(workers, thread_name_prefix="poll")
+            self.workers = workers
+        ips = {miner["ip"] for miner in conf.get("miners", [])}
+        with self.lock:
+            self.last = {ip: r for ip, r in self.last.items() if ip in ips}
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, miner, cycle: int) -> PollResult:
+        """Poll one miner in a worker thread"""
+        start = time.perf_counter()
+        status, error = self.poll(miner)
+        result = PollResult(
+            miner.ip, status, error, time.perf_counter() - start, time.time()
+        )
+        with self.lock:
+            self.pending.pop(miner.ip, None)
+            if status is not None:
+                self.last[miner.ip] = result
+            late = cycle != self.cycle_id
+        if late and self.late is not None:
+            self.late(result)
+        return result
+
+    def cycle(self, miners: list) -> list:
+        """PollResult of each miner within the deadline, in order of miners"""
+        with self.lock:
+            self.cycle_id += 1
+            cycle = self.cycle_id
+            futures = {}
+            for miner in miners:
+                if miner.ip not in self.pending:
+                    self.pending[miner.ip] = futures[miner.ip] = self.pool.submit(
+                        self.run, miner, cycle
+                    )
+        end = time.monotonic() + self.deadline
+        waiting = set(futures.values())
+        while waiting:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            _, waiting = wait(waiting, remaining, return_when=FIRST_COMPLETED)
+        with self.lock:
+            # Results finishing from here on are late
+            self.cycle_id += 1
+            results = []
+            for miner in miners:
+                future = futures.get(miner.ip)
+                if future is not None and future.done():
+                    results.append(future.result())
+                else:
+                    results.append(self.carry(miner.ip))
+            return results
+
+    def keep(self, result: PollResult):
+        """Remember a result polled elsewhere, such as by cluster workers"""
+        if result.status is not None:
+            with self.lock:
+                self.last[result.ip] = result
+
+    def carry(self, ip: str) -> PollResult:
+        """Last good result of a miner marked stale, down if there is none"""
+        with self.lock:
+            last = self.last.get(ip)
+        if last is None:
+            return PollResult(ip, None, DEADLINE_ERROR, self.deadline, time.time())
+        return replace(last, stale=True)
+
+
+if __name__ == "__main__":
+    import random
+
+    class Demo:
+        def __init__(self, ip: str, delay: float):
+            self.ip = ip
+            self.delay = delay
+
+    def poll(miner) -> tuple:
+        time.sleep(miner.delay * random.uniform(0.5, 1))
+        return MinerStatus(miner.ip), ""
+
+    miners = [Demo(f"10.0.0.{n}", 0.1) for n in range(1, 6)] + [Demo("10.0.0.9", 3)]
+    poller = Poller(
+        poll, deadline=1, late=lambda r: print(f"late {r.ip} {r.seconds:.1f}s")
+    )
+    for _ in range(4):
+        start = time.monotonic()
+        results = poller.cycle(miners)
+        time.sleep(1)
+        print(
+            f"cycle {time.monotonic() - start:.1f}s: "
+            + ", ".join(
+                f"{r.ip} stale {r.age():.0f}s" if r.stale else r.ip
+                for r in results
+                if r.stale or r.status is None
+            )
+        )
+    poller.close()
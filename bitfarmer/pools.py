@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+
+import json
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import bitfarmer.coloring as coloring
+import bitfarmer.log as log
+from bitfarmer.anomaly import Ewma
+from bitfarmer.reconcile import Reconciler
+
+PROBE_INTERVAL = 300
+PROBE_TIMEOUT = 5
+PROBE_ALPHA = 0.3
+# Failed probes in a row before a pool counts as degraded
+PROBE_FAIL_AFTER = 3
+PROBE_MAX_CHANGES = 5
+# Probe outcomes kept per pool for the success rate
+PROBE_WINDOW = 20
+DEFAULT_PORT = 3333
+SUBSCRIBE = {"id": 1, "method": "mining.subscribe", "params": ["bitfarmer"]}
+SWAP = "swap_pools"
+
+
+def parse_url(url: str) -> tuple:
+    """(host, port) of a stratum URL such as stratum+tcp://pool:3333"""
+    parts = urlsplit(url if "://" in url else f"stratum+tcp://{url}")
+    if not parts.hostname:
+        raise ValueError(f"Invalid pool url: {url}")
+    return parts.hostname, parts.port or DEFAULT_PORT
+
+
+@dataclass(slots=True)
+class Probe:
+    """One connection attempt, latencies in ms"""
+
+    url: str
+    ok: bool
+    connect: float = 0.0
+    response: float = 0.0
+    error: str = ""
+
+
+def probe(url: str, timeout: float = PROBE_TIMEOUT, subscribe: bool = True) -> Probe:
+    """Time TCP connect and, with subscribe, the reply to mining.subscribe"""
+    start = time.perf_counter()
+    try:
+        host, port = parse_url(url)
+        with socket.create_connection((host, port), timeout) as sock:
+            connected = time.perf_counter()
+            connect = (connected - start) * 1000
+            if not subscribe:
+                return Probe(url, True, connect)
+            sock.sendall(json.dumps(SUBSCRIBE).encode() + b"\n")
+            with sock.makefile("rb") as rfile:
+                line = rfile.readline()
+            if not line:
+                return Probe(url, False, connect, error="No reply")
+            reply = json.loads(line)
+            if not isinstance(reply, dict) or reply.get("error"):
+                return Probe(url, False, connect, error="Bad subscribe reply")
+            return Probe(url, True, connect, (time.perf_counter() - connected) * 1000)
+    except (OSError, ValueError) as e:
+        return Probe(url, False, error=type(e).__name__)
+
+
+class PoolStats:
+    """Smoothed latency and recent outcomes of one pool"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.connect = Ewma()
+        self.response = Ewma()
+        self.outcomes = deque(maxlen=PROBE_WINDOW)
+        self.failures = 0
+        self.error = ""
+
+    def add(self, result: Probe, alpha: float):
+        self.outcomes.append(result.ok)
+        if not result.ok:
+            self.failures += 1
+            self.error = result.error
+            return
+        self.failures = 0
+        self.connect.update(result.connect, alpha)
+        if result.response:
+            self.response.update(result.response, alpha)
+
+    def latency(self) -> float:
+        """Connect plus response latency (ms), inf until a probe succeeded"""
+        if not self.connect.n:
+            return float("inf")
+        return self.connect.mean + self.response.mean
+
+    def success_rate(self) -> float:
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def degraded(self, fail_after: int) -> bool:
+        return self.failures >= fail_after or not self.connect.n
+
+
+class PoolProber:
+    """Probe pools concurrently in the background and rank them by latency
+
+    With `reassign`, a miner meant to mine whose primary pool is degraded and whose
+    secondary is healthy has the two swapped (with their users and
+    passwords) and is reconfigured, so it stays on the faster pool. It is
+    swapped back once its own primary recovers. Swapped miners are kept in
+    the reconciler, which saves them with the rest of its state.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.interval = PROBE_INTERVAL
+        self.timeout = PROBE_TIMEOUT
+        self.subscribe = True
+        self.alpha = PROBE_ALPHA
+        self.fail_after = PROBE_FAIL_AFTER
+        self.reassign_pools = False
+        self.max_changes = PROBE_MAX_CHANGES
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.stop_event = threading.Event()
+        self.wake = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        """Build prober from optional pool_probe section of config"""
+        prober = cls()
+        prober.configure(conf)
+        return prober
+
+    def configure(self, conf: dict):
+        """Apply probe settings and probe the configured and assigned pools"""
+        pc = conf.get("pool_probe", {})
+        self.enabled = "pool_probe" in conf and pc.get("enabled", True)
+        self.interval = pc.get("interval", PROBE_INTERVAL)
+        self.timeout = pc.get("timeout", PROBE_TIMEOUT)
+        self.subscribe = pc.get("subscribe", True)
+        self.alpha = pc.get("alpha", PROBE_ALPHA)
+        self.fail_after = pc.get("fail_after", PROBE_FAIL_AFTER)
+        self.reassign_pools = pc.get("reassign", False)
+        self.max_changes = pc.get("max_changes", PROBE_MAX_CHANGES)
+        urls = pool_urls(conf) if self.enabled else []
+        with self.lock:
+            self.stats = {url: self.stats.get(url) or PoolStats(url) for url in urls}
+        self.wake.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wake.clear()
+            if self.stats:
+                self.probe_all()
+            self.wake.wait(self.interval)
+
+    def probe_all(self):
+        """Probe every pool once, concurrently"""
+        with self.lock:
+            urls = list(self.stats)
+        with ThreadPoolExecutor(len(urls)) as pool:
+            results = list(
+                pool.map(lambda url: probe(url, self.timeout, self.subscribe), urls)
+            )
+        with self.lock:
+            for result in results:
+                stats = self.stats.get(result.url)
+                if stats is None:
+                    continue
+                was_degraded = stats.degraded(self.fail_after) and stats.connect.n
+                stats.add(result, self.alpha)
+                if stats.failures == self.fail_after:
+                    log.log_msg(
+                        f"Pool {result.url} degraded ({result.error})",
+                        "WARNING",
+                        quiet=True,
+                    )
+                elif was_degraded and result.ok:
+                    log.log_msg(f"Pool {result.url} recovered", "INFO", quiet=True)
+        log.log_msg(f"Pools: {self.ranking_text()}", "INFO", quiet=True)
+
+    def ranking(self) -> list:
+        """PoolStats, healthy pools first, then by latency"""
+        with self.lock:
+            return sorted(
+                self.stats.values(),
+                key=lambda s: (s.degraded(self.fail_after), s.latency()),
+            )
+
+    def ranking_text(self) -> str:
+        parts = []
+        for stats in self.ranking():
+            if stats.degraded(self.fail_after):
+                parts.append(f"{stats.url} down")
+            else:
+                parts.append(f"{stats.url} {stats.latency():.0f}ms")
+        return ", ".join(parts)
+
+    def healthy(self, url: str) -> bool | None:
+        """True if pool is healthy, None if it isn't probed (yet)"""
+        with self.lock:
+            stats = self.stats.get(url)
+            if stats is None or not stats.outcomes:
+                return None
+            return not stats.degraded(self.fail_after)
+
+    def reassign(
+        self,
+        miners: list,
+        statuses: list,
+        reconciler: Reconciler,
+        tod_active: dict,
+        now: float | None = None,
+    ) -> list:
+        """Swap primary and secondary pools of miners stuck on a degraded primary,
+        and back once it recovers"""
+        now = time.monotonic() if now is None else now
+        for miner in miners:
+            if miner.ip in reconciler.swapped and not miner.secondary_pool:
+                reconciler.swapped.discard(miner.ip)
+            # Restored from a snapshot, or recreated from a reloaded config
+            if (miner.ip in reconciler.swapped) != miner.pools_swapped:
+                swap_pools(miner)
+        if not self.enabled or not self.reassign_pools:
+            return []
+        observed = {status.ip: status for status in statuses}
+        actions = []
+        for miner in miners:
+            status = observed.get(miner.ip)
+            if status is None or not miner.managed:
+                continue
+            if not miner.secondary_pool or not reconciler.desired(miner, tod_active):
+                continue
+            # Left to the reconciler while it is correcting the miner
+            if not reconciler.settled(miner.ip, now):
+                continue
+            back = miner.pools_swapped and self.healthy(miner.secondary_pool)
+            if not back and (
+                self.healthy(miner.primary_pool) is not False
+                or not self.healthy(miner.secondary_pool)
+            ):
+                continue
+            if len(actions) >= self.max_changes:
+                log.log_msg("Pool change limit reached", "INFO", quiet=True)
+                break
+            reconciler.record(miner.ip, now)
+            swap_pools(miner)
+            try:
+                _ = miner.start_mining()
+            except Exception as e:
+                swap_pools(miner)
+                log.log_msg(f"Error switching pools on {miner.ip}", "ERROR", exc=e)
+                continue
+            if back:
+                reconciler.swapped.discard(miner.ip)
+                log.log_msg(
+                    f"{miner.ip} primary pool {miner.primary_pool} recovered, "
+                    "switched back",
+                    "INFO",
+                )
+            else:
+                reconciler.swapped.add(miner.ip)
+                log.log_msg(
+                    f"{miner.ip} primary pool {miner.secondary_pool} degraded, "
+                    f"switched to {miner.primary_pool}",
+                    "WARNING",
+                )
+            actions.append((miner.ip, SWAP))
+        return actions
+
+    def summary(self) -> str:
+        """Pool ranking for status view"""
+        if not self.enabled:
+            return ""
+        return self.ranking_text()
+
+
+def pool_urls(conf: dict) -> list:
+    """Configured pools and pools assigned to miners, without duplicates"""
+    urls = list(conf.get("pools", []))
+    for miner in conf.get("miners", []):
+        urls += [miner.get("primary_pool", ""), miner.get("secondary_pool", "")]
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+def swap_pools(miner):
+    """Swap primary and secondary pool (with user and password) of miner"""
+    miner.pools_swapped = not miner.pools_swapped
+    miner.primary_pool, miner.secondary_pool = miner.secondary_pool, miner.primary_pool
+    miner.primary_pool_user, miner.secondary_pool_user = (
+        miner.secondary_pool_user,
+        miner.primary_pool_user,
+    )
+    miner.primary_pool_pass, miner.secondary_pool_pass = (
+        miner.secondary_pool_pass,
+        miner.primary_pool_pass,
+    )
+
+
+def rank_urls(urls: list, timeout: float = 2) -> list:
+    """Probe pools once and return them fastest first, printing latencies"""
+    if not urls:
+        return []
+    with ThreadPoolExecutor(len(urls)) as pool:
+        results = list(pool.map(lambda url: probe(url, timeout), urls))
+    results.sort(key=lambda r: (not r.ok, r.connect + r.response))
+    for r in results:
+        if r.ok:
+            coloring.print_info(f"{r.url}: {r.connect + r.response:.0f}ms")
+        else:
+            coloring.print_warn(f"{r.url}: unreachable ({r.error})")
+    return [r.url for r in results]
+
+
+if __name__ == "__main__":
+    from bitfarmer.simulator import StratumPool
+
+    fast = StratumPool(latency=0.01).start()
+    slow = StratumPool(latency=0.2).start()
+    conf = {"pool_probe": {"interval": 0.5, "fail_after": 2}, "pools": []}
+    conf["pools"] = [slow.url, fast.url]
+    prober = PoolProber.from_conf(conf)
+    for n in range(3):
+        prober.probe_all()
+        print(prober.ranking_text())
+        if n == 0:
+            fast.down = True
+    print(rank_urls(conf["pools"]))
+    fast.stop()
+    slow.stop()
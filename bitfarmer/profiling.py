@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+PROFILE_LOG = "profile.log"
+PROFILE_TRACE = "profile.trace.json"
+# Cycles kept in the trace file
+TRACE_CYCLES = 50
+
+ENABLED = False
+PROFILER = None
+_NULL = nullcontext()
+
+
+class Span:
+    """Timed region recorded as a complete trace event"""
+
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name: str, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(
+            self.name, self.start, time.perf_counter_ns() - self.start, self.args
+        )
+        return False
+
+
+class Profiler:
+    """Collect spans per poll cycle, write a breakdown and a Chrome trace"""
+
+    def __init__(self, data_dir: str, cycles: int = TRACE_CYCLES):
+        self.log_path = f"{data_dir}{PROFILE_LOG}"
+        self.trace_path = f"{data_dir}{PROFILE_TRACE}"
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events = []
+        self.cycles = deque(maxlen=cycles)
+        self.cycle_start = None
+        self.threads = {}
+
+    def span(self, name: str, args: dict) -> Span:
+        return Span(self, name, args)
+
+    def record(self, name: str, start: int, dur: int, args: dict):
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        self.events.append((name, start, dur, tid, args))
+
+    def begin_cycle(self):
+        self.events = []
+        self.cycle_start = time.perf_counter_ns()
+
+    def end_cycle(self) -> str:
+        """Write breakdown line and trace for finished cycle, return breakdown"""
+        if self.cycle_start is None:
+            return ""
+        dur = time.perf_counter_ns() - self.cycle_start
+        self.record("cycle", self.cycle_start, dur, {})
+        events, self.events = self.events, []
+        self.cycles.append(events)
+        line = self.breakdown(events, dur)
+        with open(self.log_path, "a", encoding="ascii") as f:
+            f.write(f"{time.ctime()} - {line}\n")
+        self.write_trace()
+        self.cycle_start = None
+        return line
+
+    @staticmethod
+    def breakdown(events: list, cycle_dur: int) -> str:
+        """Total time and count per phase, slowest first"""
+        totals = {}
+        for name, _, dur, _, _ in events:
+            if name == "cycle":
+                continue
+            total, count = totals.get(name, (0, 0))
+            totals[name] = (total + dur, count + 1)
+        parts = [
+            f"{name} {total / 1e9:.3f}s ({count})"
+            for name, (total, count) in sorted(totals.items(), key=lambda x: -x[1][0])
+        ]
+        return f"cycle {cycle_dur / 1e9:.3f}s: " + ", ".join(parts)
+
+    def write_trace(self):
+        """Write kept cycles as Chrome trace-event JSON (chrome://tracing, Perfetto)"""
+        trace = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in self.threads.items()
+        ]
+        for events in self.cycles:
+            for name, start, dur, tid, args in events:
+                trace.append(
+                    {
+                        "name": name,
+                        "cat": "cycle" if name == "cycle" else "phase",
+                        "ph": "X",
+                        "ts": (start - self.origin) / 1000,
+                        "dur": dur / 1000,
+                        "pid": self.pid,
+                        "tid": tid,
+                        "args": args,
+                    }
+                )
+        tmp = f"{self.trace_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp, self.trace_path)
+
+
+def enable(data_dir: str):
+    """Turn profiling on, writing to data_dir"""
+    global ENABLED, PROFILER
+    PROFILER = Profiler(data_dir)
+    ENABLED = True
+
+
+def span(name: str, **args):
+    """Time a phase (no-op unless profiling is enabled)"""
+    if not ENABLED:
+        return _NULL
+    return PROFILER.span(name, args)
+
+
+def begin_cycle():
+    if ENABLED:
+        PROFILER.begin_cycle()
+
+
+def end_cycle() -> str:
+    if ENABLED:
+        return PROFILER.end_cycle()
+    return ""
+
+
+if __name__ == "__main__":
+    import tempfile
+    import timeit
+
+    n = 1_000_000
+    disabled = timeit.timeit(lambda: span("http", uri="/").__enter__(), number=n)
+    print(f"Disabled span: {disabled / n * 1e9:.0f}ns")
+    with tempfile.TemporaryDirectory() as tmp:
+        enable(tmp + "/")
+        begin_cycle()
+        for i in range(3):
+            with span("ping", ip=f"10.0.0.{i}"):
+                time.sleep(0.01)
+            with span("http", ip=f"10.0.0.{i}", uri="/cgi-bin/stats.cgi"):
+                time.sleep(0.02)
+        print(end_cycle())
+        with open(f"{tmp}/{PROFILE_TRACE}") as f:
+            print(f"Trace events: {len(json.load(f)['traceEvents'])}")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import time
+from collections import deque
+
+import bitfarmer.log as log
+from bitfarmer.miner import DEFAULT_PHASE, Miner
+
+RAMP_BATCH = 5
+RAMP_INTERVAL = 30
+RAMP_SETTLE = 60
+RAMP_TIMEOUT = 900
+RAMP_POLL_INTERVAL = 10
+
+
+class TokenBucket:
+    """Allow burst starts, refilled at burst per interval seconds"""
+
+    def __init__(self, burst: int, interval: float):
+        self.burst = max(1, burst)
+        self.rate = self.burst / interval if interval > 0 else float("inf")
+        self.tokens = float(self.burst)
+        self.updated = None
+
+    def refill(self, now: float):
+        """Add tokens earned since last update"""
+        if self.updated is not None:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        """Consume a token"""
+        self.refill(now)
+        self.tokens -= 1
+
+
+class PowerRamp:
+    """Limit miner starts by rate and by estimated watts ramping per phase"""
+
+    def __init__(
+        self,
+        batch: int = RAMP_BATCH,
+        interval: float = RAMP_INTERVAL,
+        phase_watts: dict | None = None,
+        settle: float = RAMP_SETTLE,
+        timeout: float = RAMP_TIMEOUT,
+    ):
+        self.bucket = TokenBucket(batch, interval)
+        self.phase_watts = phase_watts or {}
+        self.settle = settle
+        self.timeout = timeout
+        self.ramping = {}
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        """Build ramp from optional ramp section of config"""
+        rc = conf.get("ramp", {})
+        phase_watts = rc.get("phase_watts", {})
+        if isinstance(phase_watts, (int, float)):
+            phase_watts = {DEFAULT_PHASE: phase_watts}
+        return cls(
+            batch=rc.get("batch", RAMP_BATCH),
+            interval=rc.get("interval", RAMP_INTERVAL),
+            phase_watts=phase_watts,
+            settle=rc.get("settle", RAMP_SETTLE),
+            timeout=rc.get("timeout", RAMP_TIMEOUT),
+        )
+
+    @staticmethod
+    def order(miners: list) -> list:
+        """Miners in start order (highest priority first)"""
+        return sorted(miners, key=lambda m: (-m.priority, m.ip))
+
+    def expire(self, now: float):
+        """Forget starts that have finished ramping"""
+        for starts in self.ramping.values():
+            while starts and now - starts[0][0] >= self.settle:
+                starts.popleft()
+
+    def phase_wait(self, miner: Miner, now: float) -> float:
+        """Seconds until miner fits in its phase watt budget"""
+        budget = self.phase_watts.get(miner.phase)
+        starts = self.ramping.get(miner.phase)
+        if not budget or not starts:
+            return 0.0
+        load = sum(watts for _, watts in starts)
+        if load + miner.watts <= budget:
+            return 0.0
+        for started, watts in starts:
+            load -= watts
+            if load + miner.watts <= budget or not load:
+                return started + self.settle - now
+        return 0.0
+
+    def wait_time(self, miner: Miner, now: float) -> float:
+        """Seconds until miner may be started"""
+        self.expire(now)
+        return max(self.bucket.wait_time(now), self.phase_wait(miner, now))
+
+    def record(self, miner: Miner, now: float):
+        """Record miner start"""
+        self.bucket.take(now)
+        self.ramping.setdefault(miner.phase, deque()).append((now, miner.watts))
+
+    def try_start(self, miner: Miner, now: float) -> bool:
+        """Record and allow start if limits permit (non-blocking)"""
+        if self.wait_time(miner, now) > 0:
+            return False
+        self.record(miner, now)
+        return True
+
+    def wait_for_hashrate(
+        self, miners: list, since: float, timeout: float | None = None
+    ) -> float | None:
+        """Poll started miners until all hash (for at most timeout, default
+        the ramp timeout), return seconds since ramp began"""
+        timeout = self.timeout if timeout is None else timeout
+        waiting = {miner.ip: miner for miner in miners}
+        while waiting:
+            for ip, miner in list(waiting.items()):
+                try:
+                    if miner.get_miner_status().hashrate_total_current > 0:
+                        del waiting[ip]
+                except Exception:
+                    pass
+            if not waiting:
+                break
+            if time.monotonic() - since > timeout:
+                log.log_msg(
+                    f"Miners not hashing after {timeout:.0f}s: {sorted(waiting)}",
+                    "WARNING",
+                )
+                return None
+            time.sleep(RAMP_POLL_INTERVAL)
+        return time.monotonic() - since
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import time
+from dataclasses import dataclass
+
+import bitfarmer.log as log
+from bitfarmer.miner import Miner, MinerStatus
+from bitfarmer.ramp import PowerRamp
+
+RECONCILE_GRACE = 180
+RECONCILE_COOLDOWN = 300
+RECONCILE_MAX_BACKOFF = 3600
+RECONCILE_MAX_ACTIONS = 10
+START = "start"
+STOP = "stop"
+POOL = "pool"
+
+
+def needs_config(miner: Miner, mining: bool) -> bool:
+    """Return true if miner config differs from desired mining state"""
+    try:
+        diff = miner.config_diff(mining)
+    except Exception as e:
+        log.log_msg(
+            f"Unable to read config for {miner.ip}, pushing anyway",
+            "WARNING",
+            exc=e,
+            quiet=True,
+        )
+        return True
+    if diff:
+        log.log_msg(f"{miner.ip} config changes: {diff}", "INFO", quiet=True)
+    return bool(diff)
+
+
+def is_mining(status: MinerStatus) -> bool:
+    """Miner is connected to a pool or producing hashrate"""
+    return status.pool not in ("None", "POOL_URL") or status.hashrate_total_current > 0
+
+
+@dataclass
+class MinerControl:
+    """Reconciliation bookkeeping for one miner"""
+
+    desired: bool | None = None
+    drift: str = ""
+    drift_since: float = 0.0
+    last_action: float = 0.0
+    attempts: int = 0
+
+    def backoff(self, cooldown: int, max_backoff: int) -> float:
+        """Seconds to wait after last action before acting again"""
+        if not self.attempts:
+            return 0
+        return min(cooldown * 2 ** (self.attempts - 1), max_backoff)
+
+
+class Reconciler:
+    """Drive miners toward the state desired by config and TOD schedule"""
+
+    def __init__(
+        self,
+        grace: int = RECONCILE_GRACE,
+        cooldown: int = RECONCILE_COOLDOWN,
+        max_backoff: int = RECONCILE_MAX_BACKOFF,
+        max_actions: int = RECONCILE_MAX_ACTIONS,
+        ramp: PowerRamp | None = None,
+    ):
+        self.grace = grace
+        self.cooldown = cooldown
+        self.max_backoff = max_backoff
+        self.max_actions = max_actions
+        self.ramp = ramp or PowerRamp()
+        self.ramp_since = None
+        self.controls = {}
+        self.overrides = {}
+        # Idled by the thermal controller, wins over manual start and TOD
+        self.idled = set()
+        # Mining on their secondary pool, switched by the pool prober
+        self.swapped = set()
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        """Build reconciler from optional reconcile section of config"""
+        reconciler = cls()
+        reconciler.configure(conf)
+        return reconciler
+
+    def configure(self, conf: dict):
+        """Apply reconcile and ramp settings, keeping per-miner state"""
+        rc = conf.get("reconcile", {})
+        self.grace = rc.get("grace", RECONCILE_GRACE)
+        self.cooldown = rc.get("cooldown", RECONCILE_COOLDOWN)
+        self.max_backoff = rc.get("max_backoff", RECONCILE_MAX_BACKOFF)
+        self.max_actions = rc.get("max_actions", RECONCILE_MAX_ACTIONS)
+        ramp = PowerRamp.from_conf(conf)
+        ramp.ramping = self.ramp.ramping
+        self.ramp = ramp
+        ips = {miner["ip"] for miner in conf.get("miners", [])}
+        self.controls = {ip: c for ip, c in self.controls.items() if ip in ips}
+        self.overrides = {ip: o for ip, o in self.overrides.items() if ip in ips}
+        self.idled &= ips
+        self.swapped &= ips
+
+    def hold(self, ips: list, mining: bool):
+        """Pin miners to a state regardless of TOD schedule (manual stop/start)"""
+        for ip in ips:
+            self.overrides[ip] = mining
+            self.controls.pop(ip, None)
+
+    def release(self, ips: list):
+        """Return miners to TOD schedule control"""
+        for ip in ips:
+            self.overrides.pop(ip, None)
+
+    def set_idle(self, ip: str, idle: bool):
+        """Keep miner stopped (or let it run again) for thermal protection"""
+        if idle:
+            self.idled.add(ip)
+        else:
+            self.idled.discard(ip)
+
+    def settled(self, ip: str, now: float) -> bool:
+        """No drift being corrected on miner and no action on it within cooldown"""
+        control = self.controls.get(ip)
+        if control is None:
+            return True
+        return not control.drift and now - control.last_action >= self.cooldown
+
+    def record(self, ip: str, now: float):
+        """Note an action taken on miner outside of reconcile"""
+        self.controls.setdefault(ip, MinerControl()).last_action = now
+
+    def desired(self, miner: Miner, tod_active: dict) -> bool:
+        """Desired mining state of miner given {tod group: is active}"""
+        if miner.ip in self.idled:
+            return False
+        if miner.ip in self.overrides:
+            return self.overrides[miner.ip]
+        return not (miner.tod and tod_active.get(miner.tod_group, False))
+
+    def drift(self, miner: Miner, status: MinerStatus, tod_active: dict) -> str:
+        """Action needed to bring observed status to desired state ("" if none)"""
+        mining = is_mining(status)
+        if self.desired(miner, tod_active):
+            if not mining:
+                return START
+            if status.pool not in ("None", miner.primary_pool, miner.secondary_pool):
+                return POOL
+            return ""
+        return STOP if mining else ""
+
+    def reconcile(
+        self, miners: list, statuses: list, tod_active: dict, now: float | None = None
+    ) -> list:
+        """Compare observed statuses with desired state and act on drift"""
+        now = time.monotonic() if now is None else now
+        observed = {status.ip: status for status in statuses}
+        actions = []
+        starting = False
+        for miner in self.ramp.order(miners):
+            status = observed.get(miner.ip)
+            if status is None or not miner.managed:
+                continue
+            control = self.controls.setdefault(miner.ip, MinerControl())
+            desired = self.desired(miner, tod_active)
+            # A changed desired state is not a transient (e.g. booting) drift
+            settled = control.desired is None or control.desired == desired
+            control.desired = desired
+            drift = self.drift(miner, status, tod_active)
+            if not drift:
+                control.drift, control.attempts = "", 0
+                continue
+            if drift != control.drift:
+                control.drift = drift
+                control.drift_since = now if settled else now - self.grace
+            if drift == START:
+                starting = True
+                if not control.attempts and now - control.drift_since < self.grace:
+                    continue
+            if now - control.last_action < control.backoff(
+                self.cooldown, self.max_backoff
+            ):
+                continue
+            if len(actions) >= self.max_actions:
+                log.log_msg("Reconcile action limit reached", "INFO", quiet=True)
+                break
+            if drift == START and not self.ramp.try_start(miner, now):
+                continue
+            if drift == START and self.ramp_since is None:
+                self.ramp_since = now
+            control.last_action = now
+            control.attempts += 1
+            try:
+                self.act(miner, drift)
+                actions.append((miner.ip, drift))
+            except Exception as e:
+                log.log_msg(f"Error reconciling {miner.ip} ({drift})", "ERROR", exc=e)
+        if self.ramp_since is not None and not starting:
+            log.log_msg(
+                f"Fleet at full hashrate after {now - self.ramp_since:.0f}s", "INFO"
+            )
+            self.ramp_since = None
+        return actions
+
+    def act(self, miner: Miner, drift: str):
+        """Push config (and reboot if required) to correct drift"""
+        if drift == STOP:
+            log.log_msg(f"{miner.ip} is mining but should be stopped", "WARNING")
+            if needs_config(miner, False):
+                _ = miner.stop_mining()
+                log.log_msg(f"{miner.ip} stopped mining", "INFO")
+            miner.reboot()
+            log.log_msg(f"{miner.ip} rebooted", "INFO")
+            return
+        if drift == START:
+            log.log_msg(f"{miner.ip} is idle but should be mining", "WARNING")
+        else:
+            log.log_msg(f"{miner.ip} is mining on an unconfigured pool", "WARNING")
+        if needs_config(miner, True):
+            _ = miner.start_mining()
+            log.log_msg(f"{miner.ip} started mining", "INFO")
+        else:
+            miner.reboot()
+            log.log_msg(f"{miner.ip} rebooted", "INFO")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import time
+from datetime import date, datetime, timedelta
+
+DAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+MINUTES_PER_DAY = 1440
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+DEFAULT_GROUP = ""
+# Days searched ahead for the next transition before giving up
+MAX_LOOKAHEAD_DAYS = 400
+ON = b"\x01"
+OFF = b"\x00"
+OFF_ROW = bytes(MINUTES_PER_DAY)
+
+
+def parse_hhmm(s: str) -> int:
+    """Parse HH:MM into minute of day (24:00 allowed as end of day)"""
+    hours, minutes = s.strip().split(":")
+    minute = int(hours) * 60 + int(minutes)
+    if not 0 <= int(minutes) < 60 or not 0 <= minute <= MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time: {s}")
+    return minute
+
+
+def parse_window(s: str) -> tuple:
+    """Parse HH:MM-HH:MM window into (start, end) minutes, end may wrap midnight"""
+    start, end = s.split("-")
+    start, end = parse_hhmm(start), parse_hhmm(end)
+    if start == end:
+        raise ValueError(f"Empty window: {s}")
+    return (start, end)
+
+
+def validate_window(s: str) -> bool:
+    """Validation for window input"""
+    try:
+        parse_window(s)
+    except ValueError:
+        return False
+    return True
+
+
+class TodSchedule:
+    """TOD schedule compiled to a week-minute bitmap and exception date set"""
+
+    __slots__ = ("rows", "exceptions")
+
+    def __init__(self, sched: dict):
+        windows = [(hour * 60, hour * 60 + 60) for hour in sched.get("hours", [])]
+        windows += [parse_window(w) for w in sched.get("windows", [])]
+        bitmap = bytearray(MINUTES_PER_WEEK)
+        for day in sched.get("days", []):
+            base = DAYS.index(day) * MINUTES_PER_DAY
+            for start, end in windows:
+                if end < start:
+                    end += MINUTES_PER_DAY
+                for minute in range(base + start, base + end):
+                    bitmap[minute % MINUTES_PER_WEEK] = 1
+        self.rows = [
+            bytes(bitmap[d * MINUTES_PER_DAY : (d + 1) * MINUTES_PER_DAY])
+            for d in range(7)
+        ]
+        self.exceptions = frozenset(
+            datetime.strptime(d, "%m/%d/%Y").date().toordinal()
+            for d in sched.get("exceptions", [])
+        )
+
+    def row(self, day: date) -> bytes:
+        """Minute bitmap for calendar day"""
+        if day.toordinal() in self.exceptions:
+            return OFF_ROW
+        return self.rows[day.weekday()]
+
+    def is_active(self, ts: float) -> bool:
+        """Returns true if time of day is active at ts"""
+        tm = time.localtime(ts)
+        if self.exceptions and (
+            date(tm.tm_year, tm.tm_mon, tm.tm_mday).toordinal() in self.exceptions
+        ):
+            return False
+        return self.rows[tm.tm_wday][tm.tm_hour * 60 + tm.tm_min] == 1
+
+    def next_transition(self, ts: float) -> float | None:
+        """Timestamp of next on/off edge after ts (None if schedule never changes)"""
+        dt = datetime.fromtimestamp(ts)
+        day = dt.date()
+        minute = dt.hour * 60 + dt.minute
+        row = self.row(day)
+        target = OFF if row[minute] else ON
+        start = minute + 1
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            found = row.find(target, start)
+            if found != -1:
+                edge = datetime.combine(day, datetime.min.time()) + timedelta(
+                    minutes=found
+                )
+                return edge.timestamp()
+            day += timedelta(days=1)
+            row = self.row(day)
+            start = 0
+        return None
+
+
+class Schedules:
+    """Compiled TOD schedules for the default and per-group schedules"""
+
+    __slots__ = ("groups",)
+
+    def __init__(self, conf: dict):
+        self.groups = {DEFAULT_GROUP: TodSchedule(conf.get("tod_schedule", {}))}
+        for name, sched in conf.get("tod_groups", {}).items():
+            self.groups[name] = TodSchedule(sched)
+
+    def active(self, ts: float) -> dict:
+        """{group: is active} at ts"""
+        return {name: sched.is_active(ts) for name, sched in self.groups.items()}
+
+    def is_active(self, ts: float, group: str = DEFAULT_GROUP) -> bool:
+        """Returns true if group schedule is active at ts"""
+        return self.groups[group].is_active(ts)
+
+    def next_transition(self, ts: float) -> float | None:
+        """Timestamp of next edge of any schedule after ts"""
+        edges = [sched.next_transition(ts) for sched in self.groups.values()]
+        edges = [edge for edge in edges if edge is not None]
+        return min(edges) if edges else None
+
+
+if __name__ == "__main__":
+    schedules = Schedules(
+        {
+            "tod_schedule": {
+                "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+                "hours": [6, 7, 8],
+                "windows": ["17:30-19:45"],
+                "exceptions": ["12/25/2025"],
+            }
+        }
+    )
+    now = time.time()
+    print(f"Active: {schedules.is_active(now)}")
+    print(f"Next transition: {time.ctime(schedules.next_transition(now))}")
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import json
+from dataclasses import dataclass, field
+
+import bitfarmer.drivers as drivers
+from bitfarmer.miner import DEFAULT_PHASE
+from bitfarmer.schedule import Schedules
+
+VIEWS = ("small", "full")
+DEFAULT_EDITOR = "vi"
+MINER_KEYS = (
+    "ip",
+    "type",
+    "login",
+    "password",
+    "primary_pool",
+    "primary_pool_user",
+    "primary_pool_pass",
+    "secondary_pool",
+    "secondary_pool_user",
+    "secondary_pool_pass",
+)
+NUMERIC_SECTIONS = {
+    "reconcile": ("grace", "cooldown", "max_backoff", "max_actions"),
+    "ramp": ("batch", "interval", "settle", "timeout"),
+    "anomaly": ("alpha", "threshold", "peer_threshold", "warmup"),
+    "alerts": ("repeat", "rate_limit"),
+    "poll": ("deadline",),
+    "state": ("interval", "max_age"),
+    "pool_probe": ("interval", "timeout", "alpha", "fail_after", "max_changes"),
+    "thermal": (
+        "high",
+        "low",
+        "critical",
+        "ambient_ref",
+        "ambient_gain",
+        "interval",
+        "dwell",
+        "max_changes",
+    ),
+}
+_MISSING = object()
+
+
+class ConfigError(ValueError):
+    """Config failed validation"""
+
+
+def _get(data: dict, key: str, kind, path: str, default=_MISSING):
+    """Typed value from config dict, raising ConfigError naming the bad key"""
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path or 'config'} must be an object")
+    if key not in data:
+        if default is _MISSING:
+            raise ConfigError(f"Missing {path}{key}")
+        return default
+    value = data[key]
+    # bool is an int, don't let true pass as a number
+    if not isinstance(value, kind) or (isinstance(value, bool) and kind is not bool):
+        raise ConfigError(f"{path}{key} has invalid type {type(value).__name__}")
+    return value
+
+
+@dataclass(slots=True, frozen=True)
+class NtpSettings:
+    """NTP servers"""
+
+    primary: str
+    secondary: str
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            _get(data, "primary", str, "ntp."),
+            _get(data, "secondary", str, "ntp."),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class WeatherSettings:
+    """Weather location and units"""
+
+    metric: bool
+    area: str
+    region: str
+    country: str
+    url: str | None = None
+    ttl: int | float | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        for key in ("retry", "timeout"):
+            _get(data, key, (int, float), "weather.", None)
+        return cls(
+            _get(data, "metric", bool, "weather."),
+            _get(data, "area", str, "weather."),
+            _get(data, "region", str, "weather."),
+            _get(data, "country", str, "weather."),
+            _get(data, "url", str, "weather.", None),
+            _get(data, "ttl", (int, float), "weather.", None),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class MinerSettings:
+    """One miner entry"""
+
+    ip: str
+    type: str
+    login: str
+    password: str
+    tod: bool
+    primary_pool: str
+    primary_pool_user: str
+    primary_pool_pass: str
+    secondary_pool: str
+    secondary_pool_user: str
+    secondary_pool_pass: str
+    tod_group: str = ""
+    priority: int = 0
+    phase: str = DEFAULT_PHASE
+    watts: int | float | None = None
+    freq: str | None = None
+    voltage: str | None = None
+    managed: bool = True
+
+    @classmethod
+    def from_dict(cls, data: dict, path: str):
+        values = {key: _get(data, key, str, path) for key in MINER_KEYS}
+        if values["type"] not in drivers.available():
+            raise ConfigError(f"{path}type {values['type']} has no driver")
+        for key in ("freq", "voltage"):
+            value = _get(data, key, str, path, None)
+            if value is None:
+                continue
+            limits = getattr(drivers.load(values["type"]), f"{key}_range")
+            if not limits:
+                raise ConfigError(f"{path}{key} isn't supported by {values['type']}")
+            if not value.isdigit() or not limits[0] <= int(value) <= limits[1]:
+                raise ConfigError(
+                    f"{path}{key} must be a number from {limits[0]} to {limits[1]}"
+                )
+        return cls(
+            tod=_get(data, "tod", bool, path),
+            tod_group=_get(data, "tod_group", str, path, ""),
+            priority=_get(data, "priority", int, path, 0),
+            phase=_get(data, "phase", str, path, DEFAULT_PHASE),
+            watts=_get(data, "watts", (int, float), path, None),
+            freq=_get(data, "freq", str, path, None),
+            voltage=_get(data, "voltage", str, path, None),
+            managed=_get(data, "managed", bool, path, True),
+            **values,
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class Settings:
+    """Validated config, raw holds the dict the config was built from"""
+
+    view: str
+    icons: bool
+    editor: str = DEFAULT_EDITOR
+    ntp: NtpSettings | None = None
+    weather: WeatherSettings | None = None
+    pools: tuple = ()
+    miners: tuple = ()
+    raw: dict = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_dict(cls, conf: dict):
+        """Validate config dict once and build settings"""
+        view = _get(conf, "view", str, "")
+        if view not in VIEWS:
+            raise ConfigError(f"view must be one of {VIEWS}")
+        ntp = _get(conf, "ntp", dict, "", None)
+        weather = _get(conf, "weather", dict, "", None)
+        pools = _get(conf, "pools", list, "", [])
+        if not all(isinstance(pool, str) for pool in pools):
+            raise ConfigError("pools must be a list of urls")
+        miners = tuple(
+            MinerSettings.from_dict(miner, f"miners[{i}].")
+            for i, miner in enumerate(_get(conf, "miners", list, "", []))
+        )
+        ips = [miner.ip for miner in miners]
+        if len(set(ips)) != len(ips):
+            raise ConfigError("miners contains duplicate IPs")
+        groups = set(_get(conf, "tod_groups", dict, "", {})) | {""}
+        for i, miner in enumerate(miners):
+            if miner.tod_group not in groups:
+                raise ConfigError(f"miners[{i}].tod_group {miner.tod_group} unknown")
+        for section, keys in NUMERIC_SECTIONS.items():
+            sub = _get(conf, section, dict, "", {})
+            for key in keys:
+                _get(sub, key, (int, float), f"{section}.", 0)
+        metrics = _get(conf, "metrics", dict, "", {})
+        _get(metrics, "host", str, "metrics.", None)
+        _get(metrics, "port", int, "metrics.", None)
+        api = _get(conf, "api", dict, "", {})
+        _get(api, "host", str, "api.", None)
+        _get(api, "port", int, "api.", None)
+        _get(api, "token", str, "api.", None)
+        events = _get(conf, "events", dict, "", {})
+        _get(events, "socket", str, "events.", None)
+        if _get(events, "queue", int, "events.", 1) < 1:
+            raise ConfigError("events.queue must be at least 1")
+        cluster = _get(conf, "cluster", dict, "", {})
+        for key, kind in (
+            ("listen", str),
+            ("workers", int),
+            ("token", str),
+            ("timeout", (int, float)),
+            ("max_misses", int),
+        ):
+            _get(cluster, key, kind, "cluster.", None)
+        if cluster and not cluster.get("token"):
+            from bitfarmer.cluster import CLUSTER_LISTEN, is_local
+
+            try:
+                local = is_local(cluster.get("listen", CLUSTER_LISTEN))
+            except ValueError:
+                raise ConfigError(
+                    "cluster.listen must be host:port or a path"
+                ) from None
+            if not local:
+                raise ConfigError("cluster.token is required beyond localhost")
+        poll = conf.get("poll", {})
+        if _get(poll, "workers", int, "poll.", 1) < 1:
+            raise ConfigError("poll.workers must be at least 1")
+        if poll.get("deadline", 1) <= 0:
+            raise ConfigError("poll.deadline must be positive")
+        _get(conf.get("state", {}), "enabled", bool, "state.", True)
+        probe = _get(conf, "pool_probe", dict, "", {})
+        for key in ("enabled", "subscribe", "reassign"):
+            _get(probe, key, bool, "pool_probe.", None)
+        if probe.get("interval", 1) <= 0 or probe.get("timeout", 1) <= 0:
+            raise ConfigError("pool_probe.interval and timeout must be positive")
+        if not 0 < probe.get("alpha", 0.3) <= 1:
+            raise ConfigError("pool_probe.alpha must be between 0 and 1")
+        if probe.get("fail_after", 1) < 1:
+            raise ConfigError("pool_probe.fail_after must be at least 1")
+        anomaly = conf.get("anomaly", {})
+        _get(anomaly, "enabled", bool, "anomaly.", True)
+        if not 0 < anomaly.get("alpha", 0.05) <= 1:
+            raise ConfigError("anomaly.alpha must be between 0 and 1")
+        thermal = conf.get("thermal", {})
+        _get(thermal, "enabled", bool, "thermal.", True)
+        from bitfarmer.thermal import THERMAL_CRITICAL, THERMAL_HIGH, THERMAL_LOW
+
+        if not (
+            thermal.get("low", THERMAL_LOW)
+            < thermal.get("high", THERMAL_HIGH)
+            < thermal.get("critical", THERMAL_CRITICAL)
+        ):
+            raise ConfigError("thermal limits must be low < high < critical")
+        from bitfarmer.alerts import validate as validate_alerts
+
+        try:
+            validate_alerts(_get(conf, "alerts", dict, "", {}))
+        except ValueError as e:
+            raise ConfigError(str(e)) from None
+        try:
+            Schedules(conf)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ConfigError(f"Invalid TOD schedule: {e}") from None
+        return cls(
+            view=view,
+            icons=_get(conf, "icons", bool, ""),
+            editor=_get(conf, "editor", str, "", DEFAULT_EDITOR),
+            ntp=NtpSettings.from_dict(ntp) if ntp is not None else None,
+            weather=WeatherSettings.from_dict(weather) if weather is not None else None,
+            pools=tuple(pools),
+            miners=miners,
+            raw=conf,
+        )
+
+    @classmethod
+    def loads(cls, text: str):
+        """Parse and validate config file contents"""
+        try:
+            return cls.from_dict(json.loads(text))
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"Invalid JSON: {e}") from None
+
+    def ips(self) -> list:
+        """Configured miner IPs"""
+        return [miner.ip for miner in self.miners]
+
+
+if __name__ == "__main__":
+    settings = Settings.from_dict({"view": "small", "icons": False})
+    print(settings)
+    try:
+        Settings.from_dict({"view": "small", "icons": "yes"})
+    except ConfigError as e:
+        print(f"{type(e).__name__} -> {str(e)}")
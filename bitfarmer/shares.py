@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from dataclasses import dataclass
+
+import bitfarmer.coloring as coloring
+from bitfarmer.miner import MinerStatus
+
+# (name, seconds, buckets), windows trail by up to one bucket
+WINDOWS = (("5m", 300, 30), ("1h", 3600, 60), ("24h", 86400, 96))
+
+
+class Window:
+    """Share counts over a sliding span, kept in a ring of fixed width buckets
+
+    Each add touches one bucket plus the buckets that expired since the
+    previous add, so updates and totals are O(1) amortized.
+    """
+
+    __slots__ = ("width", "buckets", "totals", "head")
+
+    def __init__(self, span: float, buckets: int):
+        self.width = span / buckets
+        self.buckets = [[0, 0, 0] for _ in range(buckets)]
+        self.totals = [0, 0, 0]
+        self.head = None
+
+    def advance(self, ts: float):
+        """Expire buckets older than span at ts"""
+        n = int(ts // self.width)
+        if self.head is None:
+            self.head = n
+            return
+        for i in range(1, min(n - self.head, len(self.buckets)) + 1):
+            bucket = self.buckets[(self.head + i) % len(self.buckets)]
+            for k in range(3):
+                self.totals[k] -= bucket[k]
+                bucket[k] = 0
+        self.head = max(self.head, n)
+
+    def add(self, ts: float, deltas: tuple):
+        self.advance(ts)
+        bucket = self.buckets[self.head % len(self.buckets)]
+        for k in range(3):
+            bucket[k] += deltas[k]
+            self.totals[k] += deltas[k]
+
+
+@dataclass
+class WindowStats:
+    """Shares seen in one window"""
+
+    name: str
+    seconds: float
+    accepted: int
+    rejected: int
+    stale: int
+
+    def rejection_rate(self) -> float:
+        total = self.accepted + self.rejected
+        return self.rejected / total if total else 0.0
+
+    def per_minute(self) -> float:
+        """Accepted shares per minute"""
+        return self.accepted * 60 / self.seconds if self.seconds else 0.0
+
+
+class MinerShares:
+    """Share counters of one miner between polls"""
+
+    def __init__(self):
+        self.last = None
+        self.pool = None
+        self.since = None
+        self.resets = 0
+        self.windows = [Window(span, buckets) for _, span, buckets in WINDOWS]
+
+    def update(self, status: MinerStatus, ts: float) -> bool:
+        """Add shares since previous poll, return true if counters were reset"""
+        counters = (status.pool_accepted, status.pool_rejected, status.pool_stale)
+        reset = False
+        if self.last is None or status.pool != self.pool:
+            # Counters belong to another pool (or first poll), start from here
+            deltas = (0, 0, 0)
+            if self.since is None:
+                self.since = ts
+        elif any(now < last for now, last in zip(counters, self.last)):
+            # Counters restarted (reboot), everything counted so far is new
+            deltas = counters
+            reset = True
+            self.resets += 1
+        else:
+            deltas = tuple(now - last for now, last in zip(counters, self.last))
+        self.last = counters
+        self.pool = status.pool
+        for window in self.windows:
+            window.add(ts, deltas)
+        return reset
+
+    def stats(self, ts: float) -> list:
+        """WindowStats for each window as of ts"""
+        out = []
+        for (name, span, _), window in zip(WINDOWS, self.windows):
+            window.advance(ts)
+            seconds = min(span, ts - self.since) if self.since is not None else 0
+            out.append(WindowStats(name, seconds, *window.totals))
+        return out
+
+
+class ShareTracker:
+    """Rolling share rates of every miner"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.miners = {}
+
+    def update(self, status: MinerStatus, ts: float | None = None) -> tuple:
+        """Record status, return (its WindowStats, true if counters were reset)"""
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            shares = self.miners.get(status.ip)
+            if shares is None:
+                shares = self.miners[status.ip] = MinerShares()
+            reset = shares.update(status, ts)
+            return shares.stats(ts), reset
+
+    def stats(self, ip: str, ts: float | None = None) -> list:
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            shares = self.miners.get(ip)
+            return shares.stats(ts) if shares is not None else []
+
+    def prune(self, ips):
+        """Forget miners no longer in config"""
+        ips = set(ips)
+        with self.lock:
+            self.miners = {ip: s for ip, s in self.miners.items() if ip in ips}
+
+
+SHARES = ShareTracker()
+
+
+def csv_header() -> str:
+    cols = ["TS        ", "IP           "]
+    for name, _, _ in WINDOWS:
+        cols += [
+            f"ACC {name:<3}",
+            f"REJ {name:<3}",
+            f"STL {name:<3}",
+            f"REJ% {name:<3}",
+        ]
+    return ", ".join(cols) + "\n"
+
+
+def csv(ip: str, stats: list) -> str:
+    cols = [f"{ip:<13}"]
+    for s in stats:
+        cols += [
+            f"{s.accepted:7}",
+            f"{s.rejected:7}",
+            f"{s.stale:7}",
+            f"{s.rejection_rate():8.2%}",
+        ]
+    return ", ".join(cols)
+
+
+def summary(stats: list) -> str:
+    """Colored one line summary of share windows for views"""
+    parts = []
+    for s in stats:
+        rate = f"{s.rejection_rate():.2%}"
+        parts.append(
+            coloring.primary_color(f"{s.name}: ")
+            + coloring.info_color(f"{s.per_minute():.1f}/min ")
+            + (coloring.err_color(rate) if s.rejected else coloring.info_color(rate))
+            + coloring.primary_color(" rej")
+            + (coloring.warn_color(f" {s.stale} stale") if s.stale else "")
+        )
+    return coloring.primary_color("  ").join(parts)
+
+
+if __name__ == "__main__":
+    tracker = ShareTracker()
+    status = MinerStatus("10.0.0.1", pool="stratum+tcp://pool:3333")
+    for minute in range(90):
+        status.pool_accepted += 12
+        status.pool_rejected += 3 if 60 <= minute < 65 else 0
+        if minute == 70:
+            # Reboot
+            status.pool_accepted, status.pool_rejected = 12, 0
+        stats, reset = tracker.update(status, minute * 60.0)
+        if reset:
+            print(f"reset at {minute}m")
+    print(csv_header() + csv(status.ip, stats))
+    print(summary(stats))
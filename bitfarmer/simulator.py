@@ -0,0 +1,860 @@
+#!/usr/bin/env python3
+
+import argparse
+import copy
+import hashlib
+import hmac
+import json
+import math
+import random
+import re
+import secrets
+import selectors
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from bitfarmer.elphapex import parse_duration
+from bitfarmer.fixtures import load_fixture
+from bitfarmer.volcminer import parse_volc_resp
+
+ELPHAPEX = "elphapex"
+VOLCMINER = "volcminer"
+MINER_TYPES = {ELPHAPEX: "DG1+/DGHome", VOLCMINER: "VolcMiner D1"}
+DIGEST_REALM = "VolcMiner"
+DEFAULT_REBOOT_DELAY = 30.0
+DEFAULT_WARMUP = 20.0
+AMBIENT_C = 25.0
+# Nominal per chain values: hashrate MH/s, temp C, fan rpm
+NOMINAL = {
+    ELPHAPEX: {"chains": 4, "hashrate": 3525.0, "temp": 64.0, "fan": 3450.0},
+    VOLCMINER: {"chains": 3, "hashrate": 5130.0, "temp": 61.0, "fan": 3250.0},
+}
+VOLC_NOMINAL_FREQ = 1900
+VOLC_NOMINAL_VOLTAGE = 1250
+# Shares per second per MH/s, reject and stale fractions
+SHARE_RATE = 1 / 13000
+REJECT_FRACTION = 0.005
+STALE_FRACTION = 0.0015
+OK_RESP = {ELPHAPEX: {"stats": "success", "code": "M000", "msg": "OK!"}}
+
+
+@dataclass
+class Faults:
+    """Faults injected into simulated responses"""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    timeout_rate: float = 0.0
+    hang: float = 60.0
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+
+
+def volc_dumps(obj, quoted: bool = False) -> str:
+    """Serialize like VolcMiner firmware (nested containers emitted as bare strings)"""
+    if isinstance(obj, dict):
+        s = (
+            "{"
+            + ",".join(f"{json.dumps(k)}:{volc_dumps(v, True)}" for k, v in obj.items())
+            + "}"
+        )
+    elif isinstance(obj, list):
+        s = "[" + ",".join(volc_dumps(v) for v in obj) + "]"
+    else:
+        return json.dumps(obj)
+    return f'"{s}"' if quoted else s
+
+
+def drift(
+    value: float, mean: float, dt: float, sigma: float, rng, theta: float = 0.05
+) -> float:
+    """Mean reverting random walk step"""
+    pull = min(1.0, theta * dt)
+    return value + pull * (mean - value) + sigma * math.sqrt(dt) * rng.gauss(0, 1)
+
+
+def fmt_num(value: float, precision: int = 0) -> str:
+    """Format number with thousands separators as firmware does"""
+    return f"{value:,.{precision}f}"
+
+
+class VirtualMiner:
+    """Simulated miner state"""
+
+    def __init__(
+        self,
+        family: str,
+        host: str,
+        port: int,
+        index: int,
+        login: str = "root",
+        password: str = "root",
+        reboot_delay: float = DEFAULT_REBOOT_DELAY,
+        warmup: float = DEFAULT_WARMUP,
+        seed: int | None = None,
+    ):
+        self.family = family
+        self.host = host
+        self.port = port
+        self.index = index
+        self.login = login
+        self.password = password
+        self.reboot_delay = reboot_delay
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        nominal = NOMINAL[family]
+        self.chains = nominal["chains"]
+        self.hashrate = [
+            nominal["hashrate"] * self.rng.uniform(0.97, 1.03)
+            for _ in range(self.chains)
+        ]
+        self.temps = [
+            nominal["temp"] + self.rng.uniform(-2, 2) for _ in range(self.chains)
+        ]
+        self.fans = [nominal["fan"] + self.rng.uniform(-100, 100) for _ in range(4)]
+        self.pools = [
+            {
+                "url": "stratum+tcp://ltc.viabtc.io:3333",
+                "user": f"XXXX.worker{index}",
+                "pass": "123",
+            },
+            {
+                "url": "stratum+tcp://ltc.f2pool.com:8888",
+                "user": f"XXXX.worker{index}",
+                "pass": "123",
+            },
+            {"url": "", "user": "", "pass": ""},
+        ]
+        self.volc_conf = parse_volc_resp(load_fixture(VOLCMINER, "get_miner_conf.cgi"))[
+            "data"
+        ]
+        for i, pool in enumerate(self.pools, start=1):
+            self.volc_conf[f"pool{i}url"] = pool["url"]
+            self.volc_conf[f"pool{i}user"] = pool["user"]
+            self.volc_conf[f"pool{i}pw"] = pool["pass"]
+        now = time.monotonic()
+        self.boot_time = now - self.rng.uniform(600, 86400)
+        self.mining_since = self.boot_time
+        self.rebooting_until = 0.0
+        self.last_tick = now
+        accepted = sum(self.hashrate) * SHARE_RATE * (now - self.boot_time)
+        self.shares = [accepted, accepted * REJECT_FRACTION, accepted * STALE_FRACTION]
+        self.reboots = 0
+        self.conf_writes = 0
+
+    @property
+    def addr(self) -> str:
+        """Address to put in bitfarmer config"""
+        return self.host if self.port == 80 else f"{self.host}:{self.port}"
+
+    def conf_entry(self) -> dict:
+        """bitfarmer config entry for miner"""
+        return {
+            "ip": self.addr,
+            "type": MINER_TYPES[self.family],
+            "login": self.login,
+            "password": self.password,
+            "tod": True,
+            "primary_pool": self.pools[0]["url"],
+            "primary_pool_user": self.pools[0]["user"],
+            "primary_pool_pass": self.pools[0]["pass"],
+            "secondary_pool": self.pools[1]["url"],
+            "secondary_pool_user": self.pools[1]["user"],
+            "secondary_pool_pass": self.pools[1]["pass"],
+        }
+
+    def is_rebooting(self) -> bool:
+        """Miner is down for reboot"""
+        return time.monotonic() < self.rebooting_until
+
+    def is_mining(self) -> bool:
+        """Miner has a pool and is not asleep"""
+        if self.family == VOLCMINER and self.volc_conf.get("runmode") == "-1":
+            return False
+        return any(pool["url"] for pool in self.pools)
+
+    def scale(self) -> float:
+        """Fraction of nominal hashrate miner is configured for"""
+        if not self.is_mining():
+            return 0.0
+        if self.family == VOLCMINER:
+            freq = float(self.volc_conf.get("freq") or VOLC_NOMINAL_FREQ)
+            return freq / VOLC_NOMINAL_FREQ
+        return 1.0
+
+    def tick(self):
+        """Advance drifting values to now"""
+        now = time.monotonic()
+        dt = min(now - self.last_tick, 300.0)
+        self.last_tick = now
+        if dt <= 0:
+            return
+        nominal = NOMINAL[self.family]
+        ramp = min(1.0, (now - self.mining_since) / self.warmup) if self.warmup else 1.0
+        target = nominal["hashrate"] * self.scale() * ramp
+        load = target / nominal["hashrate"]
+        for i in range(self.chains):
+            if target:
+                self.hashrate[i] = max(
+                    0.0,
+                    drift(
+                        self.hashrate[i],
+                        target,
+                        dt,
+                        nominal["hashrate"] * 0.004,
+                        self.rng,
+                        0.5,
+                    ),
+                )
+            else:
+                self.hashrate[i] = 0.0
+            temp_mean = AMBIENT_C + (nominal["temp"] - AMBIENT_C) * load
+            self.temps[i] = drift(self.temps[i], temp_mean, dt, 0.3, self.rng)
+        fan_mean = nominal["fan"] * (0.6 + 0.4 * load)
+        for i in range(len(self.fans)):
+            self.fans[i] = max(0.0, drift(self.fans[i], fan_mean, dt, 15.0, self.rng))
+        accepted = sum(self.hashrate) * SHARE_RATE * dt
+        self.shares[0] += accepted
+        self.shares[1] += accepted * REJECT_FRACTION
+        self.shares[2] += accepted * STALE_FRACTION
+
+    def uptime(self) -> int:
+        """Seconds since boot"""
+        return int(time.monotonic() - self.boot_time)
+
+    def pool_status(self, i: int) -> str:
+        """Pool status as reported by firmware"""
+        if not self.is_mining() or not self.pools[i]["url"]:
+            return "Dead"
+        first = next(j for j, pool in enumerate(self.pools) if pool["url"])
+        return "Alive" if i == first else "Dead"
+
+    def reboot(self):
+        """Start simulated reboot"""
+        now = time.monotonic()
+        self.rebooting_until = now + self.reboot_delay
+        self.boot_time = self.rebooting_until
+        self.mining_since = self.rebooting_until
+        self.last_tick = self.rebooting_until
+        self.hashrate = [0.0] * self.chains
+        self.shares = [0.0, 0.0, 0.0]
+        self.reboots += 1
+
+    def restart_mining(self):
+        """Mining process restarted after config change"""
+        self.mining_since = time.monotonic()
+        self.conf_writes += 1
+
+    def set_pools(self, pools: list):
+        """Apply pool list from config write"""
+        for i in range(3):
+            pool = pools[i] if i < len(pools) else {}
+            self.pools[i] = {
+                "url": pool.get("url", ""),
+                "user": pool.get("user", ""),
+                "pass": pool.get("pass", ""),
+            }
+        self.restart_mining()
+
+    def set_volc_conf(self, form: dict):
+        """Apply VolcMiner form config write"""
+        for key, value in form.items():
+            if key.startswith("_bb_"):
+                self.volc_conf[key[4:]] = value
+        self.pools = [
+            {
+                "url": self.volc_conf.get(f"pool{i}url", ""),
+                "user": self.volc_conf.get(f"pool{i}user", ""),
+                "pass": self.volc_conf.get(f"pool{i}pw", ""),
+            }
+            for i in range(1, 4)
+        ]
+        self.restart_mining()
+
+    def elphapex_stats(self) -> dict:
+        """stats.cgi body"""
+        stats = copy.deepcopy(ELPHAPEX_TEMPLATES["stats.cgi"])
+        uptime = self.uptime()
+        stats["STATUS"]["when"] = uptime
+        total = round(sum(self.hashrate), 2)
+        body = stats["STATS"][0]
+        body["elapsed"] = uptime
+        body["rate_5s"] = total
+        body["rate_30m"] = total
+        body["rate_avg"] = round(total * self.rng.uniform(0.995, 1.005), 2)
+        body["fan"] = [int(fan) for fan in self.fans]
+        for i, chain in enumerate(body["chain"]):
+            temp = int(self.temps[i])
+            chain["hashrate"] = round(self.hashrate[i], 2)
+            chain["rate_real"] = chain["hashrate"]
+            chain["temp_pic"] = [temp - 6, temp - 3, temp]
+            chain["temp_pcb"] = [temp - 9, temp - 7, temp - 4, temp - 2]
+            chain["temp_chip"] = [temp + 4, temp + 6, temp + 8, temp + 10]
+        return stats
+
+    def elphapex_pools(self) -> dict:
+        """pools.cgi body"""
+        resp = copy.deepcopy(ELPHAPEX_TEMPLATES["pools.cgi"])
+        resp["STATUS"]["when"] = self.uptime()
+        for i, pool in enumerate(resp["POOLS"]):
+            status = self.pool_status(i)
+            pool["url"] = self.pools[i]["url"]
+            pool["user"] = self.pools[i]["user"]
+            pool["status"] = status
+            alive = status == "Alive"
+            pool["accepted"] = int(self.shares[0]) if alive else 0
+            pool["rejected"] = int(self.shares[1]) if alive else 0
+            pool["stale"] = int(self.shares[2]) if alive else 0
+        return resp
+
+    def elphapex_network(self) -> dict:
+        """get_network_info.cgi body"""
+        resp = copy.deepcopy(ELPHAPEX_TEMPLATES["get_network_info.cgi"])
+        resp["ipaddress"] = self.host
+        resp["conf_hostname"] = f"DG1plus-{self.index}"
+        return resp
+
+    def volc_status(self) -> dict:
+        """get_miner_statusV1.cgi body"""
+        resp = copy.deepcopy(VOLCMINER_TEMPLATES["get_miner_statusV1.cgi"])
+        data = resp["data"]
+        total = sum(self.hashrate)
+        data["elapsed"] = parse_duration(self.uptime())
+        data["ghs5s"] = fmt_num(total, 2)
+        data["ghsav"] = fmt_num(total * self.rng.uniform(0.995, 1.005), 2)
+        for i in range(4):
+            data["fan"][f"fan{i + 1}"] = fmt_num(self.fans[i])
+        for i, chain in enumerate(data["chains"]):
+            chain["freq"] = fmt_num(float(self.volc_conf.get("freq") or 0))
+            chain["chain_rate"] = fmt_num(self.hashrate[i], 2)
+            chain["temp"] = str(int(self.temps[i]))
+            chain["temp_chip"] = str(int(self.temps[i]) + 12)
+        for i, pool in enumerate(data["pools"]["pool_dtls"]):
+            status = self.pool_status(i)
+            alive = status == "Alive"
+            pool["url"] = self.pools[i]["url"]
+            pool["user"] = self.pools[i]["user"]
+            pool["status"] = status
+            pool["accepted"] = fmt_num(int(self.shares[0]) if alive else 0)
+            pool["rejected"] = fmt_num(int(self.shares[1]) if alive else 0)
+            pool["stale"] = fmt_num(int(self.shares[2]) if alive else 0)
+        return resp
+
+    def volc_system(self) -> dict:
+        """get_system_infoV1.cgi body"""
+        resp = copy.deepcopy(VOLCMINER_TEMPLATES["get_system_infoV1.cgi"])
+        resp["data"]["ipaddress"] = self.host
+        resp["data"]["hostname"] = f"VolcMiner-{self.index}"
+        return resp
+
+    def volc_miner_conf(self) -> dict:
+        """get_miner_conf.cgi body"""
+        return {"code": 0, "message": "success", "data": dict(self.volc_conf)}
+
+
+ELPHAPEX_TEMPLATES = {
+    name: json.loads(load_fixture(ELPHAPEX, name))
+    for name in ["stats.cgi", "pools.cgi", "get_network_info.cgi"]
+}
+VOLCMINER_TEMPLATES = {
+    name: parse_volc_resp(load_fixture(VOLCMINER, name))
+    for name in ["get_miner_statusV1.cgi", "get_system_infoV1.cgi"]
+}
+
+
+class DropConnection(Exception):
+    """Close connection without response"""
+
+
+class MinerHandler(BaseHTTPRequestHandler):
+    """Serve CGI endpoints of a VirtualMiner"""
+
+    server_version = "lighttpd/1.4.54"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_cgi("GET")
+
+    def do_POST(self):
+        self.handle_cgi("POST")
+
+    def handle_cgi(self, method: str):
+        """Route request to miner with injected faults"""
+        miner = self.server.miner
+        sim = self.server.sim
+        body = self.read_body()
+        try:
+            if miner.is_rebooting():
+                raise DropConnection()
+            sim.inject_delay()
+            if sim.roll("timeout_rate"):
+                time.sleep(sim.faults.hang)
+                raise DropConnection()
+            if sim.roll("error_rate"):
+                self.respond(500, b"Internal Server Error", "text/plain")
+                return
+            if miner.family == VOLCMINER and not self.check_digest(method, miner):
+                return
+            with miner.lock:
+                miner.tick()
+                resp = self.route(method, miner, body)
+            if resp is None:
+                self.respond(404, b"Not Found", "text/plain")
+                return
+            if miner.family == VOLCMINER:
+                text = volc_dumps(resp)
+            else:
+                text = json.dumps(resp)
+            if sim.roll("malformed_rate"):
+                text = text[: max(1, len(text) // 2)]
+            self.respond(200, text.encode("utf-8"), "application/json")
+        except DropConnection:
+            self.close_connection = True
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        sim.count()
+
+    def route(self, method: str, miner: VirtualMiner, body: bytes) -> dict | None:
+        """Build response for endpoint"""
+        uri = self.path.split("?")[0]
+        if miner.family == ELPHAPEX:
+            match method, uri:
+                case "GET", "/cgi-bin/stats.cgi":
+                    return miner.elphapex_stats()
+                case "GET", "/cgi-bin/pools.cgi":
+                    return miner.elphapex_pools()
+                case "GET", "/cgi-bin/get_network_info.cgi":
+                    return miner.elphapex_network()
+                case "POST", "/cgi-bin/set_miner_conf.cgi":
+                    miner.set_pools(json.loads(body or b"{}").get("pools", []))
+                    return OK_RESP[ELPHAPEX]
+                case "GET", "/cgi-bin/reboot.cgi":
+                    miner.reboot()
+                    return OK_RESP[ELPHAPEX]
+            return None
+        match method, uri:
+            case "GET", "/cgi-bin/get_miner_statusV1.cgi":
+                return miner.volc_status()
+            case "GET", "/cgi-bin/get_system_infoV1.cgi":
+                return miner.volc_system()
+            case "GET", "/cgi-bin/get_miner_conf.cgi":
+                return miner.volc_miner_conf()
+            case "POST", "/cgi-bin/set_nonetworkrun_mode.cgi":
+                return {"code": 0, "message": "success"}
+            case "POST", "/cgi-bin/set_miner_conf.cgi":
+                miner.set_volc_conf(
+                    dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+                )
+                return {"code": 0, "message": "success"}
+            case "POST", "/cgi-bin/reboot.cgi":
+                miner.reboot()
+                return {"code": 0, "message": "success"}
+        return None
+
+    def read_body(self) -> bytes:
+        """Read request body"""
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length > 0 else b""
+
+    def respond(
+        self, code: int, body: bytes, content_type: str, headers: dict | None = None
+    ):
+        """Send response"""
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def check_digest(self, method: str, miner: VirtualMiner) -> bool:
+        """Validate HTTP digest auth, sending challenge on failure"""
+        sim = self.server.sim
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith("Digest "):
+            params = {
+                m.group(1): m.group(2) if m.group(2) is not None else m.group(3)
+                for m in re.finditer(r'(\w+)=(?:"([^"]*)"|([^,\s]*))', auth[7:])
+            }
+            if (
+                sim.valid_nonce(params.get("nonce", ""))
+                and params.get("username") == miner.login
+            ):
+                ha1 = md5(f"{miner.login}:{DIGEST_REALM}:{miner.password}")
+                ha2 = md5(f"{method}:{params.get('uri', '')}")
+                if params.get("qop"):
+                    expected = md5(
+                        f"{ha1}:{params['nonce']}:{params.get('nc', '')}:{params.get('cnonce', '')}:{params['qop']}:{ha2}"
+                    )
+                else:
+                    expected = md5(f"{ha1}:{params['nonce']}:{ha2}")
+                if hmac.compare_digest(expected, params.get("response", "")):
+                    return True
+        challenge = f'Digest realm="{DIGEST_REALM}", qop="auth", nonce="{sim.new_nonce()}", opaque="{sim.opaque}", algorithm=MD5'
+        self.respond(
+            401, b"Unauthorized", "text/plain", {"WWW-Authenticate": challenge}
+        )
+        return False
+
+
+def md5(s: str) -> str:
+    """Hex md5 digest"""
+    return hashlib.md5(s.encode("utf-8")).hexdigest()
+
+
+class MinerServer(ThreadingHTTPServer):
+    """HTTP server bound to one VirtualMiner"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, miner: VirtualMiner, sim):
+        self.miner = miner
+        self.sim = sim
+        super().__init__((miner.host, miner.port), MinerHandler)
+
+
+class Simulator:
+    """Fleet of virtual miners served from a single selector loop"""
+
+    def __init__(
+        self, miners: list, faults: Faults | None = None, seed: int | None = None
+    ):
+        self.miners = miners
+        self.faults = faults or Faults()
+        self.rng = random.Random(seed)
+        self.secret = secrets.token_bytes(16)
+        self.opaque = secrets.token_hex(16)
+        self.servers = []
+        self.selector = selectors.DefaultSelector()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.requests = 0
+        self.counter_lock = threading.Lock()
+
+    def roll(self, fault: str) -> bool:
+        """Randomly decide whether to inject fault"""
+        rate = getattr(self.faults, fault)
+        return rate > 0 and self.rng.random() < rate
+
+    def inject_delay(self):
+        """Sleep for configured latency"""
+        delay = self.faults.latency
+        if self.faults.jitter:
+            delay += self.rng.uniform(0, self.faults.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def new_nonce(self) -> str:
+        """Stateless digest nonce"""
+        stamp = secrets.token_hex(8)
+        return stamp + hmac.new(self.secret, stamp.encode(), "sha256").hexdigest()[:16]
+
+    def valid_nonce(self, nonce: str) -> bool:
+        """Nonce was issued by this simulator"""
+        stamp, sig = nonce[:16], nonce[16:]
+        return hmac.compare_digest(
+            sig, hmac.new(self.secret, stamp.encode(), "sha256").hexdigest()[:16]
+        )
+
+    def count(self):
+        """Count served request"""
+        with self.counter_lock:
+            self.requests += 1
+
+    def start(self):
+        """Bind all miners and start serving"""
+        raise_fd_limit(len(self.miners) * 4 + 256)
+        for miner in self.miners:
+            server = MinerServer(miner, self)
+            server.socket.setblocking(False)
+            self.selector.register(server.socket, selectors.EVENT_READ, server)
+            self.servers.append(server)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        """Dispatch ready sockets to their servers"""
+        while not self.stop_event.is_set():
+            for key, _ in self.selector.select(timeout=0.5):
+                key.data._handle_request_noblock()
+
+    def stop(self):
+        """Stop serving and close sockets"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        for server in self.servers:
+            self.selector.unregister(server.socket)
+            server.server_close()
+        self.servers = []
+
+    def conf_entries(self) -> list:
+        """bitfarmer config entries for all miners"""
+        return [miner.conf_entry() for miner in self.miners]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StratumHandler(socketserver.StreamRequestHandler):
+    """Answer stratum JSON-RPC lines, enough for pool probes"""
+
+    def handle(self):
+        pool = self.server.pool
+        if pool.down:
+            return
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+            except ValueError:
+                return
+            if pool.latency:
+                time.sleep(pool.latency)
+            if pool.down:
+                return
+            if req.get("method") == "mining.subscribe":
+                result = [[["mining.notify", secrets.token_hex(4)]], "08000002", 4]
+            else:
+                result = True
+            resp = {"id": req.get("id"), "result": result, "error": None}
+            self.wfile.write(json.dumps(resp).encode() + b"\n")
+
+
+class StratumPool(socketserver.ThreadingTCPServer):
+    """Local stand-in for a stratum pool with adjustable latency
+
+    Set `down` to drop connections without answering.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.down = False
+        self.pool = self
+        super().__init__((host, port), StratumHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"stratum+tcp://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def raise_fd_limit(needed: int):
+    """Raise open file limit so thousands of miners can be bound"""
+    try:
+        import resource
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < needed:
+            target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def build_fleet(
+    elphapex: int,
+    volcminer: int,
+    host: str = "127.0.0.1",
+    base_port: int = 8000,
+    aliases: bool = False,
+    reboot_delay: float = DEFAULT_REBOOT_DELAY,
+    warmup: float = DEFAULT_WARMUP,
+    login: str = "root",
+    password: str = "root",
+    seed: int | None = None,
+) -> list:
+    """Create virtual miners on distinct ports or loopback aliases"""
+    miners = []
+    families = [ELPHAPEX] * elphapex + [VOLCMINER] * volcminer
+    base = [int(octet) for octet in host.split(".")]
+    base_int = (base[0] << 24) | (base[1] << 16) | (base[2] << 8) | base[3]
+    for i, family in enumerate(families):
+        if aliases:
+            addr = base_int + i
+            miner_host = ".".join(str(addr >> shift & 255) for shift in (24, 16, 8, 0))
+            port = base_port
+        else:
+            miner_host = host
+            port = base_port + i
+        miners.append(
+            VirtualMiner(
+                family,
+                miner_host,
+                port,
+                i + 1,
+                login=login,
+                password=password,
+                reboot_delay=reboot_delay,
+                warmup=warmup,
+                seed=None if seed is None else seed + i,
+            )
+        )
+    return miners
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m bitfarmer.simulator",
+        description="Serve simulated Elphapex and VolcMiner CGI APIs",
+    )
+    parser.add_argument("--elphapex", type=int, default=1, help="number of DG1+ miners")
+    parser.add_argument(
+        "--volcminer", type=int, default=1, help="number of VolcMiner D1 miners"
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="bind address (first address with --aliases)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="first port (or shared port with --aliases)",
+    )
+    parser.add_argument(
+        "--aliases",
+        action="store_true",
+        help="one loopback address per miner instead of one port per miner",
+    )
+    parser.add_argument("--login", default="root")
+    parser.add_argument("--password", default="root")
+    parser.add_argument(
+        "--reboot-delay",
+        type=float,
+        default=DEFAULT_REBOOT_DELAY,
+        help="seconds a rebooting miner is unreachable",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=DEFAULT_WARMUP,
+        help="seconds to ramp to full hashrate",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="added response latency (s)"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="random extra latency up to (s)"
+    )
+    parser.add_argument(
+        "--timeout-rate", type=float, default=0.0, help="fraction of requests that hang"
+    )
+    parser.add_argument(
+        "--hang",
+        type=float,
+        default=60.0,
+        help="seconds a hanging request stalls before dropping",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests answered with 500",
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help="fraction of responses with truncated JSON",
+    )
+    parser.add_argument(
+        "--stratum",
+        type=int,
+        default=0,
+        help="number of stand-in stratum pools to serve",
+    )
+    parser.add_argument(
+        "--stratum-port",
+        type=int,
+        default=3333,
+        help="first stratum pool port",
+    )
+    parser.add_argument(
+        "--stratum-latency",
+        type=float,
+        default=0.0,
+        help="stratum reply latency of first pool, doubled for each next (s)",
+    )
+    parser.add_argument("--seed", type=int, help="random seed")
+    parser.add_argument("--conf-out", help="write bitfarmer miner entries to file")
+    args = parser.parse_args()
+    miners = build_fleet(
+        args.elphapex,
+        args.volcminer,
+        host=args.host,
+        base_port=args.port,
+        aliases=args.aliases,
+        reboot_delay=args.reboot_delay,
+        warmup=args.warmup,
+        login=args.login,
+        password=args.password,
+        seed=args.seed,
+    )
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        timeout_rate=args.timeout_rate,
+        hang=args.hang,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+    )
+    sim = Simulator(miners, faults, seed=args.seed)
+    sim.start()
+    pools = [
+        StratumPool(args.host, args.stratum_port + i, args.stratum_latency * 2**i)
+        for i in range(args.stratum)
+    ]
+    for pool in pools:
+        pool.start()
+        print(f"Serving stratum pool {pool.url}")
+    if args.conf_out:
+        with open(args.conf_out, "w") as f:
+            json.dump({"miners": sim.conf_entries()}, f, indent=4)
+    print(
+        f"Serving {len(miners)} simulated miners ({miners[0].addr} - {miners[-1].addr}), ctrl-c to stop"
+    )
+    try:
+        while True:
+            time.sleep(10)
+            rebooting = sum(miner.is_rebooting() for miner in miners)
+            print(f"requests: {sim.requests}, rebooting: {rebooting}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        for pool in pools:
+            pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from dataclasses import asdict
+
+import bitfarmer.log as log
+from bitfarmer.fleet import FLEET, FleetState, sample
+from bitfarmer.miner import MinerStatus
+from bitfarmer.poller import Poller, PollResult
+from bitfarmer.reconcile import MinerControl, Reconciler
+from bitfarmer.thermal import ThermalController, ThermalState
+
+STATE_FILE = "state.json"
+HISTORY_FILE = "history.json.gz"
+# Seconds between snapshots while running
+STATE_INTERVAL = 60
+# Snapshots older than this are ignored on startup
+STATE_MAX_AGE = 86400
+STATE_VERSION = 1
+# Monotonic timestamps of per-miner control state, saved as wall clock times
+CONTROL_TIMES = ("drift_since", "last_action")
+THERMAL_TIMES = ("changed", "cool_since")
+# History samples are saved as rows of these fields
+HISTORY_KEYS = tuple(sample(MinerStatus(""), 0))
+
+
+def to_wall(t: float | None, clock: tuple) -> float | None:
+    """Wall clock time of monotonic t, None for never"""
+    mono, wall = clock
+    if t is None or t in (0.0, float("-inf")):
+        return None
+    return wall - (mono - t)
+
+
+def to_mono(t: float | None, clock: tuple, never: float | None) -> float | None:
+    """Monotonic time of wall clock t, never if t is None"""
+    mono, wall = clock
+    if t is None:
+        return never
+    return mono - (wall - t)
+
+
+def encode_history(history: dict, saved: float) -> bytes:
+    """Gzipped history, a header line then one line of rows per miner
+
+    Miners are encoded one at a time, as rows rather than objects, so a large
+    fleet's history doesn't hold the GIL (and the poll loop) for the whole
+    write, and can be loaded the same way.
+    """
+    comp = zlib.compressobj(1, wbits=31)
+    header = {"version": STATE_VERSION, "saved": saved, "keys": HISTORY_KEYS}
+    parts = [comp.compress(json.dumps(header).encode() + b"\n")]
+    for ip, samples in history.items():
+        rows = [[s[k] for k in HISTORY_KEYS] for s in samples]
+        parts.append(comp.compress(json.dumps([ip, rows]).encode() + b"\n"))
+    parts.append(comp.flush())
+    return b"".join(parts)
+
+
+def capture(
+    reconciler: Reconciler, thermal: ThermalController, fleet: FleetState = FLEET
+) -> dict:
+    """Snapshot of control state, last statuses and history"""
+    clock = (time.monotonic(), time.time())
+    controls = {}
+    for ip, control in reconciler.controls.items():
+        c = asdict(control)
+        for key in CONTROL_TIMES:
+            c[key] = to_wall(c[key], clock)
+        controls[ip] = c
+    states = {}
+    for ip, state in thermal.states.items():
+        s = asdict(state)
+        for key in THERMAL_TIMES:
+            s[key] = to_wall(s[key], clock)
+        states[ip] = s
+    with fleet.cond:
+        miners = {
+            ip: {"status": asdict(status), "seen": fleet.seen[ip]}
+            for ip, status in fleet.latest.items()
+        }
+        # Samples are never modified once added, copying the lists is enough
+        history = {ip: list(h) for ip, h in fleet.history.items()}
+    return {
+        "version": STATE_VERSION,
+        "saved": clock[1],
+        "reconcile": {
+            "controls": controls,
+            "overrides": dict(reconciler.overrides),
+            "idled": sorted(reconciler.idled),
+            "swapped": sorted(reconciler.swapped),
+        },
+        "thermal": states,
+        "miners": miners,
+        "history": history,
+    }
+
+
+def restore(
+    snap: dict,
+    ips: list,
+    reconciler: Reconciler,
+    thermal: ThermalController,
+    poller: Poller,
+    fleet: FleetState = FLEET,
+) -> list | None:
+    """Apply snapshot for miners in ips, return their last statuses as stale
+    PollResults, None if the snapshot doesn't match this version's state"""
+    clock = (time.monotonic(), time.time())
+    wanted = set(ips)
+    # Everything is parsed before anything is applied, so a snapshot from
+    # another build is ignored as a whole
+    try:
+        rc = snap.get("reconcile", {})
+        controls = {}
+        for ip, c in rc.get("controls", {}).items():
+            if ip in wanted:
+                for key in CONTROL_TIMES:
+                    c[key] = to_mono(c[key], clock, 0.0)
+                controls[ip] = MinerControl(**c)
+        overrides = {ip: m for ip, m in rc.get("overrides", {}).items() if ip in wanted}
+        idled = set(rc.get("idled", [])) & wanted
+        swapped = set(rc.get("swapped", [])) & wanted
+        states = {}
+        for ip, s in snap.get("thermal", {}).items():
+            if ip in wanted:
+                s["changed"] = to_mono(s["changed"], clock, float("-inf"))
+                s["cool_since"] = to_mono(s["cool_since"], clock, None)
+                states[ip] = ThermalState(**s)
+        results = [
+            PollResult(ip, MinerStatus(**m["status"]), "", 0.0, m["seen"], stale=True)
+            for ip, m in snap.get("miners", {}).items()
+            if ip in wanted
+        ]
+    except (TypeError, KeyError, ValueError, AttributeError) as e:
+        log.log_msg("State snapshot doesn't match, ignoring", "WARNING", exc=e)
+        return None
+    reconciler.controls.update(controls)
+    reconciler.overrides.update(overrides)
+    reconciler.idled |= idled
+    reconciler.swapped |= swapped
+    thermal.states.update(states)
+    for result in results:
+        poller.keep(result)
+    fleet.restore([r.status for r in results], {r.ip: r.ts for r in results})
+    order = {ip: i for i, ip in enumerate(ips)}
+    return sorted(results, key=lambda r: order[r.ip])
+
+
+class StateStore:
+    """Write snapshots atomically on a timer and read the last one at startup
+
+    Control state and last statuses are small and loaded before the first
+    poll, history is kept in a second file and loaded in the background.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        enabled: bool = True,
+        interval: float = STATE_INTERVAL,
+        max_age: float = STATE_MAX_AGE,
+    ):
+        self.path = f"{data_dir}{STATE_FILE}"
+        self.history_path = f"{data_dir}{HISTORY_FILE}"
+        self.enabled = enabled
+        self.interval = interval
+        self.max_age = max_age
+        self.saved = time.monotonic()
+        self.writer = None
+
+    @classmethod
+    def from_conf(cls, conf: dict, data_dir: str):
+        """Build store from optional state section of config"""
+        store = cls(data_dir)
+        store.configure(conf)
+        return store
+
+    def configure(self, conf: dict):
+        sc = conf.get("state", {})
+        self.enabled = sc.get("enabled", True)
+        self.interval = sc.get("interval", STATE_INTERVAL)
+        self.max_age = sc.get("max_age", STATE_MAX_AGE)
+
+    def fresh(self, saved: float) -> bool:
+        return time.time() - saved <= self.max_age
+
+    def load(self) -> dict | None:
+        """Last snapshot without history, None if missing, unreadable or too old"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self.path, "r") as f:
+                snap = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.log_msg("Unable to read state snapshot", "WARNING", exc=e, quiet=True)
+            return None
+        if snap.get("version") != STATE_VERSION:
+            return None
+        if not self.fresh(snap.get("saved", 0)):
+            log.log_msg("State snapshot too old, ignoring", "INFO", quiet=True)
+            return None
+        return snap
+
+    def load_history(self, ips: list, fleet: FleetState = FLEET):
+        """Add saved history of miners in ips to fleet, one miner at a time"""
+        wanted = set(ips)
+        try:
+            with gzip.open(self.history_path, "rb") as f:
+                header = json.loads(f.readline() or b"{}")
+                if header.get("version") != STATE_VERSION or not self.fresh(
+                    header.get("saved", 0)
+                ):
+                    return
+                keys = header["keys"]
+                for line in f:
+                    ip, rows = json.loads(line)
+                    if ip in wanted:
+                        fleet.add_history(ip, [dict(zip(keys, r)) for r in rows])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.log_msg("Unable to read saved history", "WARNING", exc=e, quiet=True)
+
+    def restore_history(self, ips: list):
+        """Load saved history on a background thread"""
+        if self.enabled:
+            threading.Thread(target=self.load_history, args=(ips,), daemon=True).start()
+
+    def write(self, snap: dict):
+        """Write snapshot and history (each replaced atomically)"""
+        snap = dict(snap)
+        history = snap.pop("history")
+        try:
+            for path, data in (
+                (self.path, json.dumps(snap).encode()),
+                (self.history_path, encode_history(history, snap["saved"])),
+            ):
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+        except OSError as e:
+            log.log_msg("Unable to save state snapshot", "WARNING", exc=e, quiet=True)
+
+    def due(self) -> bool:
+        """True if a snapshot is due and none is being written"""
+        if not self.enabled or time.monotonic() - self.saved < self.interval:
+            return False
+        return self.writer is None or not self.writer.is_alive()
+
+    def save(self, snap: dict, wait: bool = False):
+        """Write snapshot on a background thread, or before returning if wait"""
+        if not self.enabled:
+            return
+        self.saved = time.monotonic()
+        if self.writer is not None:
+            self.writer.join()
+        if wait:
+            self.write(snap)
+            return
+        self.writer = threading.Thread(target=self.write, args=(snap,), daemon=True)
+        self.writer.start()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    reconciler = Reconciler()
+    reconciler.hold(["10.0.0.2"], False)
+    reconciler.controls["10.0.0.1"] = MinerControl(
+        desired=False, drift="stop", last_action=time.monotonic() - 30, attempts=1
+    )
+    thermal = ThermalController()
+    thermal.states["10.0.0.1"] = ThermalState(level=2, changed=time.monotonic())
+    status = MinerStatus("10.0.0.1", pool="stratum+tcp://pool:3333", hashboards=3)
+    FLEET.update([status], ["10.0.0.1", "10.0.0.2"])
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StateStore(f"{tmp}/")
+        store.save(capture(reconciler, thermal), wait=True)
+        snap = store.load()
+        FLEET.history.clear()
+        store.load_history(["10.0.0.1"])
+    reconciler, thermal = Reconciler(), ThermalController()
+    results = restore(snap, ["10.0.0.1", "10.0.0.2"], reconciler, thermal, Poller(None))
+    control = reconciler.controls["10.0.0.1"]
+    print(f"backoff remaining {300 - (time.monotonic() - control.last_action):.0f}s")
+    print(f"overrides {reconciler.overrides}, thermal {thermal.states}")
+    print(f"restored {[(r.ip, r.stale) for r in results]}, stale {FLEET.stale}")
+    print(f"history {FLEET.miner_history('10.0.0.1')}")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, fields
+
+import bitfarmer.coloring as coloring
+import bitfarmer.config as config
+from bitfarmer.drivers import MinerPool
+from bitfarmer.miner import MinerStatus
+from bitfarmer.poller import DEADLINE_ERROR, Poller, PollResult
+from bitfarmer.reconcile import is_mining
+from bitfarmer.schedule import Schedules
+from bitfarmer.thermal import THERMAL_HIGH
+
+# Seconds to wait for miners before reporting them as not answering
+STATUS_TIMEOUT = 10
+STATUS_MAX_WORKERS = 64
+# Exit codes, as used by Nagios plugins
+OK = 0
+WARNING = 1
+CRITICAL = 2
+UNKNOWN = 3
+STATUS_FIELDS = [f.name for f in fields(MinerStatus)]
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Options of the status command"""
+    parser.add_argument(
+        "--once", action="store_true", help="poll once and exit (default: repeat)"
+    )
+    fmt = parser.add_mutually_exclusive_group()
+    fmt.add_argument("--json", action="store_true", help="print JSON records")
+    fmt.add_argument("--csv", action="store_true", help="print CSV rows")
+    parser.add_argument(
+        "--ip", action="append", default=[], help="miner to poll (repeatable)"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=STATUS_TIMEOUT,
+        help=f"seconds to wait for miners (default {STATUS_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="seconds between polls without --once (default 60)",
+    )
+
+
+def poll(miner) -> tuple:
+    """(status, error type) of one miner, without logging or printing"""
+    try:
+        return miner.get_miner_status(), ""
+    except Exception as e:
+        return None, type(e).__name__
+
+
+def check(miner, result: PollResult, conf: dict, tod: dict) -> tuple:
+    """(exit code, problems) of one miner"""
+    status = result.status
+    if result.stale:
+        return CRITICAL, [f"no answer, last answered {result.age():.0f}s ago"]
+    if status is None:
+        if result.error == DEADLINE_ERROR:
+            return CRITICAL, ["no answer"]
+        return CRITICAL, [f"down ({result.error})"]
+    problems = []
+    if is_mining(status):
+        if not status.fans_ok():
+            problems.append("fan failure")
+        high = conf.get("thermal", {}).get("high", THERMAL_HIGH)
+        hottest = max(status.chain_temps(), default=0)
+        if hottest >= high:
+            problems.append(f"hot ({hottest}C)")
+    elif not (miner.tod and tod.get(miner.tod_group, False)):
+        problems.append("not mining")
+    return (WARNING if problems else OK), problems
+
+
+def records(results: list, miners: dict, conf: dict) -> tuple:
+    """(worst exit code, one record per poll result)"""
+    tod = Schedules(conf).active(time.time())
+    worst = OK
+    out = []
+    for result in results:
+        code, problems = check(miners[result.ip], result, conf, tod)
+        worst = max(worst, code)
+        out.append(
+            {
+                "ip": result.ip,
+                "healthy": code == OK,
+                "problems": problems,
+                "seconds": round(result.seconds, 3),
+                "status": asdict(result.status) if result.status else None,
+            }
+        )
+    return worst, out
+
+
+def print_json(recs: list):
+    json.dump(recs, sys.stdout)
+    print()
+
+
+def print_csv(recs: list, header: bool):
+    writer = csv.writer(sys.stdout)
+    if header:
+        writer.writerow(["ip", "healthy", "problems", "seconds"] + STATUS_FIELDS[1:])
+    for r in recs:
+        status = r["status"] or {}
+        writer.writerow(
+            [r["ip"], r["healthy"], "; ".join(r["problems"]), r["seconds"]]
+            + [status.get(name, "") for name in STATUS_FIELDS[1:]]
+        )
+
+
+def print_small(recs: list, results: list, icons: bool):
+    for r, result in zip(recs, results):
+        if result.status is not None:
+            result.status.print_small(icons)
+        if r["problems"]:
+            coloring.print_error(f"{r['ip']}: {', '.join(r['problems'])}")
+
+
+def run(args: argparse.Namespace) -> int:
+    """Poll selected miners, print them and return the exit code"""
+    try:
+        conf = config.read_conf()
+    except (OSError, ValueError) as e:
+        print(f"Unable to read config: {e}", file=sys.stderr)
+        return UNKNOWN
+    entries = conf.get("miners", [])
+    known = {m["ip"] for m in entries}
+    unknown = [ip for ip in args.ip if ip not in known]
+    if unknown:
+        print(f"Not in config: {', '.join(unknown)}", file=sys.stderr)
+        return UNKNOWN
+    if args.ip:
+        entries = [m for m in entries if m["ip"] in args.ip]
+    pool = MinerPool()
+    try:
+        pool.sync({"miners": entries})
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return UNKNOWN
+    miners = pool.list()
+    by_ip = {miner.ip: miner for miner in miners}
+    poller = Poller(poll, args.timeout, max(1, min(len(miners), STATUS_MAX_WORKERS)))
+    code = OK
+    header = True
+    while True:
+        results = poller.cycle(miners)
+        code, recs = records(results, by_ip, conf)
+        if args.json:
+            print_json(recs)
+        elif args.csv:
+            print_csv(recs, header)
+        else:
+            print_small(recs, results, conf.get("icons", False))
+        sys.stdout.flush()
+        header = False
+        if args.once:
+            break
+        time.sleep(args.interval)
+    if poller.pending:
+        # Don't wait on requests still hanging past the deadline at exit
+        os._exit(code)
+    poller.close()
+    return code
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="bitfarmer status",
+        description="Poll miners and print their status without the interactive UI",
+    )
+    add_arguments(parser)
+    try:
+        return run(parser.parse_args(argv))
+    except KeyboardInterrupt:
+        return OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+import time
+from dataclasses import dataclass
+
+import bitfarmer.log as log
+from bitfarmer.miner import Miner
+from bitfarmer.reconcile import Reconciler, is_mining
+
+THERMAL_HIGH = 80
+THERMAL_LOW = 72
+THERMAL_CRITICAL = 90
+THERMAL_AMBIENT_REF = 25
+THERMAL_AMBIENT_GAIN = 0.5
+THERMAL_INTERVAL = 300
+THERMAL_DWELL = 600
+THERMAL_MAX_CHANGES = 5
+THROTTLE = "throttle"
+RESTORE = "restore"
+IDLE = "idle"
+RESUME = "resume"
+
+
+def to_celsius(temp: float, metric: bool) -> float:
+    """Temperature in C"""
+    return temp if metric else (temp - 32) * 5 / 9
+
+
+@dataclass
+class ThermalState:
+    """Throttle bookkeeping for one miner"""
+
+    level: int = 0
+    idle: bool = False
+    changed: float = float("-inf")
+    cool_since: float | None = None
+
+
+class ThermalController:
+    """Step miners down as chains near their limit and back up as they cool
+
+    Chains at or above `high` step a tunable miner down one frequency/voltage
+    level (or idle it once out of levels), chains at or above `critical` idle
+    the miner at once. A miner is stepped back up only after its chains have
+    stayed at or below `low` for `dwell` seconds. The band between `low` and
+    `high` holds the current level, and no miner is changed more than once
+    per `interval`. Hot ambient air lowers `high` and `low` by `ambient_gain`
+    per degree over `ambient_ref` to leave headroom before chains get there.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        high: float = THERMAL_HIGH,
+        low: float = THERMAL_LOW,
+        critical: float = THERMAL_CRITICAL,
+        ambient_ref: float = THERMAL_AMBIENT_REF,
+        ambient_gain: float = THERMAL_AMBIENT_GAIN,
+        interval: float = THERMAL_INTERVAL,
+        dwell: float = THERMAL_DWELL,
+        max_changes: int = THERMAL_MAX_CHANGES,
+    ):
+        self.enabled = enabled
+        self.high = high
+        self.low = low
+        self.critical = critical
+        self.ambient_ref = ambient_ref
+        self.ambient_gain = ambient_gain
+        self.interval = interval
+        self.dwell = dwell
+        self.max_changes = max_changes
+        self.states = {}
+
+    @classmethod
+    def from_conf(cls, conf: dict):
+        """Build controller from optional thermal section of config"""
+        controller = cls()
+        controller.configure(conf)
+        return controller
+
+    def configure(self, conf: dict):
+        """Apply thermal settings, keeping per-miner state"""
+        tc = conf.get("thermal", {})
+        self.enabled = "thermal" in conf and tc.get("enabled", True)
+        self.high = tc.get("high", THERMAL_HIGH)
+        self.low = tc.get("low", THERMAL_LOW)
+        self.critical = tc.get("critical", THERMAL_CRITICAL)
+        self.ambient_ref = tc.get("ambient_ref", THERMAL_AMBIENT_REF)
+        self.ambient_gain = tc.get("ambient_gain", THERMAL_AMBIENT_GAIN)
+        self.interval = tc.get("interval", THERMAL_INTERVAL)
+        self.dwell = tc.get("dwell", THERMAL_DWELL)
+        self.max_changes = tc.get("max_changes", THERMAL_MAX_CHANGES)
+        ips = {miner["ip"] for miner in conf.get("miners", [])}
+        self.states = {ip: s for ip, s in self.states.items() if ip in ips}
+
+    def limits(self, ambient: float | None) -> tuple:
+        """(high, low) chain limits adjusted for ambient temperature (C)"""
+        if ambient is None:
+            return self.high, self.low
+        offset = self.ambient_gain * max(0.0, ambient - self.ambient_ref)
+        return self.high - offset, self.low - offset
+
+    def decide(
+        self, miner: Miner, state: ThermalState, hottest: float | None, ambient, now
+    ) -> str:
+        """Action for miner given its hottest chain (None if unknown or disabled)"""
+        if state.idle:
+            return RESUME if now - state.changed >= self.dwell else ""
+        if hottest is None:
+            if not self.enabled and state.level:
+                hottest = float("-inf")
+            else:
+                state.cool_since = None
+                return ""
+        high, low = self.limits(ambient)
+        if hottest >= self.critical:
+            return IDLE
+        if hottest >= high:
+            state.cool_since = None
+            if now - state.changed < self.interval:
+                return ""
+            return THROTTLE if state.level + 1 < len(miner.tune_levels) else IDLE
+        if hottest > low or not state.level:
+            state.cool_since = None
+            return ""
+        if state.cool_since is None:
+            state.cool_since = now
+        if now - state.cool_since < self.dwell or now - state.changed < self.interval:
+            return ""
+        return RESTORE
+
+    def update(
+        self,
+        miners: list,
+        statuses: list,
+        reconciler: Reconciler,
+        ambient: float | None = None,
+        now: float | None = None,
+    ) -> list:
+        """Throttle, idle, restore or resume miners from observed temperatures"""
+        if not self.enabled and not self.states:
+            return []
+        now = time.monotonic() if now is None else now
+        observed = {status.ip: status for status in statuses}
+        hottest = {}
+        miners = [miner for miner in miners if miner.managed]
+        for miner in miners:
+            status = observed.get(miner.ip)
+            temps = status.chain_temps() if status is not None else []
+            if self.enabled and temps and is_mining(status):
+                hottest[miner.ip] = max(temps)
+        actions = []
+        for miner in sorted(miners, key=lambda m: -hottest.get(m.ip, float("-inf"))):
+            state = self.states.get(miner.ip)
+            if state is None:
+                if miner.ip not in hottest:
+                    continue
+                state = self.states[miner.ip] = ThermalState(level=miner.level)
+            if miner.tune_levels:
+                miner.level = state.level
+            action = self.decide(miner, state, hottest.get(miner.ip), ambient, now)
+            if not action:
+                continue
+            critical = hottest.get(miner.ip, 0) >= self.critical
+            if len(actions) >= self.max_changes and not critical:
+                log.log_msg("Thermal change limit reached", "INFO", quiet=True)
+                break
+            if self.act(miner, state, action, reconciler, hottest.get(miner.ip)):
+                state.changed = now
+                state.cool_since = None
+                actions.append((miner.ip, action))
+            if not self.enabled and not state.level and not state.idle:
+                del self.states[miner.ip]
+        return actions
+
+    def act(
+        self,
+        miner: Miner,
+        state: ThermalState,
+        action: str,
+        reconciler: Reconciler,
+        hottest: float | None,
+    ) -> bool:
+        """Apply action, return true if it took effect"""
+        temp = f" ({hottest}C)" if hottest is not None else ""
+        if action == IDLE:
+            log.log_msg(f"{miner.ip} too hot{temp}, idling", "WARNING")
+            if miner.tune_levels:
+                # Come back at the lowest level and step up as it stays cool
+                state.level = miner.level = len(miner.tune_levels) - 1
+            reconciler.set_idle(miner.ip, True)
+            state.idle = True
+            return True
+        if action == RESUME:
+            log.log_msg(f"{miner.ip} cooled down, resuming", "INFO")
+            reconciler.set_idle(miner.ip, False)
+            state.idle = False
+            return True
+        level = state.level + 1 if action == THROTTLE else state.level - 1
+        freq, voltage = miner.tune_levels[level]
+        try:
+            miner.tune(level)
+        except Exception as e:
+            miner.level = state.level
+            log.log_msg(f"Error tuning {miner.ip} to {freq}MHz", "ERROR", exc=e)
+            return False
+        state.level = level
+        log.log_msg(
+            f"{miner.ip} {action}d to {freq}MHz {voltage}mV{temp}",
+            "WARNING" if action == THROTTLE else "INFO",
+        )
+        return True
+
+    def summary(self) -> str:
+        """Throttled and idled miners for status view"""
+        parts = []
+        for ip, state in sorted(self.states.items()):
+            if state.idle:
+                parts.append(f"{ip} idle")
+            elif state.level:
+                parts.append(f"{ip} level {state.level}")
+        return ", ".join(parts)
+
+
+if __name__ == "__main__":
+    from bitfarmer.miner import MinerStatus
+    from bitfarmer.volcminer import VolcminerD1
+
+    class DemoVolcminer(VolcminerD1):
+        def tune(self, level: int):
+            self.level = level
+
+    miner = DemoVolcminer(
+        {
+            "ip": "10.0.0.1",
+            "type": "VolcMiner D1",
+            "login": "root",
+            "password": "root",
+            "tod": False,
+            "primary_pool": "stratum+tcp://ltc.viabtc.io:3333",
+            "primary_pool_user": "worker",
+            "primary_pool_pass": "123",
+            "secondary_pool": "",
+            "secondary_pool_user": "",
+            "secondary_pool_pass": "",
+        }
+    )
+    controller = ThermalController.from_conf({"thermal": {}, "miners": []})
+    reconciler = Reconciler()
+    for minute, temp in enumerate([70, 78, 82, 83, 81, 79, 74, 70, 69, 68, 68, 68]):
+        status = MinerStatus(
+            miner.ip, pool="stratum+tcp://ltc.viabtc.io:3333", hashboards=3
+        )
+        status.temp_0 = status.temp_1 = status.temp_2 = temp
+        actions = controller.update([miner], [status], reconciler, 30, minute * 300)
+        print(f"{minute * 5:>3}m {temp}C level {miner.level} {actions}")
@@ -7,6 +7,7 @@ from urllib.parse import urlencode
 import requests
 from requests.auth import HTTPDigestAuth
 
+import bitfarmer.profiling as profiling
 from bitfarmer.miner import Miner, MinerStatus
 
 
@@ -32,6 +33,30 @@ def parse_to_float(s: str, precision: int = 2) -> float:
 class VolcminerD1(Miner):
     """VolcMiner D1 interface"""
 
+    default_watts = 3500
+    tune_levels = (
+        ("1900", "1250"),
+        ("1800", "1240"),
+        ("1700", "1230"),
+        ("1600", "1220"),
+    )
+    # Never above stock full speed, and low enough levels still hash
+    freq_range = (1400, 1900)
+    voltage_range = (1180, 1250)
+
+    def __init__(self, conf: dict):
+        super().__init__(conf)
+        # A custom full speed shifts every level by the same amount, so each
+        # throttle step still lowers frequency and voltage
+        freq, voltage = (int(x) for x in self.tune_levels[0])
+        freq = int(conf.get("freq", freq)) - freq
+        voltage = int(conf.get("voltage", voltage)) - voltage
+        self.tune_levels = tuple(
+            (str(int(f) + freq), str(int(v) + voltage)) for f, v in self.tune_levels
+        )
+        # Reused so the digest nonce carries over and skips the 401 round trip
+        self.auth = HTTPDigestAuth(self.login, self.password)
+
     def get_miner_status(self) -> MinerStatus:
         """Gather and return MinerStatus"""
         status_info = self.get_status()
@@ -93,10 +118,10 @@ class VolcminerD1(Miner):
         payload = {"_bb_nonetwork_run": 0}
         _ = self.post("/cgi-bin/set_nonetworkrun_mode.cgi", payload)
 
-    def stop_mining(self) -> dict:
-        """Unset mining pools"""
-        self.set_nonetrun()
-        payload = {
+    def conf_payload(self, mining: bool) -> dict:
+        """Miner config for mining (at current tune level) or stopped state"""
+        freq, voltage = self.tune_levels[self.level] if mining else ("1900", "1245")
+        return {
             "_bb_pool1url": self.primary_pool,
             "_bb_pool1user": self.primary_pool_user,
             "_bb_pool1pw": self.primary_pool_pass,
@@ -111,41 +136,38 @@ class VolcminerD1(Miner):
             "_bb_fan_customize_switch": "false",
             "_bb_fan_customize_value_front": "",
             "_bb_fan_customize_value_back": "",
-            "_bb_freq": "1900",
+            "_bb_freq": freq,
             "_bb_coin_type": "ltc",
-            "_bb_runmode": "-1",
-            "_bb_voltage_customize_value": "1245",
+            "_bb_runmode": "0" if mining else "-1",
+            "_bb_voltage_customize_value": voltage,
             "_bb_ema": "3",
             "_bb_debug": "false",
         }
-        return self.post("/cgi-bin/set_miner_conf.cgi", payload)
+
+    def config_diff(self, mining: bool) -> dict:
+        """Return {key: (live, desired)} for config that differs from desired state"""
+        live_conf = self.get_miner_conf()["data"]
+        diff = {}
+        for key, value in self.conf_payload(mining).items():
+            live = str(live_conf.get(key.removeprefix("_bb_"), ""))
+            if live != value:
+                diff[key] = (live, value)
+        return diff
+
+    def stop_mining(self) -> dict:
+        """Unset mining pools"""
+        self.set_nonetrun()
+        return self.post("/cgi-bin/set_miner_conf.cgi", self.conf_payload(False))
 
     def start_mining(self) -> dict:
         """Set mining pools"""
         self.set_nonetrun()
-        payload = {
-            "_bb_pool1url": self.primary_pool,
-            "_bb_pool1user": self.primary_pool_user,
-            "_bb_pool1pw": self.primary_pool_pass,
-            "_bb_pool2url": self.secondary_pool,
-            "_bb_pool2user": self.secondary_pool_user,
-            "_bb_pool2pw": self.secondary_pool_pass,
-            "_bb_pool3url": "",
-            "_bb_pool3user": "",
-            "_bb_pool3pw": "",
-            "_bb_nobeeper": "",
-            "_bb_notempoverctrl": "true",
-            "_bb_fan_customize_switch": "false",
-            "_bb_fan_customize_value_front": "",
-            "_bb_fan_customize_value_back": "",
-            "_bb_freq": "1900",
-            "_bb_coin_type": "ltc",
-            "_bb_runmode": "0",
-            "_bb_voltage_customize_value": "1250",
-            "_bb_ema": "3",
-            "_bb_debug": "false",
-        }
-        return self.post("/cgi-bin/set_miner_conf.cgi", payload)
+        return self.post("/cgi-bin/set_miner_conf.cgi", self.conf_payload(True))
+
+    def tune(self, level: int) -> dict:
+        """Set frequency and voltage to tune level"""
+        self.level = level
+        return self.start_mining()
 
     def reboot(self):
         """Reboot miner"""
@@ -153,11 +175,11 @@ class VolcminerD1(Miner):
             "Content-Length": "0",
             "Accept": "applicaton/json",
         }
-        resp = requests.request(
+        resp = self.request(
             "POST",
-            f"http://{self.ip}/cgi-bin/reboot.cgi",
+            "/cgi-bin/reboot.cgi",
             headers=headers,
-            auth=HTTPDigestAuth(self.login, self.password),
+            auth=self.auth,
             timeout=20,
         )
         if resp.status_code != requests.codes.ok:
@@ -172,22 +194,23 @@ class VolcminerD1(Miner):
         return self.get("/cgi-bin/get_miner_statusV1.cgi")
 
     def get_miner_conf(self) -> dict:
-        """Get miner status USED FOR TESTING"""
+        """Get miner config"""
         return self.get("/cgi-bin/get_miner_conf.cgi")
 
     def get(self, uri: str) -> dict:
         """GET request"""
         headers = {"Content-Length": "0"}
-        resp = requests.request(
+        resp = self.request(
             "GET",
-            f"http://{self.ip}{uri}",
+            uri,
             headers=headers,
-            auth=HTTPDigestAuth(self.login, self.password),
+            auth=self.auth,
             timeout=3,
         )
         if resp.status_code != requests.codes.ok:
             resp.raise_for_status()
-        return parse_volc_resp(resp.text)
+        with profiling.span("json", ip=self.ip, uri=uri):
+            return parse_volc_resp(resp.text)
 
     def post(self, uri: str, payload: dict) -> dict:
         """POST request (form)"""
@@ -197,17 +220,18 @@ class VolcminerD1(Miner):
             "Content-Type": "application/x-www-form-urlencoded",
             "Accept": "applicaton/json",
         }
-        resp = requests.request(
+        resp = self.request(
             "POST",
-            f"http://{self.ip}{uri}",
+            uri,
             headers=headers,
             data=payload,
-            auth=HTTPDigestAuth(self.login, self.password),
+            auth=self.auth,
             timeout=40,
         )
         if resp.status_code != requests.codes.ok:
             resp.raise_for_status()
-        return parse_volc_resp(resp.text)
+        with profiling.span("json", ip=self.ip, uri=uri):
+            return parse_volc_resp(resp.text)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import struct
+import threading
+import time
+
+import bitfarmer.log as log
+from bitfarmer.settings import ConfigError, Settings
+
+POLL_INTERVAL = 2
+# Editors write in several steps, wait for the file to settle before reading
+SETTLE_TIME = 0.2
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def inotify_fd(directory: str) -> int | None:
+    """inotify fd watching directory for written/replaced files (None if unavailable)"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def event_names(buf: bytes) -> list:
+    """File names in a buffer of inotify events"""
+    names = []
+    offset = 0
+    while offset + EVENT_HEADER.size <= len(buf):
+        _, _, _, length = EVENT_HEADER.unpack_from(buf, offset)
+        offset += EVENT_HEADER.size
+        names.append(buf[offset : offset + length].rstrip(b"\0").decode())
+        offset += length
+    return names
+
+
+class ConfigWatcher:
+    """Validate config file changes in the background and hand them to the main loop"""
+
+    def __init__(self, path: str, interval: float = POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.digest = None
+        self.current = None
+        self.pending = None
+        self.lock = threading.Lock()
+        self.wake_r, self.wake_w = os.pipe()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.inotify = None
+
+    def fileno(self) -> int:
+        """Readable when validated settings are pending (for select)"""
+        return self.wake_r
+
+    def start(self, settings: Settings | None = None):
+        """Start watching, settings are the ones already in use"""
+        self.digest = self.read()[0]
+        self.current = settings
+        self.inotify = inotify_fd(os.path.dirname(self.path) or ".")
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop watching"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.inotify is not None:
+            os.close(self.inotify)
+            self.inotify = None
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+    def run(self):
+        """Wait for file events (or poll mtime) and load changes"""
+        name = os.path.basename(self.path)
+        stat = self.stat()
+        while not self.stop_event.is_set():
+            if self.inotify is not None:
+                rlist, _, _ = select.select([self.inotify], [], [], self.interval)
+                if not rlist:
+                    continue
+                try:
+                    if name not in event_names(os.read(self.inotify, 65536)):
+                        continue
+                except BlockingIOError:
+                    continue
+            else:
+                if self.stop_event.wait(self.interval):
+                    break
+                new_stat = self.stat()
+                if new_stat == stat:
+                    continue
+                stat = new_stat
+            time.sleep(SETTLE_TIME)
+            self.check()
+
+    def stat(self) -> tuple | None:
+        """File identity and modification time"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def read(self) -> tuple:
+        """(digest, text) of config file"""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return (None, "")
+        return (hashlib.sha256(data).digest(), data.decode())
+
+    def check(self):
+        """Load and validate config if its contents changed"""
+        digest, text = self.read()
+        if digest is None or digest == self.digest:
+            return
+        self.digest = digest
+        try:
+            settings = Settings.loads(text)
+        except ConfigError as e:
+            log.log_msg(
+                "Config change rejected, keeping current config", "WARNING", exc=e
+            )
+            return
+        if self.current is not None and settings.raw == self.current.raw:
+            return
+        with self.lock:
+            self.pending = settings
+        os.write(self.wake_w, b"\0")
+
+    def take(self) -> Settings | None:
+        """Pending validated settings, if any"""
+        while select.select([self.wake_r], [], [], 0)[0]:
+            os.read(self.wake_r, 4096)
+        with self.lock:
+            settings, self.pending = self.pending, None
+        if settings is not None:
+            self.current = settings
+        return settings
+
+    def applied(self, settings: Settings):
+        """Record settings applied by the main loop (e.g. after interactive edits)"""
+        with self.lock:
+            self.current = settings
+            self.pending = None
+        self.digest = self.read()[0]
+
+
+if __name__ == "__main__":
+    import json
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/conf.json"
+        with open(path, "w") as f:
+            json.dump({"view": "small", "icons": False}, f)
+        watcher = ConfigWatcher(path).start()
+        print(f"inotify: {watcher.inotify is not None}")
+        with open(path, "w") as f:
+            json.dump({"view": "full", "icons": True}, f)
+        select.select([watcher], [], [], 5)
+        print(watcher.take())
+        watcher.stop()
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 
 import json
-from dataclasses import dataclass
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
 from typing import Tuple
 
-import requests
-
 import bitfarmer.coloring as coloring
 
 TEMP_HOT_C = 33
@@ -13,6 +14,11 @@ TEMP_WARN_C = 25
 TEMP_HOT_F = 91
 TEMP_WARN_F = 77
 WEATHER_ERROR_MSG = coloring.warn_color("Weather unavailable")
+WEATHER_URL = "http://wttr.in"
+WEATHER_CACHE = "weather.json"
+WEATHER_TTL = 3600
+WEATHER_RETRY = 300
+WEATHER_TIMEOUT = 10
 
 
 @dataclass
@@ -64,56 +70,180 @@ class Weather:
         return location + s
 
 
-def get_weather(conf: dict) -> Weather:
+def get_weather(conf: dict, timeout: float = WEATHER_TIMEOUT) -> Weather:
     """Get current parameters"""
-    wtr = get_weather_json(conf)
+    return parse_weather(get_weather_json(conf, timeout), conf["weather"]["metric"])
+
+
+def parse_weather(wtr: dict, metric: bool) -> Weather:
+    """Build Weather from wttr.in j2 response"""
     area, region, country = get_location(wtr)
-    temp = int(
-        wtr["current_condition"][0]["temp_C"]
-        if conf["weather"]["metric"]
-        else wtr["current_condition"][0]["temp_F"]
-    )
-    real_feel = int(
-        wtr["current_condition"][0]["FeelsLikeC"]
-        if conf["weather"]["metric"]
-        else wtr["current_condition"][0]["FeelsLikeF"]
-    )
-    precipitation = float(
-        wtr["current_condition"][0]["precipMM"]
-        if conf["weather"]["metric"]
-        else wtr["current_condition"][0]["precipInches"]
-    )
-    wind = int(
-        wtr["current_condition"][0]["windspeedKmph"]
-        if conf["weather"]["metric"]
-        else wtr["current_condition"][0]["windspeedMiles"]
-    )
+    current = wtr["current_condition"][0]
     return Weather(
-        conf["weather"]["metric"],
-        temp,
-        real_feel,
-        int(wtr["current_condition"][0]["humidity"]),
-        precipitation,
-        wind,
-        wtr["current_condition"][0]["winddir16Point"],
-        wtr["current_condition"][0]["weatherDesc"][0]["value"],
+        metric,
+        int(current["temp_C"] if metric else current["temp_F"]),
+        int(current["FeelsLikeC"] if metric else current["FeelsLikeF"]),
+        int(current["humidity"]),
+        float(current["precipMM"] if metric else current["precipInches"]),
+        int(current["windspeedKmph"] if metric else current["windspeedMiles"]),
+        current["winddir16Point"],
+        current["weatherDesc"][0]["value"],
         area,
         region,
         country,
     )
 
 
-def get_weather_json(conf: dict) -> dict:
+def get_weather_json(conf: dict, timeout: float = WEATHER_TIMEOUT) -> dict:
     """Get weather json"""
+    import requests
+
+    url = conf["weather"].get("url", WEATHER_URL)
     area = conf["weather"]["area"].replace(" ", "+")
     region = conf["weather"]["region"].replace(" ", "+")
     country = conf["weather"]["country"].replace(" ", "+")
-    resp = requests.get(f"http://wttr.in/{area}+{region}+{country}?&format=j2")
+    resp = requests.get(f"{url}/{area}+{region}+{country}?&format=j2", timeout=timeout)
     if resp.status_code != requests.codes.ok:
         resp.raise_for_status()
     return json.loads(resp.text)
 
 
+class WeatherService:
+    """Fetch weather on a background thread, cache it with a TTL and on disk"""
+
+    def __init__(
+        self,
+        conf: dict,
+        cache_path: str,
+        ttl: float = WEATHER_TTL,
+        retry: float = WEATHER_RETRY,
+        timeout: float = WEATHER_TIMEOUT,
+    ):
+        self.conf = {"weather": dict(conf["weather"])}
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.retry = retry
+        self.timeout = timeout
+        self.weather = None
+        self.fetched = None
+        self.failed = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_conf(cls, conf: dict, cache_path: str):
+        """Build service from weather section of config"""
+        wc = conf["weather"]
+        return cls(
+            conf,
+            cache_path,
+            ttl=wc.get("ttl", WEATHER_TTL),
+            retry=wc.get("retry", WEATHER_RETRY),
+            timeout=wc.get("timeout", WEATHER_TIMEOUT),
+        )
+
+    def key(self) -> list:
+        """Identifies the query a cached value belongs to"""
+        wc = self.conf["weather"]
+        return [
+            wc.get("url", WEATHER_URL),
+            wc["area"],
+            wc["region"],
+            wc["country"],
+            wc["metric"],
+        ]
+
+    def load(self):
+        """Load cached weather from disk if it is for the same query"""
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+            if cache["key"] == self.key():
+                self.weather = Weather(**cache["weather"])
+                self.fetched = cache["fetched"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def save(self):
+        """Persist cached weather (replaced atomically)"""
+        tmp = f"{self.cache_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "key": self.key(),
+                    "fetched": self.fetched,
+                    "weather": asdict(self.weather),
+                },
+                f,
+            )
+        os.replace(tmp, self.cache_path)
+
+    def due(self, now: float) -> float:
+        """Seconds until next fetch"""
+        when = now if self.fetched is None else self.fetched + self.ttl
+        if self.failed is not None:
+            when = max(when, self.failed + self.retry)
+        return max(0.0, when - now)
+
+    def refresh(self):
+        """Fetch, cache and log weather"""
+        import bitfarmer.log as log
+
+        try:
+            log.log_msg("Gathering weather", "INFO", quiet=True)
+            wtr = get_weather(self.conf, self.timeout)
+        except Exception as e:
+            self.failed = time.time()
+            log.log_msg(
+                f"Unable to gather weather for {self.conf['weather']['area']}",
+                "WARNING",
+                exc=e,
+                quiet=True,
+            )
+            return
+        self.weather, self.fetched, self.failed = wtr, time.time(), None
+        log.log_weather(wtr)
+        try:
+            self.save()
+        except OSError as e:
+            log.log_msg("Unable to cache weather", "WARNING", exc=e, quiet=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.due(time.time())):
+            self.refresh()
+
+    def start(self):
+        """Load cache and start fetching in background"""
+        self.load()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop fetching"""
+        self.stop_event.set()
+        if self.thread is not None:
+            # An in-flight fetch is bounded by the request timeout
+            self.thread.join(self.timeout)
+
+    def current(self) -> Weather | None:
+        """Cached weather (None until first fetch), never blocks"""
+        return self.weather
+
+    def age(self) -> float | None:
+        """Seconds since cached weather was fetched"""
+        return None if self.fetched is None else time.time() - self.fetched
+
+    def __str__(self):
+        wtr = self.weather
+        if wtr is None:
+            return WEATHER_ERROR_MSG
+        if self.age() > self.ttl + self.retry:
+            fetched = time.strftime("%H:%M", time.localtime(self.fetched))
+            return str(wtr) + coloring.warn_color(f" (as of {fetched})")
+        return str(wtr)
+
+
 def get_location(wtr: dict) -> Tuple[str, str, str]:
     """Get location weather is being pulled from"""
     area = wtr["nearest_area"][0]["areaName"][0]["value"]
@@ -123,14 +253,46 @@ def get_location(wtr: dict) -> Tuple[str, str, str]:
 
 
 if __name__ == "__main__":
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from bitfarmer.fixtures import load_fixture
+
+    class StandIn(BaseHTTPRequestHandler):
+        """Local stand-in for wttr.in"""
+
+        def do_GET(self):
+            body = load_fixture("wttr", "j2").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
     conf = {
         "weather": {
             "metric": False,
             "area": "Rocky Mount",
             "region": "North Carolina",
             "country": "United States",
+            "url": f"http://127.0.0.1:{server.server_port}",
         }
     }
-    # get_location(conf)
-    weather = get_weather(conf)
-    print(weather)
+    with tempfile.TemporaryDirectory() as tmp:
+        import bitfarmer.config as config
+
+        config.DATA_DIR = tmp + "/"
+        service = WeatherService.from_conf(conf, f"{tmp}/{WEATHER_CACHE}").start()
+        while service.current() is None:
+            time.sleep(0.1)
+        service.stop()
+        print(service)
+        cached = WeatherService.from_conf(conf, f"{tmp}/{WEATHER_CACHE}")
+        cached.load()
+        print(f"Cached: {cached.current()}, refetch in {cached.due(time.time()):.0f}s")
+    server.shutdown()
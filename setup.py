@@ -11,8 +11,9 @@ setup(
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
     url="https://github.com/jandrus/bitfarmer.git",
-    packages=find_packages(where="bitfarmer"),
-    package_dir={"": "bitfarmer"},
+    packages=find_packages(include=["bitfarmer", "bitfarmer.*"]),
+    # Recorded miner and weather responses used by bench and simulator
+    package_data={"bitfarmer.fixtures": ["elphapex/*", "volcminer/*", "wttr/*"]},
     install_requires=[
         "requests>=2.20",
         "colorama>=0.4.6",
@@ -22,7 +23,11 @@ setup(
     ],
     entry_points={
         "console_scripts": [
-            "bitfarmer=bitfarmer.bitfarmer:main",
+            "bitfarmer=bitfarmer.cli:main",
+        ],
+        "bitfarmer.drivers": [
+            "DG1+/DGHome=bitfarmer.elphapex:ElphapexDG1",
+            "VolcMiner D1=bitfarmer.volcminer:VolcminerD1",
         ],
     },
 )